@@ -0,0 +1,299 @@
+"""
+Per-deploy metrics and their history.
+
+scripts/run_stack.sh runs 'pulumi up --event-log <file>' and then records the
+update here: the status and wall time, the engine's change counts per
+operation, how long each resource step took (from its pre event to its
+outputs or failure event; the engine stamps events in whole seconds), and the
+stack's cost_breakdown export. Every deploy is appended to a local SQLite file
+(.cache/deploy_metrics.sqlite, or PULUMI_DEPLOY_METRICS_DB), so 'report' can
+show latency trends, the slowest resources per stack and how the cost
+estimate moved.
+
+Usage (from infra/pulumi):
+    python -m common.deploy_metrics record --stack dev-vpc --event-log events.jsonl \\
+        --wall-time 83 --status succeeded --outputs outputs.json
+    python -m common.deploy_metrics report                       # every stack
+    python -m common.deploy_metrics report --stack prod-vpc --last 20 --slowest 10
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from common.stack_utils import parse_stack_name
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(PROJECT_DIR, ".cache", "deploy_metrics.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deploys (
+    id INTEGER PRIMARY KEY,
+    stack TEXT NOT NULL,
+    env TEXT NOT NULL,
+    component TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    wall_seconds REAL,
+    engine_seconds REAL,
+    monthly_cost REAL
+);
+CREATE TABLE IF NOT EXISTS deploy_ops (
+    deploy_id INTEGER NOT NULL REFERENCES deploys(id),
+    op TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resource_steps (
+    deploy_id INTEGER NOT NULL REFERENCES deploys(id),
+    urn TEXT NOT NULL,
+    type TEXT NOT NULL,
+    op TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cost_items (
+    deploy_id INTEGER NOT NULL REFERENCES deploys(id),
+    component TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    monthly REAL
+);
+CREATE INDEX IF NOT EXISTS deploys_by_stack ON deploys (stack, started_at);
+"""
+
+
+@dataclass
+class ResourceStep:
+    """One resource operation of an update"""
+    urn: str
+    type: str
+    op: str
+    seconds: float
+    failed: bool = False
+
+
+@dataclass
+class DeployMetrics:
+    """What one 'pulumi up' did and how long it took"""
+    stack: str
+    started_at: str
+    status: str
+    wall_seconds: Optional[float] = None
+    engine_seconds: Optional[float] = None
+    changes: Dict[str, int] = field(default_factory=dict)  # op -> resources, from the summary event
+    steps: List[ResourceStep] = field(default_factory=list)  # same steps left out
+    cost: Optional[dict] = None  # the cost_breakdown export
+
+
+def read_event_log(path: str) -> List[dict]:
+    """Engine events from a 'pulumi up --event-log' file (JSON lines; a truncated last line is skipped)"""
+    events = []
+    with open(path) as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+def steps_from_events(events: Iterable[dict]) -> List[ResourceStep]:
+    """Resource steps (except 'same') timed from their pre event to their outputs or failure event"""
+    started: Dict[str, tuple] = {}
+    steps = []
+    for event in events:
+        pre = event.get("resourcePreEvent")
+        done = event.get("resOutputsEvent") or event.get("resOpFailedEvent")
+        metadata = (pre or done or {}).get("metadata")
+        if not metadata or metadata.get("op") in (None, "same"):
+            continue
+        if pre:
+            started[metadata["urn"]] = (event.get("timestamp", 0), metadata)
+        elif metadata["urn"] in started:
+            start, pre_metadata = started.pop(metadata["urn"])
+            steps.append(ResourceStep(metadata["urn"], metadata.get("type", pre_metadata.get("type", "")),
+                                      metadata["op"], max(0, event.get("timestamp", start) - start),
+                                      failed="resOpFailedEvent" in event))
+    return steps
+
+
+def metrics_from_events(stack: str, events: List[dict], status: str, wall_seconds: Optional[float] = None,
+                        outputs: Optional[dict] = None, started_at: Optional[str] = None) -> DeployMetrics:
+    summary = next((e["summaryEvent"] for e in reversed(events) if "summaryEvent" in e), {})
+    if started_at is None:
+        first = next((e["timestamp"] for e in events if e.get("timestamp")), None)
+        moment = datetime.fromtimestamp(first, timezone.utc) if first else datetime.now(timezone.utc)
+        started_at = moment.isoformat(timespec="seconds")
+    return DeployMetrics(
+        stack=stack,
+        started_at=started_at,
+        status=status,
+        wall_seconds=wall_seconds,
+        engine_seconds=summary.get("durationSeconds"),
+        changes={op: n for op, n in (summary.get("resourceChanges") or {}).items() if n},
+        steps=steps_from_events(events),
+        cost=(outputs or {}).get("cost_breakdown"),
+    )
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or os.environ.get("PULUMI_DEPLOY_METRICS_DB", DEFAULT_DB)
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+def record(db: sqlite3.Connection, metrics: DeployMetrics) -> int:
+    """Append one deploy; returns its id"""
+    env, component = parse_stack_name(metrics.stack)
+    with db:
+        deploy_id = db.execute(
+            "INSERT INTO deploys (stack, env, component, started_at, status, wall_seconds, engine_seconds,"
+            " monthly_cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (metrics.stack, env, component, metrics.started_at, metrics.status, metrics.wall_seconds,
+             metrics.engine_seconds, (metrics.cost or {}).get("monthly_total"))).lastrowid
+        db.executemany("INSERT INTO deploy_ops VALUES (?, ?, ?)",
+                       [(deploy_id, op, n) for op, n in sorted(metrics.changes.items())])
+        db.executemany("INSERT INTO resource_steps VALUES (?, ?, ?, ?, ?, ?)",
+                       [(deploy_id, s.urn, s.type, s.op, s.seconds, int(s.failed)) for s in metrics.steps])
+        db.executemany("INSERT INTO cost_items VALUES (?, ?, ?, ?)",
+                       [(deploy_id, item["component"], item["resource"], item.get("monthly"))
+                        for item in (metrics.cost or {}).get("items", [])])
+    return deploy_id
+
+
+def history(db: sqlite3.Connection, stack: str, last: int) -> List[sqlite3.Row]:
+    """The stack's last `last` deploys, oldest first"""
+    rows = db.execute("SELECT * FROM deploys WHERE stack = ? ORDER BY started_at DESC, id DESC LIMIT ?",
+                      (stack, last)).fetchall()
+    return rows[::-1]
+
+
+def op_counts(db: sqlite3.Connection, deploy_id: int) -> Dict[str, int]:
+    return {row["op"]: row["count"] for row in
+            db.execute("SELECT op, count FROM deploy_ops WHERE deploy_id = ? ORDER BY op", (deploy_id,))}
+
+
+def slowest_resources(db: sqlite3.Connection, deploy_ids: List[int], limit: int) -> List[dict]:
+    """Resources by mean step time over the given deploys"""
+    marks = ",".join("?" * len(deploy_ids))
+    rows = db.execute(
+        f"SELECT urn, type, COUNT(*) AS steps, AVG(seconds) AS mean, MAX(seconds) AS max, SUM(failed) AS failed,"
+        f" GROUP_CONCAT(DISTINCT op) AS ops FROM resource_steps WHERE deploy_id IN ({marks})"
+        f" GROUP BY urn ORDER BY mean DESC, max DESC, urn LIMIT ?", (*deploy_ids, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def cost_changes(db: sqlite3.Connection, before_id: int, after_id: int) -> List[dict]:
+    """Cost items whose monthly estimate differs between two deploys"""
+    def items(deploy_id):
+        totals: Dict[tuple, float] = {}
+        for row in db.execute("SELECT component, resource, monthly FROM cost_items WHERE deploy_id = ?",
+                              (deploy_id,)):
+            key = (row["component"], row["resource"])
+            totals[key] = totals.get(key, 0) + (row["monthly"] or 0)
+        return totals
+
+    before, after = items(before_id), items(after_id)
+    changes = [{"component": c, "resource": r, "before": before.get((c, r), 0.0), "after": after.get((c, r), 0.0)}
+               for c, r in sorted(set(before) | set(after))]
+    return [c for c in changes if round(c["after"] - c["before"], 2)]
+
+
+def _trend(values: List[float]) -> str:
+    """'median 84s (previous 61s, +38%)' over the newer and older halves"""
+    values = [v for v in values if v is not None]
+    if not values:
+        return "no timings"
+    half = len(values) // 2
+    recent = statistics.median(values[half:])
+    if not half:
+        return f"median {recent:.0f}s"
+    earlier = statistics.median(values[:half])
+    change = f", {(recent - earlier) / earlier:+.0%}" if earlier else ""
+    return f"median {recent:.0f}s (previous {earlier:.0f}s{change})"
+
+
+def format_report(db: sqlite3.Connection, stacks: Optional[List[str]] = None, last: int = 10,
+                  slowest: int = 5) -> str:
+    stacks = stacks or [row["stack"] for row in db.execute("SELECT DISTINCT stack FROM deploys ORDER BY stack")]
+    if not stacks:
+        return "No deploys recorded yet"
+
+    lines = []
+    for stack in stacks:
+        deploys = history(db, stack, last)
+        if not deploys:
+            lines.append(f"{stack}: no deploys recorded\n")
+            continue
+        lines.append(f"{stack}: {len(deploys)} deploys, wall time {_trend([d['wall_seconds'] for d in deploys])}")
+        lines.append(f"  {'STARTED':<25} {'STATUS':<10} {'WALL(s)':>8} {'COST/MO':>9}  CHANGES")
+        for deploy in deploys:
+            changes = ", ".join(f"{op}={n}" for op, n in op_counts(db, deploy["id"]).items()) or "-"
+            wall = f"{deploy['wall_seconds']:.0f}" if deploy["wall_seconds"] is not None else "-"
+            cost = f"${deploy['monthly_cost']:.2f}" if deploy["monthly_cost"] is not None else "-"
+            lines.append(f"  {deploy['started_at']:<25} {deploy['status']:<10} {wall:>8} {cost:>9}  {changes}")
+
+        priced = [d for d in deploys if d["monthly_cost"] is not None]
+        if len(priced) > 1:
+            for change in cost_changes(db, priced[-2]["id"], priced[-1]["id"]):
+                lines.append(f"  cost: {change['component']} {change['resource']} "
+                             f"${change['before']:.2f} -> ${change['after']:.2f}")
+
+        resources = slowest_resources(db, [d["id"] for d in deploys], slowest)
+        if resources:
+            lines.append(f"  slowest resources (mean over {len(deploys)} deploys):")
+            for r in resources:
+                failed = f", {r['failed']} failed" if r["failed"] else ""
+                lines.append(f"    {r['mean']:>6.1f}s  max {r['max']:>4.0f}s  {r['steps']:>3} steps  "
+                             f"{r['urn'].rsplit('::', 1)[-1]} ({r['type']}: {r['ops']}{failed})")
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Record 'pulumi up' metrics and report deploy trends")
+    parser.add_argument("command", choices=("record", "report"))
+    parser.add_argument("--db", help=f"history file (default: $PULUMI_DEPLOY_METRICS_DB or {DEFAULT_DB})")
+    parser.add_argument("--stack", action="append", help="<env>-<component>; repeat to report several")
+    parser.add_argument("--event-log", help="record: file written by 'pulumi up --event-log'")
+    parser.add_argument("--outputs", help="record: 'pulumi stack output --json' (for cost_breakdown)")
+    parser.add_argument("--status", default="succeeded", help="record: succeeded or failed")
+    parser.add_argument("--wall-time", type=float, help="record: seconds 'pulumi up' took end to end")
+    parser.add_argument("--last", type=int, default=10, help="report: deploys per stack")
+    parser.add_argument("--slowest", type=int, default=5, help="report: resources per stack")
+    args = parser.parse_args(argv)
+
+    db = connect(args.db)
+    if args.command == "report":
+        print(format_report(db, args.stack, args.last, args.slowest))
+        return 0
+
+    if not args.stack or len(args.stack) != 1 or not args.event_log:
+        parser.error("record needs one --stack and --event-log")
+    outputs: Dict[str, Any] = {}
+    if args.outputs:
+        try:
+            with open(args.outputs) as f:
+                outputs = json.load(f)
+        except (OSError, ValueError):
+            pass  # no outputs yet (first deploy failed)
+    metrics = metrics_from_events(args.stack[0], read_event_log(args.event_log), args.status,
+                                  args.wall_time, outputs)
+    deploy_id = record(db, metrics)
+    changes = ", ".join(f"{op}={n}" for op, n in sorted(metrics.changes.items())) or "no changes"
+    print(f"Recorded deploy {deploy_id} of {metrics.stack}: {metrics.status}, {changes}, "
+          f"{len(metrics.steps)} resource steps")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
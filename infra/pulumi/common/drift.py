@@ -0,0 +1,271 @@
+"""
+Incremental drift detection for <env>-<component> stacks.
+
+Each check compares a compact snapshot of a stack's resources (type, id, a
+hash of its state and of its tags, when it was last checked) with the stack's
+current state, and refreshes only the resources that need it:
+
+- new:           not in the stored snapshot
+- state changed: updated since the snapshot (e.g. by 'pulumi up')
+- tags changed:  tags differ from the snapshot
+- stale:         last checked more than --max-age hours ago
+- drifted:       drifted at the last check and not fixed since
+
+The refresh runs in preview mode (state is never written) targeted at those
+URNs; every resource it would update or delete is reported as drift. Stacks
+are checked in parallel and a JSON report is written for CI.
+
+Usage (from infra/pulumi):
+    python -m common.drift check --envs dev staging --components vpc --report drift.json
+    python -m common.drift check --envs prod --max-age 0        # re-check everything
+    python -m common.drift snapshot --envs prod                 # record state without refreshing
+
+Stacks that do not exist are reported as skipped, not failed.
+
+Exit codes: 0 no drift, 1 a stack failed, 2 drift found.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from common.orchestrator import (STACK_DEPENDENCIES, StackKey, StackResult, qualified_stack_name, run_graph,
+                                 stack_name)
+from config.defaults import ENVIRONMENT_DEFAULTS
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SNAPSHOT_DIR = os.path.join(PROJECT_DIR, ".cache", "drift")
+
+# Refresh steps that mean the live resource no longer matches state
+DRIFT_OPS = ("update", "delete", "replace")
+
+
+@dataclass
+class DriftResult(StackResult):
+    """StackResult plus what the drift check looked at and found"""
+    resources: int = 0
+    checked: int = 0
+    reasons: Dict[str, List[str]] = field(default_factory=dict)  # urn -> why it was refreshed
+    drifted: List[dict] = field(default_factory=list)  # {"urn", "type", "op", "diffs"}
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def compact_snapshot(deployment: dict, previous: Optional[dict] = None, now: Optional[datetime] = None) -> dict:
+    """{urn: {...}} for every custom, non-provider resource in an exported deployment.
+
+    checked_at/drifted carry over from `previous` while the resource's state is unchanged.
+    """
+    previous = (previous or {}).get("resources", {})
+    resources = {}
+    for resource in deployment.get("resources", []):
+        if not resource.get("custom") or resource.get("type", "").startswith("pulumi:providers:"):
+            continue
+        outputs = resource.get("outputs", {})
+        entry = {
+            "type": resource["type"],
+            "id": resource.get("id"),
+            "state": _digest(outputs),
+            "tags": _digest(outputs.get("tagsAll", outputs.get("tags", {}))),
+            "checked_at": None,
+            "drifted": False,
+        }
+        known = previous.get(resource["urn"])
+        if known and known["state"] == entry["state"]:
+            entry["checked_at"] = known.get("checked_at")
+            entry["drifted"] = known.get("drifted", False)
+        resources[resource["urn"]] = entry
+    return {"taken_at": (now or _now()).isoformat(), "resources": resources}
+
+
+def select_targets(previous: Optional[dict], current: dict, max_age: timedelta,
+                   now: Optional[datetime] = None) -> Dict[str, List[str]]:
+    """{urn: reasons} for resources whose last-known state cannot be trusted"""
+    now = now or _now()
+    known = (previous or {}).get("resources", {})
+    targets = {}
+    for urn, entry in current["resources"].items():
+        reasons = []
+        before = known.get(urn)
+        if before is None:
+            reasons.append("new")
+        else:
+            if before["state"] != entry["state"]:
+                reasons.append("state changed")
+            if before["tags"] != entry["tags"]:
+                reasons.append("tags changed")
+            if before.get("drifted"):
+                reasons.append("drifted")
+        checked_at = entry.get("checked_at")
+        if not reasons and (checked_at is None or now - datetime.fromisoformat(checked_at) >= max_age):
+            reasons.append("stale")
+        if reasons:
+            targets[urn] = reasons
+    return targets
+
+
+def drift_from_events(events: List[Any]) -> List[dict]:
+    """Drifted resources from the engine events of a refresh preview"""
+    drifted = {}
+    for event in events:
+        pre = getattr(event, "resource_pre_event", None)
+        outputs = getattr(event, "res_outputs_event", None)
+        metadata = (pre or outputs).metadata if (pre or outputs) else None
+        if metadata is None:
+            continue
+        op = getattr(metadata.op, "value", metadata.op)
+        diffs = list(metadata.diffs or [])
+        if op in DRIFT_OPS or (op == "refresh" and diffs):
+            drifted[metadata.urn] = {"urn": metadata.urn, "type": metadata.type,
+                                     "op": "update" if op == "refresh" else op, "diffs": diffs}
+    return sorted(drifted.values(), key=lambda d: d["urn"])
+
+
+def load_snapshot(snapshot_dir: str, name: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(snapshot_dir, f"{name}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_snapshot(snapshot_dir: str, name: str, snapshot: dict):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f"{name}.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+class DriftChecker:
+    """Checks one <env>-<component> stack; usable as a run_graph task"""
+
+    def __init__(self, max_age: timedelta = timedelta(hours=24), snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                 org: Optional[str] = None, work_dir: str = PROJECT_DIR, refresh: bool = True,
+                 select: Optional[Callable[[str], Any]] = None):
+        self.max_age = max_age
+        self.snapshot_dir = snapshot_dir
+        self.org = org
+        self.work_dir = work_dir
+        self.refresh = refresh
+        self._select = select
+
+    def select(self, name: str):
+        if self._select:
+            return self._select(name)
+        from pulumi import automation as auto
+
+        return auto.select_stack(stack_name=qualified_stack_name(name, self.org), work_dir=self.work_dir)
+
+    def __call__(self, key: StackKey) -> DriftResult:
+        name = stack_name(*key)
+        result = DriftResult(name, "drift")
+        start = time.perf_counter()
+        try:
+            now = _now()
+            stack = self.select(name)
+            previous = load_snapshot(self.snapshot_dir, name)
+            current = compact_snapshot(stack.export_stack().deployment or {}, previous, now)
+            result.resources = len(current["resources"])
+
+            if self.refresh:
+                result.reasons = select_targets(previous, current, self.max_age, now)
+                if result.reasons:
+                    events = []
+                    stack.preview_refresh(target=sorted(result.reasons), on_event=events.append,
+                                          suppress_progress=True)
+                    result.drifted = drift_from_events(events)
+                drifted_urns = {d["urn"] for d in result.drifted}
+                for urn in result.reasons:
+                    current["resources"][urn]["checked_at"] = now.isoformat()
+                    current["resources"][urn]["drifted"] = urn in drifted_urns
+                result.checked = len(result.reasons)
+                result.changes = {"drifted": len(result.drifted)} if result.drifted else {}
+
+            save_snapshot(self.snapshot_dir, name, current)
+            result.status = "succeeded"
+        except Exception as e:
+            result.status = "skipped" if _stack_missing(e) else "failed"
+            result.error = str(e).strip().splitlines()[-1] if str(e).strip() else repr(e)
+        finally:
+            result.wall_time = time.perf_counter() - start
+        return result
+
+
+def _stack_missing(error: Exception) -> bool:
+    """The stack was never created (e.g. no eks stack for this env): nothing can have drifted"""
+    from pulumi.automation import StackNotFoundError
+
+    return isinstance(error, StackNotFoundError) or "no stack named" in str(error)
+
+
+def build_report(results: Dict[StackKey, StackResult]) -> dict:
+    """Machine-readable drift report, one entry per stack"""
+    stacks = []
+    for key in sorted(results):
+        entry = asdict(results[key])
+        entry.pop("operation", None)
+        entry.pop("changes", None)
+        entry["wall_time"] = round(entry["wall_time"], 2)
+        stacks.append(entry)
+    return {
+        "generated_at": _now().isoformat(),
+        "stacks": stacks,
+        "drifted_stacks": sorted(s["stack_name"] for s in stacks if s.get("drifted")),
+        "failed_stacks": sorted(s["stack_name"] for s in stacks if s["status"] == "failed"),
+        "skipped_stacks": sorted(s["stack_name"] for s in stacks if s["status"] == "skipped"),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Incremental drift check of <env>-<component> stacks")
+    parser.add_argument("command", choices=("check", "snapshot"))
+    parser.add_argument("--envs", nargs="+", default=list(ENVIRONMENT_DEFAULTS))
+    parser.add_argument("--components", nargs="+", default=list(STACK_DEPENDENCIES))
+    parser.add_argument("--workers", type=int, default=4, help="maximum stacks checked at once")
+    parser.add_argument("--max-age", type=float, default=24.0, help="hours before a resource is re-checked")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--report", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--org", help="Pulumi organization for fully-qualified stack names")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.components) - set(STACK_DEPENDENCIES)
+    if unknown:
+        parser.error(f"Unknown components: {', '.join(sorted(unknown))}")
+
+    # Drift checks only read state, so every stack is independent
+    graph = {(env, component): [] for env in args.envs for component in args.components}
+    checker = DriftChecker(timedelta(hours=args.max_age), args.snapshot_dir, args.org,
+                           refresh=args.command == "check")
+    report = build_report(run_graph(graph, checker, workers=args.workers))
+
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+        for stack in report["stacks"]:
+            print(f"{stack['stack_name']:<20} {stack['status']:<10} "
+                  f"checked {stack.get('checked', 0)}/{stack.get('resources', 0)}  "
+                  f"drifted {len(stack.get('drifted', []))}" + (f"  error: {stack['error']}" if stack["error"] else ""))
+    else:
+        print(text)
+
+    if report["failed_stacks"]:
+        return 1
+    return 2 if report["drifted_stacks"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
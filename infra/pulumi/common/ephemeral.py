@@ -0,0 +1,200 @@
+"""
+Ephemeral per-PR environments on the Pulumi Automation API.
+
+'up' claims a /20 slot of EPHEMERAL_CIDR_POOL for pr-<n> (recorded as a
+pool-claim:pr-<n> tag on the pr-pool-vpc stack, so blocks never overlap), creates the
+pr-<n>-<component> stacks and deploys them in dependency order. When the slot
+is a warm shell of pr-pool-vpc, the vpc stack claims it instead of creating a
+VPC and subnets (modules/vpc/pool.py), so the environment comes up in seconds.
+
+'destroy' tears the PR stacks down in reverse dependency order, removes them
+and releases the slot: a shell returns to the pool untouched.
+
+Claims are stack tags because tags live in the backend with the stack, while
+stack config set here would only reach Pulumi.pr-pool-vpc.yaml in the current
+checkout and be gone for the next job. Choosing a slot is still read-then-write:
+run one claim at a time (the PR workflow uses a concurrency group).
+
+Usage (from infra/pulumi):
+    python -m common.ephemeral up --pr 123 --components vpc
+    python -m common.ephemeral destroy --pr 123
+    python -m common.ephemeral status
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from common.orchestrator import (PROJECT_DIR, StackKey, StackResult, StackRunner, build_graph, format_report,
+                                 qualified_stack_name, reverse_graph, run_graph, stack_name)
+from config.defaults import EPHEMERAL_FALLBACK_SLOT, POOL_ENV, ephemeral_block
+
+POOL_STACK = stack_name(POOL_ENV, "vpc")
+CLAIM_TAG = "pool-claim:"  # pool stack tag pool-claim:pr-<n> = <slot>
+
+
+def pr_env(pr: int) -> str:
+    return f"pr-{pr}"
+
+
+def choose_slot(env: str, claims: Dict[str, int], shell_slots: Iterable[int]) -> Tuple[int, bool]:
+    """(slot, is_shell) for env: its existing claim, else the lowest free shell, else the lowest free slot"""
+    shell_slots = set(shell_slots)
+    if env in claims:
+        return claims[env], claims[env] in shell_slots
+    taken = set(claims.values())
+    free_shells = sorted(shell_slots - taken)
+    if free_shells:
+        return free_shells[0], True
+    slot = next(s for s in range(EPHEMERAL_FALLBACK_SLOT + 1) if s not in taken | shell_slots)
+    if slot == EPHEMERAL_FALLBACK_SLOT:
+        raise ValueError(f"All {EPHEMERAL_FALLBACK_SLOT} ephemeral slots are claimed")
+    return slot, False
+
+
+class EphemeralRunner(StackRunner):
+    """StackRunner that creates pr-<n> stacks on 'up' and points the vpc stack at its slot"""
+
+    def __init__(self, operation: str, slot_config: Dict[str, str], org: Optional[str] = None):
+        super().__init__(operation, org)
+        self.slot_config = slot_config
+
+    def select(self, name: str):
+        from pulumi import automation as auto
+
+        if self.operation != "up":
+            return super().select(name)
+        with self._select_lock:
+            return auto.create_or_select_stack(stack_name=qualified_stack_name(name, self.org),
+                                               work_dir=self.work_dir)
+
+    def wire_references(self, stack, key: StackKey):
+        from pulumi import automation as auto
+
+        super().wire_references(stack, key)
+        if key[1] == "vpc" and self.operation == "up":
+            for config_key, value in self.slot_config.items():
+                if value:
+                    stack.set_config(config_key, auto.ConfigValue(value))
+                else:
+                    try:
+                        stack.remove_config(config_key)
+                    except auto.CommandError:
+                        pass  # not set
+
+    def __call__(self, key: StackKey) -> StackResult:
+        result = super().__call__(key)
+        if self.operation == "destroy" and result.status == "failed" and "no stack named" in (result.error or ""):
+            result.status, result.error = "succeeded", None  # never created: nothing to destroy
+        return result
+
+
+class Pool:
+    """The pr-pool-vpc stack: its shells (outputs) and the slot claims (stack tags)"""
+
+    def __init__(self, org: Optional[str] = None):
+        from pulumi import automation as auto
+
+        self.name = qualified_stack_name(POOL_STACK, org)
+        self.stack = auto.select_stack(stack_name=self.name, work_dir=PROJECT_DIR)
+
+    def shell_slots(self):
+        shells = self.stack.outputs().get("shells")
+        return [shell["slot"] for shell in (shells.value if shells else [])]
+
+    def claims(self) -> Dict[str, int]:
+        """{'pr-12': 0, 'pr-15': 5}, read from the backend"""
+        tags = self.stack.workspace.list_tags(self.name)
+        return {tag[len(CLAIM_TAG):]: int(slot) for tag, slot in tags.items() if tag.startswith(CLAIM_TAG)}
+
+    def claim(self, env: str) -> Tuple[int, bool]:
+        """(slot, is_shell) claimed for env; re-running up keeps an existing claim"""
+        slot, is_shell = choose_slot(env, self.claims(), self.shell_slots())
+        self.stack.workspace.set_tag(self.name, f"{CLAIM_TAG}{env}", str(slot))
+        return slot, is_shell
+
+    def release(self, env: str) -> Optional[int]:
+        """Drop env's claim; returns the slot it held, if any"""
+        slot = self.claims().get(env)
+        if slot is not None:
+            self.stack.workspace.remove_tag(self.name, f"{CLAIM_TAG}{env}")
+        return slot
+
+
+def up(pr: int, components, org: Optional[str], workers: int) -> int:
+    env = pr_env(pr)
+    pool = Pool(org)
+    slot, is_shell = pool.claim(env)
+    print(f"{env}: slot {slot} ({ephemeral_block(slot)}), {'warm shell' if is_shell else 'new VPC'}")
+
+    runner = EphemeralRunner("up", {
+        "vpc:pool_slot": str(slot),
+        "vpc:pool_stack": pool.name if is_shell else "",
+    }, org=org)
+    return _run(build_graph([env], components), runner, workers)
+
+
+def destroy(pr: int, components, org: Optional[str], workers: int) -> int:
+    from pulumi import automation as auto
+
+    env = pr_env(pr)
+    graph = reverse_graph(build_graph([env], components))
+    runner = EphemeralRunner("destroy", {}, org=org)
+    status = _run(graph, runner, workers)
+    if status:
+        return status  # keep the claim: the slot's block may still be in use
+
+    for env_, component in graph:
+        try:
+            auto.LocalWorkspace(work_dir=runner.work_dir).remove_stack(
+                qualified_stack_name(stack_name(env_, component), org))
+        except auto.CommandError:
+            pass  # never created
+    slot = Pool(org).release(env)
+    print(f"{env}: released slot {slot}" if slot is not None else f"{env}: held no slot")
+    return 0
+
+
+def _run(graph, runner: StackRunner, workers: int) -> int:
+    start = time.perf_counter()
+    results = run_graph(graph, runner, workers=workers)
+    print()
+    print(format_report(results))
+    print(f"\nTotal wall time: {time.perf_counter() - start:.1f}s")
+    return 0 if all(r.status == "succeeded" for r in results.values()) else 1
+
+
+def status(org: Optional[str]) -> int:
+    pool = Pool(org)
+    shells = set(pool.shell_slots())
+    claims = pool.claims()
+    claimed = {slot: env for env, slot in claims.items()}
+    print(f"{'SLOT':>5}  {'CIDR':<18} {'KIND':<6} CLAIMED BY")
+    for slot in sorted(shells | set(claimed)):
+        print(f"{slot:>5}  {ephemeral_block(slot):<18} {'shell' if slot in shells else 'vpc':<6} "
+              f"{claimed.get(slot, '-')}")
+    print(f"\n{len(shells - set(claimed))}/{len(shells)} shells free")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Create or destroy the pr-<n> environment of a pull request")
+    parser.add_argument("command", choices=("up", "destroy", "status"))
+    parser.add_argument("--pr", type=int, help="pull request number (up, destroy)")
+    parser.add_argument("--components", nargs="+", default=["vpc"])
+    parser.add_argument("--workers", type=int, default=4, help="maximum stacks running at once")
+    parser.add_argument("--org", help="Pulumi organization for fully-qualified stack names")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        return status(args.org)
+    if args.pr is None:
+        parser.error(f"{args.command} needs --pr")
+    if args.command == "up":
+        return up(args.pr, args.components, args.org, args.workers)
+    return destroy(args.pr, args.components, args.org, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
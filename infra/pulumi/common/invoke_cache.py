@@ -0,0 +1,142 @@
+"""
+Memoizing wrapper for Pulumi data-source invokes (aws.get_availability_zones,
+aws.iam.get_policy_document, ...).
+
+Results are cached in-process for the lifetime of the program and, when
+PULUMI_INVOKE_CACHE_TTL (seconds) is set, on disk under .cache/invokes so
+repeated previews skip the AWS control-plane round trips.
+"""
+
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+import pulumi
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 ".cache", "invokes")
+
+_memory: Dict[str, Any] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _invoke_name(fn: Callable) -> str:
+    """'pulumi_aws.iam.get_policy_document.get_policy_document' -> 'aws.iam.get_policy_document'"""
+    module = fn.__module__.replace("pulumi_", "", 1)
+    parts = module.split('.')
+    if parts[-1] == fn.__name__:
+        parts = parts[:-1]
+    return '.'.join(parts + [fn.__name__])
+
+
+def _default_region() -> Optional[str]:
+    return pulumi.Config("aws").get("region") or os.environ.get("AWS_REGION")
+
+
+def _provider_key(opts: Optional[pulumi.InvokeOptions], package: str) -> str:
+    provider = getattr(opts, "provider", None) if opts else None
+    parent = getattr(opts, "parent", None) if opts else None
+    if provider is None and parent is not None:  # invokes parented to a component use its provider
+        provider = parent.get_provider(f"{package}:index:invoke")
+    return getattr(provider, "_name", None) or "default"
+
+
+def _cache_key(name: str, provider: str, region: Optional[str], args: dict) -> str:
+    payload = json.dumps({"invoke": name, "provider": provider, "region": region, "args": args},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _ttl() -> int:
+    return int(os.environ.get("PULUMI_INVOKE_CACHE_TTL", "0"))
+
+
+def _cache_dir() -> str:
+    return os.environ.get("PULUMI_INVOKE_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    if hasattr(value, "__dict__"):
+        return {k: _to_jsonable(v) for k, v in vars(value).items()}
+    return value
+
+
+def _read_disk(key: str) -> Optional[SimpleNamespace]:
+    path = os.path.join(_cache_dir(), f"{key}.json")
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("stored_at", 0) > _ttl():
+        return None
+    return SimpleNamespace(**entry["result"])
+
+
+def _write_disk(key: str, name: str, result: Any):
+    directory = _cache_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{key}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"invoke": name, "stored_at": time.time(), "result": _to_jsonable(result)}, f)
+        os.replace(tmp_path, os.path.join(directory, f"{key}.json"))
+    except (OSError, TypeError) as e:
+        pulumi.log.debug(f"Invoke cache: could not persist {name}: {e}")
+
+
+def cached_invoke(fn: Callable, *, opts: Optional[pulumi.InvokeOptions] = None,
+                  region: Optional[str] = None, **kwargs):
+    """Call a Pulumi invoke once per (provider, region, arguments).
+
+    Results read back from the on-disk cache are SimpleNamespace objects with the
+    same top-level attributes as the SDK result (e.g. .names, .json, .arn).
+    """
+    name = _invoke_name(fn)
+    key = _cache_key(name, _provider_key(opts, name.split('.')[0]), region or _default_region(), kwargs)
+    stats = _stats.setdefault(name, {"hits": 0, "disk_hits": 0, "misses": 0})
+
+    if key in _memory:
+        stats["hits"] += 1
+        return _memory[key]
+
+    result = _read_disk(key) if _ttl() > 0 else None
+    if result is not None:
+        stats["disk_hits"] += 1
+    else:
+        stats["misses"] += 1
+        result = fn(**kwargs, opts=opts)
+        if _ttl() > 0:
+            _write_disk(key, name, result)
+
+    _memory[key] = result
+    return result
+
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counts per invoke name"""
+    return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def log_stats():
+    """Report hit/miss counts per invoke"""
+    for name, counts in sorted(_stats.items()):
+        pulumi.log.info(f"Invoke cache {name}: {counts['hits']} hits, "
+                        f"{counts['disk_hits']} disk hits, {counts['misses']} misses")
+
+
+def clear(disk: bool = False):
+    """Drop the in-process cache (and optionally the on-disk cache)"""
+    _memory.clear()
+    _stats.clear()
+    if disk and os.path.isdir(_cache_dir()):
+        for entry in os.listdir(_cache_dir()):
+            if entry.endswith(".json"):
+                os.remove(os.path.join(_cache_dir(), entry))
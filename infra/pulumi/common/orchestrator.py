@@ -0,0 +1,238 @@
+"""
+Parallel multi-stack orchestrator built on the Pulumi Automation API.
+
+Models the <env>-<component> stacks as a dependency graph and deploys
+independent stacks concurrently with a bounded worker pool. Dependents learn
+which stack to reference through '<component>:<dependency>_stack' config
+(e.g. eks:vpc_stack=dev-vpc), which the stack programs read through
+StackReference.
+
+Usage (from infra/pulumi):
+    python -m common.orchestrator up --envs dev staging --components vpc iam eks oidc --workers 4
+    python -m common.orchestrator preview --envs prod
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# component -> components whose outputs it consumes
+STACK_DEPENDENCIES: Dict[str, List[str]] = {
+    "vpc": [],
+    "iam": [],
+    "eks": ["vpc"],       # subnet and VPC ids
+    "oidc": ["eks"],      # cluster OIDC issuer
+}
+
+ENVIRONMENTS = ["dev", "staging", "prod"]
+OPERATIONS = ("up", "preview", "destroy", "refresh")
+
+StackKey = Tuple[str, str]  # (env, component)
+
+
+@dataclass
+class StackResult:
+    """Outcome of one stack operation"""
+    stack_name: str
+    operation: str
+    status: str = "pending"  # pending, succeeded, failed, skipped
+    wall_time: float = 0.0
+    changes: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def stack_name(env: str, component: str) -> str:
+    return f"{env}-{component}"
+
+
+def reference_config_key(component: str, dependency: str) -> str:
+    """Config key a dependent stack reads to find the stack it references"""
+    return f"{component}:{dependency}_stack"
+
+
+def qualified_stack_name(name: str, org: Optional[str] = None, project: str = "multi-env-infra") -> str:
+    """Stack name in the form accepted by pulumi.StackReference"""
+    return f"{org}/{project}/{name}" if org else name
+
+
+def build_graph(envs: List[str], components: List[str]) -> Dict[StackKey, List[StackKey]]:
+    """Return {(env, component): [dependency keys]} for the requested stacks.
+
+    Dependencies outside the requested set are assumed to be deployed already
+    and are not waited on.
+    """
+    unknown = set(components) - set(STACK_DEPENDENCIES)
+    if unknown:
+        raise ValueError(f"Unknown components: {', '.join(sorted(unknown))}")
+
+    graph = {}
+    for env in envs:
+        for component in components:
+            graph[(env, component)] = [(env, dep) for dep in STACK_DEPENDENCIES[component]
+                                       if dep in components]
+    return graph
+
+
+def reverse_graph(graph: Dict[StackKey, List[StackKey]]) -> Dict[StackKey, List[StackKey]]:
+    """Invert dependencies, used for destroy (dependents go first)"""
+    reversed_graph = {key: [] for key in graph}
+    for key, deps in graph.items():
+        for dep in deps:
+            reversed_graph[dep].append(key)
+    return reversed_graph
+
+
+def topological_waves(graph: Dict[StackKey, List[StackKey]]) -> List[List[StackKey]]:
+    """Group stacks into waves that can run concurrently; raises on cycles"""
+    remaining = {key: set(deps) for key, deps in graph.items()}
+    waves = []
+    while remaining:
+        ready = sorted(key for key, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Dependency cycle between stacks: {sorted(remaining)}")
+        waves.append(ready)
+        for key in ready:
+            del remaining[key]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return waves
+
+
+def run_graph(graph: Dict[StackKey, List[StackKey]], task: Callable[[StackKey], StackResult],
+              workers: int = 4) -> Dict[StackKey, StackResult]:
+    """Run task for every stack as soon as its dependencies succeed.
+
+    Stacks whose dependencies failed are marked skipped. At most `workers`
+    tasks run at the same time.
+    """
+    topological_waves(graph)  # fail fast on cycles
+
+    results: Dict[StackKey, StackResult] = {}
+    pending = dict(graph)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for key in sorted(pending):
+                deps = pending[key]
+                if any(results.get(dep) and results[dep].status != "succeeded" for dep in deps):
+                    results[key] = StackResult(stack_name(*key), "", status="skipped",
+                                               error="dependency did not succeed")
+                    del pending[key]
+                elif all(dep in results for dep in deps):
+                    running[pool.submit(task, key)] = key
+                    del pending[key]
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                try:
+                    results[key] = future.result()
+                except Exception as e:  # task errors are reported, not raised
+                    results[key] = StackResult(stack_name(*key), "", status="failed", error=str(e))
+    return results
+
+
+class StackRunner:
+    """Runs one Pulumi operation against an existing <env>-<component> stack"""
+
+    def __init__(self, operation: str, org: Optional[str] = None, work_dir: str = PROJECT_DIR,
+                 on_output: Optional[Callable[[str], None]] = None):
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}'")
+        self.operation = operation
+        self.org = org
+        self.work_dir = work_dir
+        self.on_output = on_output
+        # 'pulumi stack select' writes workspace state; serialize it across threads
+        self._select_lock = threading.Lock()
+
+    def select(self, name: str):
+        from pulumi import automation as auto
+
+        with self._select_lock:
+            return auto.select_stack(stack_name=qualified_stack_name(name, self.org),
+                                     work_dir=self.work_dir)
+
+    def wire_references(self, stack, key: StackKey):
+        """Point the stack at the exact dependency stacks it consumes"""
+        from pulumi import automation as auto
+
+        env, component = key
+        for dep in STACK_DEPENDENCIES[component]:
+            ref = qualified_stack_name(stack_name(env, dep), self.org)
+            stack.set_config(reference_config_key(component, dep), auto.ConfigValue(ref))
+
+    def __call__(self, key: StackKey) -> StackResult:
+        name = stack_name(*key)
+        result = StackResult(name, self.operation)
+        start = time.perf_counter()
+        try:
+            stack = self.select(name)
+            self.wire_references(stack, key)
+            output = self.on_output or (lambda line: print(f"[{name}] {line.rstrip()}"))
+
+            if self.operation == "up":
+                summary = stack.up(on_output=output).summary
+                result.changes = dict(summary.resource_changes or {})
+            elif self.operation == "preview":
+                result.changes = dict(stack.preview(on_output=output).change_summary or {})
+            elif self.operation == "refresh":
+                summary = stack.refresh(on_output=output).summary
+                result.changes = dict(summary.resource_changes or {})
+            else:
+                summary = stack.destroy(on_output=output).summary
+                result.changes = dict(summary.resource_changes or {})
+            result.status = "succeeded"
+        except Exception as e:
+            result.status = "failed"
+            result.error = str(e).strip().splitlines()[-1] if str(e).strip() else repr(e)
+        finally:
+            result.wall_time = time.perf_counter() - start
+        return result
+
+
+def format_report(results: Dict[StackKey, StackResult]) -> str:
+    """Per-stack wall time and change summary"""
+    lines = [f"{'STACK':<20} {'STATUS':<10} {'WALL(s)':>8}  CHANGES"]
+    for key in sorted(results, key=lambda k: results[k].wall_time, reverse=True):
+        r = results[key]
+        changes = ", ".join(f"{op}={n}" for op, n in sorted(r.changes.items())) or "-"
+        lines.append(f"{r.stack_name:<20} {r.status:<10} {r.wall_time:>8.1f}  {changes}")
+        if r.error:
+            lines.append(f"{'':<20} error: {r.error}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Deploy <env>-<component> stacks in dependency order")
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("--envs", nargs="+", default=ENVIRONMENTS)
+    parser.add_argument("--components", nargs="+", default=list(STACK_DEPENDENCIES))
+    parser.add_argument("--workers", type=int, default=4, help="maximum stacks running at once")
+    parser.add_argument("--org", help="Pulumi organization for fully-qualified stack references")
+    args = parser.parse_args(argv)
+
+    graph = build_graph(args.envs, args.components)
+    if args.operation == "destroy":
+        graph = reverse_graph(graph)
+
+    start = time.perf_counter()
+    results = run_graph(graph, StackRunner(args.operation, org=args.org), workers=args.workers)
+    print()
+    print(format_report(results))
+    print(f"\nTotal wall time: {time.perf_counter() - start:.1f}s")
+    return 0 if all(r.status == "succeeded" for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
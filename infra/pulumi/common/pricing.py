@@ -0,0 +1,305 @@
+"""
+Preview-time cost model shared by all components.
+
+Components register the billable resources they create (NAT Gateways, EIPs,
+interface endpoints, ...) as line items, and the VPC stack adds data-transfer
+estimates from the expected GB/month per subnet tier (cost:*_gb config). Items
+are priced from the versioned, per-region table in config/prices.yaml. At the
+end of every program run dispatch_stack exports the breakdown as
+'cost_breakdown' and fails the run if it exceeds cost:monthly_budget.
+
+Usage (from infra/pulumi):
+    python -m common.pricing nat --env staging
+    python -m common.pricing nat --env prod --strategy zonal-pairs --azs 3
+    python -m common.pricing prices --region eu-west-1
+"""
+
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional
+
+import pulumi
+import yaml
+
+from config.resolver import load_config
+
+PRICES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "prices.yaml")
+
+_items: List["LineItem"] = []
+_region: Optional[str] = None  # set by in_region() for multi-region stacks
+
+
+class PricingError(ValueError):
+    """Price table missing or malformed"""
+
+
+class BudgetExceededError(Exception):
+    """Estimated monthly cost is above cost:monthly_budget"""
+
+
+@dataclass(frozen=True)
+class LineItem:
+    """One billable thing: `quantity` resource-hours or GB per month of `price_key`"""
+    component: str
+    resource: str
+    price_key: str
+    quantity: float
+    unit: str  # hours or GB
+    region: Optional[str] = None  # None = priced in the breakdown's region
+
+
+@lru_cache(maxsize=None)
+def load_price_table(path: str = PRICES_FILE) -> dict:
+    if not os.path.exists(path):
+        raise PricingError(f"Price table {path} not found")
+    with open(path) as f:
+        table = yaml.safe_load(f) or {}
+    if "version" not in table or "regions" not in table:
+        raise PricingError(f"Price table {path} needs 'version' and 'regions'")
+    return table
+
+
+def price_table_version() -> str:
+    return str(load_price_table()["version"])
+
+
+def hours_per_month() -> int:
+    return int(load_price_table().get("hours_per_month", 730))
+
+
+@lru_cache(maxsize=None)
+def prices(region: str) -> Dict[str, float]:
+    """Flat {price_key: USD} for a region; instance types become 'ec2:<type>'
+
+    A region missing from the table is valid (any REGION_PATTERN region can be
+    deployed to): it has no prices, so its items are reported as unpriced.
+    """
+    regions = load_price_table()["regions"]
+    if region not in regions:
+        pulumi.log.warn(f"No prices for region '{region}' in price table {price_table_version()} "
+                        f"(have: {', '.join(sorted(regions))}) - its items are unpriced")
+        return {}
+    flat = {}
+    for key, value in regions[region].items():
+        if isinstance(value, dict):
+            flat.update({f"{key}:{sub}": float(v) for sub, v in value.items()})
+        else:
+            flat[key] = float(value)
+    return flat
+
+
+def hourly(component: str, resource: str, price_key: str, count: int = 1) -> LineItem:
+    """Always-on resource(s), billed for every hour of the month"""
+    return LineItem(component, resource, price_key, count * hours_per_month(), "hours")
+
+
+def usage(component: str, resource: str, price_key: str, gb: float) -> LineItem:
+    """Per-GB charge for an expected monthly volume"""
+    return LineItem(component, resource, price_key, gb, "GB")
+
+
+def register(*items: LineItem):
+    """Add line items to this program run's cost breakdown"""
+    _items.extend(replace(item, region=_region) if _region and not item.region else item for item in items)
+
+
+@contextmanager
+def in_region(region: Optional[str]):
+    """Price items registered inside the block in `region` (e.g. a VPC in another region)"""
+    global _region
+    previous, _region = _region, region
+    try:
+        yield
+    finally:
+        _region = previous
+
+
+def items() -> List[LineItem]:
+    return list(_items)
+
+
+def item_cost(item: LineItem, region: str) -> Optional[float]:
+    """Monthly USD for an item, or None if the table has no price for it"""
+    price = prices(item.region or region).get(item.price_key)
+    return None if price is None else item.quantity * price
+
+
+def _warn_unpriced(item: LineItem, region: str):
+    pulumi.log.warn(f"No price for '{item.price_key}' in {item.region or region} (price table " +
+                    f"{price_table_version()}) - {item.resource} excluded from cost estimate")
+
+
+def monthly_cost(line_items: List[LineItem], region: str) -> float:
+    """Sum of priced items; unpriced items are logged and excluded"""
+    total = 0.0
+    for item in line_items:
+        cost = item_cost(item, region)
+        if cost is None:
+            _warn_unpriced(item, region)
+            continue
+        total += cost
+    return total
+
+
+def estimate_data_transfer(component: str, traffic: Mapping[str, Mapping[str, float]],
+                           nat_placement: Mapping[str, str], nat_processing: bool = True,
+                           gateway_endpoints: bool = False, interface_endpoints: bool = False) -> List[LineItem]:
+    """Data-transfer line items from expected GB/month per subnet tier.
+
+    traffic: {"internet": {tier: GB}, "s3_dynamodb": {tier: GB}, "aws_api": {tier: GB},
+    "cross_az": {tier: GB}}. Traffic is assumed to be spread evenly over a tier's AZs.
+    Non-public tiers reach the internet, S3/DynamoDB (without gateway endpoints) and
+    AWS APIs (without interface endpoints) through NAT: NAT Gateways charge per GB
+    processed, and AZs whose NAT lives in another AZ add cross-AZ transfer.
+    """
+    line_items = []
+    through_nat: Dict[str, float] = {}
+
+    for tier, gb in traffic.get("internet", {}).items():
+        line_items.append(usage(component, f"{tier} internet egress", "internet_egress_gb", gb))
+        if tier != "public":
+            through_nat[tier] = through_nat.get(tier, 0) + gb
+    for tier, gb in traffic.get("s3_dynamodb", {}).items():
+        if tier != "public" and not gateway_endpoints:
+            through_nat[tier] = through_nat.get(tier, 0) + gb
+    for tier, gb in traffic.get("aws_api", {}).items():
+        if tier == "public":
+            continue
+        if interface_endpoints:
+            line_items.append(usage(component, f"{tier} interface endpoint processing",
+                                    "vpc_endpoint_interface_gb", gb))
+        else:
+            through_nat[tier] = through_nat.get(tier, 0) + gb
+    for tier, gb in traffic.get("cross_az", {}).items():
+        line_items.append(usage(component, f"{tier} cross-AZ traffic", "cross_az_gb", gb))
+
+    if nat_placement:
+        cross_az_share = sum(1 for az, nat_az in nat_placement.items() if az != nat_az) / len(nat_placement)
+        for tier, gb in through_nat.items():
+            if nat_processing:
+                line_items.append(usage(component, f"{tier} NAT data processing", "nat_gateway_gb", gb))
+            if cross_az_share:
+                line_items.append(usage(component, f"{tier} cross-AZ to NAT", "cross_az_gb",
+                                        gb * cross_az_share))
+
+    return [item for item in line_items if item.quantity > 0]
+
+
+def breakdown(region: str, line_items: Optional[List[LineItem]] = None) -> dict:
+    """Per-item and per-component monthly cost, ready to export
+
+    Unpriced items are logged and listed under 'unpriced': the total (and the
+    budget check) does not include them.
+    """
+    line_items = _items if line_items is None else line_items
+    rows, by_component, unpriced = [], {}, []
+    for item in line_items:
+        cost = item_cost(item, region)
+        row = asdict(item)
+        row["monthly"] = None if cost is None else round(cost, 2)
+        rows.append(row)
+        by_component[item.component] = round(by_component.get(item.component, 0) + (cost or 0), 2)
+        if cost is None:
+            _warn_unpriced(item, region)
+            unpriced.append(f"{item.component} {item.resource} ({item.price_key}, {item.region or region})")
+    return {
+        "price_table": price_table_version(),
+        "region": region,
+        "currency": "USD",
+        "monthly_total": round(sum(by_component.values()), 2),
+        "by_component": by_component,
+        "items": rows,
+        "unpriced": unpriced,
+    }
+
+
+def finalize(env: str, component: Optional[str] = None) -> dict:
+    """Export this run's cost breakdown and enforce the environment budget.
+
+    'cost:<component>_monthly_budget', where the schema has one, replaces
+    cost:monthly_budget for that component's stacks.
+    """
+    cfg = load_config(env)
+    report = breakdown(cfg["aws:region"])
+    total = report["monthly_total"]
+    pulumi.export("cost_breakdown", report)
+
+    budget_key = "cost:monthly_budget"
+    if component and cfg.get(f"cost:{component}_monthly_budget") is not None:
+        budget_key = f"cost:{component}_monthly_budget"
+    budget = cfg[budget_key]
+    pulumi.log.info(f"Estimated monthly cost: ${total:.2f}" +
+                    (f" (budget ${budget} from {cfg.source(budget_key)})" if budget is not None else "") +
+                    (f", excluding {len(report['unpriced'])} unpriced items" if report["unpriced"] else ""))
+    if budget is not None and total > budget:
+        top = sorted((r for r in report["items"] if r["monthly"]), key=lambda r: r["monthly"], reverse=True)[:3]
+        raise BudgetExceededError(
+            f"Estimated monthly cost ${total:.2f} exceeds the '{env}' budget of ${budget} ({budget_key}). " +
+            "Largest items: " + ", ".join(f"{r['component']} {r['resource']} ${r['monthly']:.2f}" for r in top))
+    return report
+
+
+def clear():
+    """Forget registered line items (tests run many programs in one process)"""
+    _items.clear()
+
+
+def _print_items(line_items: List[LineItem], region: str):
+    for item in line_items:
+        cost = item_cost(item, region)
+        amount = f"${cost:>9.2f}" if cost is not None else "  unpriced"
+        quantity = f"{item.quantity / hours_per_month():g} x" if item.unit == "hours" else f"{item.quantity:g} GB"
+        print(f"  {quantity:>10} {item.resource:<32} {amount}/month")
+    print(f"  {'':>10} {'Total':<32} ${monthly_cost(line_items, region):>9.2f}/month")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Estimate AWS costs from the local price table")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    nat = sub.add_parser("nat", help="fixed monthly cost of a NAT strategy")
+    nat.add_argument("--env", default="dev", help="environment whose config defaults to use")
+    nat.add_argument("--strategy", help="override vpc:nat_strategy")
+    nat.add_argument("--azs", type=int, help="override vpc:subnet_count")
+    nat.add_argument("--nat-count", type=int, help="override vpc:nat_count (zonal-pairs)")
+    nat.add_argument("--instance-type", help="override vpc:nat_instance_type")
+    nat.add_argument("--region", help="override aws:region")
+
+    show = sub.add_parser("prices", help="print the price table for a region")
+    show.add_argument("--region", default="us-east-1")
+
+    args = parser.parse_args(argv)
+    if args.command == "prices":
+        if not prices(args.region):
+            return 1
+        print(f"Price table {price_table_version()} ({args.region}, USD):")
+        for key, value in sorted(prices(args.region).items()):
+            print(f"  {key:<32} {value:g}")
+        return 0
+
+    from modules.vpc.nat_gateway import nat_cost_items, plan_nat_placement
+
+    cfg = load_config(args.env)
+    strategy = args.strategy or cfg["vpc:nat_strategy"]
+    region = args.region or cfg["aws:region"]
+    azs = [f"az-{i + 1}" for i in range(args.azs or cfg["vpc:subnet_count"])]
+    if strategy == "none":
+        print("NAT strategy 'none': no NAT resources")
+        return 0
+
+    placement = plan_nat_placement(azs, strategy, args.nat_count or cfg["vpc:nat_count"] or None)
+    line_items = nat_cost_items("nat", strategy, len(set(placement.values())),
+                                args.instance_type or cfg["vpc:nat_instance_type"])
+    print(f"NAT strategy '{strategy}' in {region} ({len(azs)} AZs, price table {price_table_version()}):")
+    _print_items(line_items, region)
+    if strategy != "instance":
+        print(f"  plus ${prices(region)['nat_gateway_gb']}/GB processed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Cached StackReference lookups for consuming other <env>-<component> stacks.
+
+Each referenced stack is resolved once per program run, no matter how many
+modules read outputs from it.
+"""
+
+from typing import Dict, List
+
+import pulumi
+
+from config.resolver import load_config
+
+_references: Dict[str, pulumi.StackReference] = {}
+
+# Outputs every <env>-vpc stack exports for downstream stacks
+VPC_OUTPUTS: List[str] = ["vpc_id", "public_subnet_ids", "private_subnet_ids"]
+
+
+def get_stack_reference(stack_name: str) -> pulumi.StackReference:
+    """Return the (single) StackReference for a stack"""
+    if stack_name not in _references:
+        _references[stack_name] = pulumi.StackReference(stack_name)
+    return _references[stack_name]
+
+
+def dependency_stack_name(env: str, component: str, dependency: str) -> str:
+    """Stack a component consumes, e.g. ('dev', 'eks', 'vpc') -> 'dev-vpc'.
+
+    Overridable through '<component>:<dependency>_stack' config, which the
+    orchestrator sets to the exact stack it deployed.
+    """
+    return load_config(env).get(f"{component}:{dependency}_stack") or f"{env}-{dependency}"
+
+
+def require_output(env: str, component: str, dependency: str, key: str) -> pulumi.Output:
+    """Required output of the <env>-<dependency> stack"""
+    ref = get_stack_reference(dependency_stack_name(env, component, dependency))
+    return ref.require_output(key)
+
+
+def get_vpc_outputs(env: str, component: str) -> Dict[str, pulumi.Output]:
+    """vpc_id, public_subnet_ids and private_subnet_ids of the <env>-vpc stack"""
+    return {key: require_output(env, component, "vpc", key) for key in VPC_OUTPUTS}
+
+
+def clear():
+    """Forget resolved references (used between test runs)"""
+    _references.clear()
@@ -1,10 +1,97 @@
 import importlib
+import os
+import sys
+import time
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import pulumi
 from pulumi import get_stack
+from common import invoke_cache, pricing, tagging, tracing
+from config.resolver import load_config
+
+# Component registry: component name -> module path of its stack program.
+# Nothing here is imported until a stack for that component is dispatched,
+# so provider SDKs (pulumi_aws, pulumi_eks, ...) only load on the path that needs them.
+COMPONENT_REGISTRY: Dict[str, str] = {
+    "vpc": "modules.vpc.vpc_stack",
+    "iam": "modules.iam.iam_stack",
+    "eks": "modules.eks.eks_stack",
+    "oidc": "modules.oidc.oidc_stack",
+}
+
+# Import-time profile per dispatched component, e.g.
+# {"vpc": {"module": "modules.vpc.vpc_stack", "seconds": 0.84, "providers": ["pulumi_aws"]}}
+IMPORT_PROFILE: Dict[str, dict] = {}
+
+
+def register_component(component: str, module_path: str):
+    """Register (or override) the stack program for a component"""
+    COMPONENT_REGISTRY[component] = module_path
+    load_component.cache_clear()
+
+
+def parse_stack_name(stack_name: str) -> Tuple[str, str]:
+    """Split a stack name into (env, component).
+
+    The component is the first registered component found in the name, so extra
+    qualifiers are allowed on either side:
+    'dev-vpc' -> ('dev', 'vpc'), 'prod-vpc-eu' -> ('prod', 'vpc'),
+    'pr-123-vpc' -> ('pr-123', 'vpc').
+    """
+    parts = stack_name.split('-')
+    for i, part in enumerate(parts[1:], start=1):
+        if part in COMPONENT_REGISTRY:
+            return '-'.join(parts[:i]), part
+    raise ValueError(f"Stack name '{stack_name}' does not contain a registered component "
+                     f"({', '.join(sorted(COMPONENT_REGISTRY))}); expected '<env>-<component>'")
+
+
+@lru_cache(maxsize=None)
+def load_component(component: str):
+    """Import the stack program for a component, recording per-module import time"""
+    if component not in COMPONENT_REGISTRY:
+        raise ValueError(f"Unknown component '{component}'")
+
+    before = set(sys.modules)
+    start = time.perf_counter()
+    module = importlib.import_module(COMPONENT_REGISTRY[component])
+    loaded = {name.split('.')[0] for name in set(sys.modules) - before}
+
+    IMPORT_PROFILE[component] = {
+        "module": COMPONENT_REGISTRY[component],
+        "seconds": round(time.perf_counter() - start, 4),
+        "providers": sorted(p for p in loaded if p.startswith("pulumi_")),
+    }
+    return module
+
+
+def _emit_import_profile(component: str):
+    """Log the import profile and, when PULUMI_STARTUP_PROFILE is set, export it"""
+    profile = IMPORT_PROFILE.get(component)
+    if profile is None:
+        return
+    pulumi.log.debug(f"Startup import profile: {profile['module']} took "
+                     f"{profile['seconds'] * 1000:.1f}ms "
+                     f"(providers loaded: {', '.join(profile['providers']) or 'none'})")
+    if os.environ.get("PULUMI_STARTUP_PROFILE"):
+        pulumi.export("startup_import_profile", profile)
+
 
 # Dynamically dispatch to the correct stack module
 def dispatch_stack():
-    stack = get_stack()  # e.g., "dev-vpc" or "dev-eks"
-    env, component = stack.split('-')  # "dev", "vpc"
-    module_path = f"modules.{component}.{component}_stack"
-    module = importlib.import_module(module_path)
+    stack = get_stack()  # e.g., "dev-vpc", "prod-vpc-eu" or "pr-123-vpc"
+    env, component = parse_stack_name(stack)  # "dev", "vpc"
+    module = load_component(component)
+    _emit_import_profile(component)
+    cfg = load_config(env)
+    for line in cfg.describe():  # resolve and validate config once, up front
+        pulumi.log.debug(f"Config {line}")
+    tag_policy = tagging.install(env, component, cfg.namespace("tags"))  # Environment, Component, CostCenter, tags:*
+    tracer = tracing.install()  # PULUMI_TRACE_FILE: record registrations for a flame graph
     module.run(env)  # Pass environment name like "dev"
+    pricing.finalize(env, component)  # export cost_breakdown, fail if over cost:monthly_budget
+    invoke_cache.log_stats()
+    tag_policy.log_stats()
+    if tracer:
+        tracer.finish()
@@ -0,0 +1,123 @@
+"""
+Stack-wide tag policy for stack programs.
+
+dispatch_stack installs one stack transformation that merges the stack's tags
+into every resource with a `tags` input, so components only set the tags that
+describe the resource itself (Name, Type, AvailabilityZone, kubernetes.io/...):
+
+    Environment  <env>                      (reserved: deploy role conditions use it)
+    Component    <component>                (reserved: vpc, iam, eks, oidc)
+    Project      tags:project or the Pulumi project name
+    CostCenter   tags:cost-center or COST_CENTERS[component]
+    ManagedBy    Pulumi
+    ...          any other tags:<key>, e.g. tags:owner -> Owner
+
+Tags a resource sets itself win over stack tags. Auto Scaling groups get the
+stack tags as propagate-at-launch tags, and launch template tag specifications
+get them too, so instances and volumes are attributed like everything else.
+
+Activate Environment, Component and CostCenter as cost allocation tags (Billing
+console) to split NAT, data transfer and EC2 spend by component in Cost Explorer.
+"""
+
+import copy
+import re
+from typing import Any, Dict, Mapping, Optional
+
+import pulumi
+
+MANAGED_BY = "Pulumi"
+RESERVED_TAGS = ("Environment", "Component")
+
+# Default CostCenter per component; tags:cost-center replaces it for the whole stack
+COST_CENTERS: Dict[str, str] = {
+    "vpc": "networking",
+    "eks": "compute",
+    "iam": "platform",
+    "oidc": "platform",
+}
+
+
+def tag_key(config_key: str) -> str:
+    """'cost-center' -> 'CostCenter', 'owner' -> 'Owner', 'DataClass' -> 'DataClass'"""
+    return "".join(part[:1].upper() + part[1:] for part in re.split(r"[-_]", config_key) if part)
+
+
+def stack_tags(env: str, component: str, overrides: Mapping[str, str], project: Optional[str] = None) -> Dict[str, str]:
+    """Tags for every resource of the <env>-<component> stack; overrides are tags:* config (without the prefix)"""
+    tags = {
+        "Environment": env,
+        "Component": component,
+        "Project": project or pulumi.get_project(),
+        "CostCenter": COST_CENTERS.get(component, component),
+        "ManagedBy": MANAGED_BY,
+    }
+    for key, value in overrides.items():
+        name = tag_key(key)
+        if name in RESERVED_TAGS:
+            raise ValueError(f"tags:{key} would override the {name} tag, which is set from the stack name")
+        tags[name] = str(value)
+    return tags
+
+
+def _merge(defaults: Dict[str, str], tags: Any) -> Any:
+    """defaults under a tags input (dict, Output of a dict or None)"""
+    if tags is None:
+        return dict(defaults)
+    if isinstance(tags, pulumi.Output):
+        return tags.apply(lambda t: {**defaults, **(t or {})})
+    return {**defaults, **tags}
+
+
+def _group_tag_key(tag: Any) -> Any:
+    return tag.get("key") if isinstance(tag, dict) else tag.key
+
+
+class TagPolicy:
+    """Applies stack tags through a stack transformation and counts what it tagged"""
+
+    def __init__(self, tags: Dict[str, str]):
+        self.tags = tags
+        self.tagged: Dict[str, int] = {}
+
+    def transformation(self, args: pulumi.ResourceTransformationArgs):
+        """Stack transformation: merge the stack tags into taggable resources"""
+        props = args.props
+        if not props or "tags" not in props:  # local components register without props
+            return None
+
+        props = dict(props)
+        tags = props["tags"]
+        if isinstance(tags, (list, tuple)):  # aws.autoscaling.Group: [GroupTagArgs(key, value, propagate_at_launch)]
+            import pulumi_aws as aws
+
+            present = {_group_tag_key(t) for t in tags}
+            props["tags"] = list(tags) + [aws.autoscaling.GroupTagArgs(key=k, value=v, propagate_at_launch=True)
+                                          for k, v in self.tags.items() if k not in present]
+        else:
+            props["tags"] = _merge(self.tags, tags)
+
+        if props.get("tag_specifications"):  # aws.ec2.LaunchTemplate: tags of launched instances/volumes
+            specifications = []
+            for spec in props["tag_specifications"]:
+                spec = copy.copy(spec)
+                if isinstance(spec, dict):
+                    spec["tags"] = _merge(self.tags, spec.get("tags"))
+                else:
+                    pulumi.set(spec, "tags", _merge(self.tags, pulumi.get(spec, "tags")))
+                specifications.append(spec)
+            props["tag_specifications"] = specifications
+
+        self.tagged[args.type_] = self.tagged.get(args.type_, 0) + 1
+        return pulumi.ResourceTransformationResult(props, args.opts)
+
+    def log_stats(self):
+        pulumi.log.debug(f"Tag policy: {sum(self.tagged.values())} resources of {len(self.tagged)} types "
+                         f"tagged with {', '.join(f'{k}={v}' for k, v in self.tags.items())}")
+
+
+def install(env: str, component: str, overrides: Mapping[str, str]) -> TagPolicy:
+    """Register the stack's tag policy; call before the stack program creates resources"""
+    policy = TagPolicy(stack_tags(env, component, overrides))
+    pulumi.runtime.register_stack_transformation(policy.transformation)
+    return policy
@@ -0,0 +1,265 @@
+"""
+Resource registration tracing for stack programs.
+
+When PULUMI_TRACE_FILE is set, dispatch_stack installs a stack transformation
+that records every resource registration: its parent component, the resources
+it depends on (explicit depends_on and Output inputs), and the time from
+registration to output resolution (urn, plus id for custom resources).
+
+Once every output has resolved the trace is written to PULUMI_TRACE_FILE:
+- *.folded: folded stacks (stack;component;resource <ms>) for flamegraph.pl/speedscope
+- anything else: Chrome trace events JSON for chrome://tracing, Perfetto or speedscope
+
+A summary (fan-out per component and the critical path) is logged as well.
+
+    PULUMI_TRACE_FILE=trace.json pulumi preview --stack prod-vpc
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import pulumi
+
+STACK_ROOT = "stack"
+
+
+@dataclass
+class TraceEntry:
+    """One resource registration; parent and deps are '<type>::<name>' keys"""
+    name: str
+    type: str
+    parent: Optional[str]  # None for resources parented to the stack
+    custom: bool
+    registered: float  # seconds since tracing started
+    resolved: Optional[float] = None
+    deps: List[str] = field(default_factory=list)
+    failed: bool = False
+
+    @property
+    def key(self) -> str:
+        return f"{self.type}::{self.name}"
+
+    @property
+    def label(self) -> str:
+        """'Vpc:prod-vpc-vpc', 'VpcBase:prod-vpc'"""
+        return f"{self.type.rsplit(':', 1)[-1]}:{self.name}"
+
+    @property
+    def duration(self) -> float:
+        return (self.resolved if self.resolved is not None else self.registered) - self.registered
+
+
+def _outputs(value: Any, depth: int = 0):
+    """Output objects anywhere in a resource's input properties"""
+    if isinstance(value, pulumi.Output):
+        yield value
+    elif depth > 4 or isinstance(value, (str, bytes, int, float, bool, pulumi.Resource)) or value is None:
+        return
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _outputs(v, depth + 1)
+    elif isinstance(value, (list, tuple, set)):
+        for v in value:
+            yield from _outputs(v, depth + 1)
+    elif hasattr(value, "__dict__"):  # input type classes (aws.ec2.XArgs, ...)
+        yield from _outputs(vars(value), depth + 1)
+
+
+class Tracer:
+    """Collects TraceEntry records through a stack transformation"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start = time.perf_counter()
+        self.entries: Dict[str, TraceEntry] = {}
+        self.pending = 0
+        self.finished = False
+        self.written = False
+        # Component names repeat across types (VpcBase, NatGatewayGroup, ... are all '<env>-vpc'),
+        # so resources are looked up by identity
+        self._keys: Dict[int, str] = {}
+        self._resources: List[pulumi.Resource] = []
+
+    def _now(self) -> float:
+        return time.perf_counter() - self.start
+
+    def transformation(self, args: pulumi.ResourceTransformationArgs):
+        """Stack transformation: record the registration, leave the resource unchanged"""
+        if args.type_ == "pulumi:pulumi:Stack":
+            return None
+        opts = args.opts or pulumi.ResourceOptions()
+        key = f"{args.type_}::{args.name}"
+        entry = TraceEntry(args.name, args.type_, self._keys.get(id(opts.parent)),
+                           isinstance(args.resource, pulumi.CustomResource), self._now())
+        self.entries[key] = entry
+        self._keys[id(args.resource)] = key
+        self._resources.append(args.resource)
+        self.pending += 1
+
+        # The coroutine first runs once the constructor has returned, so resource.urn exists by then;
+        # wrapping it in an Output keeps the program alive until it completes
+        pulumi.Output.from_input(self._track(entry, args.resource, args.props, opts)).apply(lambda _: None)
+        return None
+
+    async def _track(self, entry: TraceEntry, resource: pulumi.Resource, props: dict,
+                     opts: pulumi.ResourceOptions):
+        try:
+            deps = set()
+            depends_on = opts.depends_on if isinstance(opts.depends_on, (list, tuple)) else [opts.depends_on]
+            deps.update(r for r in depends_on if isinstance(r, pulumi.Resource))
+            for output in _outputs(props):
+                deps.update(await output.resources())
+            entry.deps = sorted({self._keys[id(r)] for r in deps if id(r) in self._keys} - {entry.key})
+
+            await resource.urn.future()
+            if entry.custom:
+                await resource.id.future()
+        except Exception:  # registration failures are reported by the engine, not the trace
+            entry.failed = True
+        finally:
+            entry.resolved = self._now()
+            self.pending -= 1
+            self._maybe_write()
+
+    def finish(self):
+        """Called once the stack program has returned; the trace is written when outputs settle"""
+        self.finished = True
+        self._maybe_write()
+
+    def _maybe_write(self):
+        if not self.finished or self.pending:
+            return
+        write_trace(self.path, self.entries)
+        summary = summarize(self.entries)
+        pulumi.log.info(f"Trace: {summary['resources']} resources in {summary['total_seconds']:.2f}s "
+                        f"written to {self.path}")
+        for component in summary["components"][:5]:
+            pulumi.log.info(f"Trace: {component['name']} {component['descendants']} resources "
+                            f"({component['children']} direct) in {component['seconds']:.2f}s")
+        pulumi.log.info(f"Trace: critical path {' -> '.join(summary['critical_path'])} "
+                        f"({summary['critical_path_seconds']:.2f}s)")
+        self.written = True
+
+
+def component_path(entries: Dict[str, TraceEntry], key: str) -> List[str]:
+    """Keys from the top-level component down to `key`"""
+    path = [key]
+    parent = entries[key].parent
+    while parent is not None and parent in entries and parent not in path:
+        path.insert(0, parent)
+        parent = entries[parent].parent
+    return path
+
+
+def _subtree_ends(entries: Dict[str, TraceEntry]) -> Dict[str, float]:
+    """Latest resolution time of each resource and everything parented under it"""
+    ends = {key: e.resolved if e.resolved is not None else e.registered for key, e in entries.items()}
+    for key in entries:
+        for ancestor in component_path(entries, key)[:-1]:
+            ends[ancestor] = max(ends[ancestor], ends[key])
+    return ends
+
+
+def critical_path(entries: Dict[str, TraceEntry]) -> List[str]:
+    """Dependency chain ending at the last resource to resolve, following the latest dependency"""
+    resolved = {k: e for k, e in entries.items() if e.resolved is not None}
+    if not resolved:
+        return []
+    key = max(resolved, key=lambda k: resolved[k].resolved)
+    path = [key]
+    while True:
+        deps = [d for d in resolved[key].deps if d in resolved and d not in path]
+        if not deps:
+            return path
+        key = max(deps, key=lambda d: resolved[d].resolved)
+        path.insert(0, key)
+
+
+def summarize(entries: Dict[str, TraceEntry]) -> dict:
+    """Fan-out and elapsed time per component, plus the critical path (as labels)"""
+    children: Dict[str, int] = {}
+    descendants: Dict[str, int] = {}
+    for key, entry in entries.items():
+        if entry.parent in entries:
+            children[entry.parent] = children.get(entry.parent, 0) + 1
+        for ancestor in component_path(entries, key)[:-1]:
+            descendants[ancestor] = descendants.get(ancestor, 0) + 1
+    ends = _subtree_ends(entries)
+
+    components = [{"name": entries[key].label, "type": entries[key].type, "children": children[key],
+                   "descendants": descendants[key], "seconds": ends[key] - entries[key].registered}
+                  for key in children]
+    components.sort(key=lambda c: (-c["descendants"], c["name"]))
+
+    path = critical_path(entries)
+    resolved = [e.resolved for e in entries.values() if e.resolved is not None]
+    return {
+        "resources": len(entries),
+        "total_seconds": max(resolved) if resolved else 0.0,
+        "components": components,
+        "critical_path": [entries[key].label for key in path],
+        "critical_path_seconds": (entries[path[-1]].resolved - entries[path[0]].registered) if path else 0.0,
+    }
+
+
+def folded_stacks(entries: Dict[str, TraceEntry]) -> List[str]:
+    """'stack;Component:name;Type:name <ms>' lines, one per leaf resource"""
+    parents = {e.parent for e in entries.values()}
+    lines = []
+    for key in sorted(entries):
+        if key in parents:
+            continue  # components are as wide as their children
+        frames = [STACK_ROOT] + [entries[k].label for k in component_path(entries, key)]
+        lines.append(f"{';'.join(frames)} {max(1, round(entries[key].duration * 1000))}")
+    return lines
+
+
+def chrome_trace(entries: Dict[str, TraceEntry]) -> dict:
+    """Chrome trace events: one complete ('X') event per resource, one track per top-level component.
+
+    Components span from their registration to the last resolution beneath them.
+    """
+    events = []
+    tracks: Dict[str, int] = {}
+    ends = _subtree_ends(entries)
+    for key, entry in sorted(entries.items(), key=lambda item: item[1].registered):
+        top = component_path(entries, key)[0]
+        if top not in tracks:
+            tracks[top] = len(tracks) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tracks[top],
+                           "args": {"name": entries[top].label}})
+        events.append({
+            "name": entry.label,
+            "cat": entry.type,
+            "ph": "X",
+            "ts": round(entry.registered * 1e6),
+            "dur": max(1, round((ends[key] - entry.registered) * 1e6)),
+            "pid": 1,
+            "tid": tracks[top],
+            "args": {"parent": entry.parent, "deps": entry.deps, "failed": entry.failed},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(path: str, entries: Dict[str, TraceEntry]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        if path.endswith(".folded"):
+            f.write("\n".join(folded_stacks(entries)) + "\n")
+        else:
+            json.dump(chrome_trace(entries), f, indent=1)
+
+
+def install(path: Optional[str] = None) -> Optional[Tracer]:
+    """Register the tracing transformation when PULUMI_TRACE_FILE (or `path`) is set"""
+    path = path or os.environ.get("PULUMI_TRACE_FILE")
+    if not path:
+        return None
+    tracer = Tracer(path)
+    pulumi.runtime.register_stack_transformation(tracer.transformation)
+    return tracer
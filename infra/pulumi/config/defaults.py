@@ -1,40 +1,175 @@
 """
 Default configurations for different environments.
 These are applied programmatically, not through Pulumi.<stack>.yaml files.
+Values are typed (see config/schema.py) and resolved by config/resolver.py:
+they override envs/*.yaml and are overridden by stack config.
 """
 
+import ipaddress
+import re
+
 ENVIRONMENT_DEFAULTS = {
     "dev": {
         "aws:region": "us-east-1",
         "vpc:cidr_block": "10.10.0.0/16",
-        "vpc:subnet_count": "2",
-        "vpc:enable_dns_support": "true",
-        "vpc:enable_dns_hostnames": "true",
+        "vpc:subnet_count": 2,
+        "vpc:public_subnet_prefix": 24,
+        "vpc:private_subnet_prefix": 24,
+        "vpc:private_subnet_offset": 100,  # x.y.100.0/24 onwards; None packs after public
+        "vpc:secondary_cidr_blocks": [],  # no pod subnets; pods share private subnets
+        "vpc:enable_dns_support": True,
+        "vpc:enable_dns_hostnames": True,
         "vpc:nat_strategy": "none",  # No NAT for dev to save costs
+        "vpc:nat_scheduled": False,
+        "vpc:enable_vpc_endpoints": False,
+        "vpc:interface_endpoints": [],
+        "vpc:enable_flow_logs": False,  # Parquet to S3, hourly partitions, Glue table
+        "vpc:flow_logs_scope": "vpc",  # vpc, subnet or eni
+        "vpc:flow_logs_traffic_type": "ALL",  # ALL, ACCEPT or REJECT
+        "vpc:flow_logs_aggregation_interval": 600,  # seconds: 60 or 600
+        "vpc:flow_logs_format": "",  # "" = DEFAULT_FLOW_LOG_FIELDS
+        "vpc:flow_logs_eni_ids": [],  # eni scope only
+        "vpc:flow_logs_retention_days": 7,
+        "vpc:enable_netbench": False,  # paid agents measuring NAT/endpoint paths, see modules/vpc/netbench.py
+        "cost:monthly_budget": 25,  # USD, estimated by common/pricing.py
+        "cost:internet_gb": {},  # expected GB/month per subnet tier
+        "cost:s3_dynamodb_gb": {},
+        "cost:aws_api_gb": {},
+        "cost:cross_az_gb": {},
+        "eks:on_demand_instance_types": ["t3.large"],
+        "eks:on_demand_scaling": {"min": 0, "desired": 0, "max": 0},  # spot only
+        "eks:spot_instance_types": ["t3.large", "t3a.large"],
+        "eks:spot_scaling": {"min": 0, "desired": 0, "max": 0},  # no NAT: nodes could not join; set a NAT first
+        "eks:enable_karpenter": False,
+        "cost:eks_monthly_budget": 100,  # control plane; spot nodes are not priced
     },
     "staging": {
         "aws:region": "us-east-1",
         "vpc:cidr_block": "10.20.0.0/16",
-        "vpc:subnet_count": "2",
-        "vpc:enable_dns_support": "true",
-        "vpc:enable_dns_hostnames": "true",
+        "vpc:subnet_count": 2,
+        "vpc:public_subnet_prefix": 24,
+        "vpc:private_subnet_prefix": 24,
+        "vpc:private_subnet_offset": 100,  # x.y.100.0/24 onwards; None packs after public
+        "vpc:secondary_cidr_blocks": [],  # no pod subnets; pods share private subnets
+        "vpc:enable_dns_support": True,
+        "vpc:enable_dns_hostnames": True,
         "vpc:nat_strategy": "single",  # Single NAT for staging
+        "vpc:nat_scheduled": True,  # Off-hours teardown via scripts/nat_schedule.sh
+        "vpc:enable_vpc_endpoints": True,  # S3/DynamoDB gateway endpoints only (free)
+        "vpc:interface_endpoints": [],
+        "vpc:enable_flow_logs": True,  # Parquet to S3, hourly partitions, Glue table
+        "vpc:flow_logs_scope": "vpc",  # vpc, subnet or eni
+        "vpc:flow_logs_traffic_type": "ALL",  # ALL, ACCEPT or REJECT
+        "vpc:flow_logs_aggregation_interval": 600,  # seconds: 60 or 600
+        "vpc:flow_logs_format": "",  # "" = DEFAULT_FLOW_LOG_FIELDS
+        "vpc:flow_logs_eni_ids": [],  # eni scope only
+        "vpc:flow_logs_retention_days": 30,
+        "vpc:enable_netbench": False,  # paid agents measuring NAT/endpoint paths, see modules/vpc/netbench.py
+        "cost:monthly_budget": 100,  # USD, estimated by common/pricing.py
+        "cost:internet_gb": {"private": 50},  # expected GB/month per subnet tier
+        "cost:s3_dynamodb_gb": {"private": 200},
+        "cost:aws_api_gb": {"private": 20},
+        "cost:cross_az_gb": {"private": 50},
+        "eks:on_demand_instance_types": ["m6i.large"],
+        "eks:on_demand_scaling": {"min": 1, "desired": 1, "max": 2},  # per AZ
+        "eks:spot_instance_types": ["m6i.large", "m5.large", "m6a.large"],
+        "eks:spot_scaling": {"min": 0, "desired": 1, "max": 4},
+        "eks:enable_karpenter": False,
+        "cost:eks_monthly_budget": 300,
     },
     "prod": {
         "aws:region": "us-east-1",
         "vpc:cidr_block": "10.30.0.0/16",
-        "vpc:subnet_count": "3",
-        "vpc:enable_dns_support": "true",
-        "vpc:enable_dns_hostnames": "true",
+        "vpc:subnet_count": 3,
+        "vpc:public_subnet_prefix": 24,
+        "vpc:private_subnet_prefix": 24,
+        "vpc:private_subnet_offset": 100,  # x.y.100.0/24 onwards; None packs after public
+        "vpc:secondary_cidr_blocks": ["100.64.0.0/16"],  # pod subnets for VPC CNI custom networking
+        "vpc:pod_subnet_prefix": 18,  # ~16k pod IPs per AZ
+        "vpc:enable_dns_support": True,
+        "vpc:enable_dns_hostnames": True,
         "vpc:nat_strategy": "multi-az",  # HA NAT for production
+        "vpc:nat_scheduled": False,
+        "vpc:enable_vpc_endpoints": True,
+        "vpc:interface_endpoints": ["ecr.api", "ecr.dkr", "sts", "logs"],  # Paid, per AZ
+        "vpc:enable_flow_logs": True,  # Parquet to S3, hourly partitions, Glue table
+        "vpc:flow_logs_scope": "vpc",  # vpc, subnet or eni
+        "vpc:flow_logs_traffic_type": "ALL",  # ALL, ACCEPT or REJECT
+        "vpc:flow_logs_aggregation_interval": 60,  # seconds: 60 or 600
+        "vpc:flow_logs_format": "",  # "" = DEFAULT_FLOW_LOG_FIELDS
+        "vpc:flow_logs_eni_ids": [],  # eni scope only
+        "vpc:flow_logs_retention_days": 90,
+        "vpc:enable_netbench": False,  # paid agents measuring NAT/endpoint paths, see modules/vpc/netbench.py
+        "cost:monthly_budget": 500,  # USD, estimated by common/pricing.py
+        "cost:internet_gb": {"private": 500, "public": 50},  # expected GB/month per subnet tier
+        "cost:s3_dynamodb_gb": {"private": 2000},
+        "cost:aws_api_gb": {"private": 200},
+        "cost:cross_az_gb": {"private": 500},
+        "eks:on_demand_instance_types": ["m6i.xlarge"],
+        "eks:on_demand_scaling": {"min": 2, "desired": 2, "max": 4},  # per AZ
+        "eks:spot_instance_types": ["m6i.xlarge", "m5.xlarge", "m6a.xlarge", "c6i.xlarge"],
+        "eks:spot_scaling": {"min": 0, "desired": 2, "max": 10},
+        "eks:enable_karpenter": True,  # bursts beyond the managed node groups
+        "cost:eks_monthly_budget": 1500,
     }
 }
 
+# Ephemeral per-PR environments ('pr-<n>'): one /20 slot of EPHEMERAL_CIDR_POOL each.
+# Slots below EPHEMERAL_FALLBACK_SLOT are handed out by common/ephemeral.py (vpc:pool_slot);
+# a PR stack deployed without a claim falls back to a slot derived from its PR number.
+EPHEMERAL_ENV_PATTERN = re.compile(r"^pr-(\d+)$")
+EPHEMERAL_ENV = "pr"  # <env> of the stacks shared by every PR, e.g. the pr-iam deploy role
+POOL_ENV = "pr-pool"  # pr-pool-vpc keeps the warm VPC shells
+EPHEMERAL_CIDR_POOL = "10.128.0.0/9"
+EPHEMERAL_SLOT_PREFIX = 20
+EPHEMERAL_FALLBACK_SLOT = 1024
+
+EPHEMERAL_DEFAULTS = {
+    **{key: value for key, value in ENVIRONMENT_DEFAULTS["dev"].items() if key != "vpc:cidr_block"},
+    "vpc:private_subnet_offset": 8,  # x.y.8.0/24 onwards, inside the /20 slot
+    "vpc:flow_logs_retention_days": 1,
+    "cost:monthly_budget": 10,
+    "eks:spot_scaling": {"min": 0, "desired": 0, "max": 0},  # no NAT, like dev
+    "cost:eks_monthly_budget": 100,
+}
+
+
+def is_ephemeral(env: str) -> bool:
+    """'pr-123', the shared 'pr' stacks and the 'pr-pool' shells"""
+    return env in (EPHEMERAL_ENV, POOL_ENV) or bool(EPHEMERAL_ENV_PATTERN.match(env))
+
+
+def ephemeral_block(slot: int) -> str:
+    """CIDR block of a slot: 10.128.0.0/20, 10.128.16.0/20, ..."""
+    pool = ipaddress.ip_network(EPHEMERAL_CIDR_POOL)
+    blocks = 2 ** (EPHEMERAL_SLOT_PREFIX - pool.prefixlen)
+    if not 0 <= slot < blocks:
+        raise ValueError(f"Ephemeral slot {slot} is outside {EPHEMERAL_CIDR_POOL} (0-{blocks - 1})")
+    return str(ipaddress.ip_network((int(pool.network_address) + slot * 2 ** (32 - EPHEMERAL_SLOT_PREFIX),
+                                     EPHEMERAL_SLOT_PREFIX)))
+
+
+def environment_defaults(env: str) -> dict:
+    """Code defaults for env: ENVIRONMENT_DEFAULTS, or the ephemeral defaults for PR environments"""
+    if env in ENVIRONMENT_DEFAULTS:
+        return ENVIRONMENT_DEFAULTS[env]
+    if env == POOL_ENV:
+        return {**EPHEMERAL_DEFAULTS, "vpc:cidr_block": EPHEMERAL_CIDR_POOL, "vpc:pool_size": 4}
+    match = EPHEMERAL_ENV_PATTERN.match(env)
+    if match:
+        fallback = EPHEMERAL_FALLBACK_SLOT + int(match.group(1)) % EPHEMERAL_FALLBACK_SLOT
+        return {**EPHEMERAL_DEFAULTS, "vpc:cidr_block": ephemeral_block(fallback)}
+    if env == EPHEMERAL_ENV:
+        return dict(EPHEMERAL_DEFAULTS)
+    return {}
+
+
 def get_environment_from_stack(stack_name: str) -> str:
-    """Extract environment from stack name (e.g., 'dev-vpc' -> 'dev')"""
-    return stack_name.split('-')[0]
+    """Extract environment from stack name (e.g., 'dev-vpc' -> 'dev', 'pr-123-vpc' -> 'pr-123')"""
+    from common.stack_utils import parse_stack_name  # common imports config; resolve at call time
+    return parse_stack_name(stack_name)[0]
 
 def get_component_from_stack(stack_name: str) -> str:
-    """Extract component from stack name (e.g., 'dev-vpc' -> 'vpc')"""
-    parts = stack_name.split('-')
-    return parts[1] if len(parts) > 1 else "vpc"
\ No newline at end of file
+    """Extract component from stack name (e.g., 'dev-vpc' -> 'vpc', 'pr-123-vpc' -> 'vpc')"""
+    from common.stack_utils import parse_stack_name
+    return parse_stack_name(stack_name)[1]
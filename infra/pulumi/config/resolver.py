@@ -0,0 +1,153 @@
+"""
+Layered config resolver shared by every stack program.
+
+Layers, lowest precedence first:
+    1. envs/_shared.yaml   ('config:' section)
+    2. envs/<env>.yaml     (nested 'vpc: {name: ...}' or flat 'vpc:name: ...')
+    3. config/defaults.py  (ENVIRONMENT_DEFAULTS[env], ephemeral defaults for pr-<n>)
+    4. stack config        (pulumi config set ...)
+
+Layers are merged and validated against config.schema once per environment;
+the result is a frozen ResolvedConfig that also records which layer each value
+came from.
+
+Usage (from infra/pulumi, stack config layer empty):
+    python -m config.resolver dev                    # every value and its source
+    python -m config.resolver dev vpc:nat_strategy   # one value
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple
+
+import yaml
+
+from .defaults import environment_defaults
+from .schema import OPEN_NAMESPACES, OWNED_NAMESPACES, SCHEMA, coerce
+
+ENVS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "envs")
+
+
+class ConfigError(ValueError):
+    """One or more config values failed schema validation"""
+
+
+@dataclass(frozen=True)
+class ResolvedConfig:
+    """Typed, read-only config for one environment"""
+    env: str
+    values: Mapping[str, Any]
+    sources: Mapping[str, str]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.values:
+            raise KeyError(f"'{key}' is not in the config schema")
+        return self.values[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.values.get(key)
+        return default if value is None else value
+
+    def source(self, key: str) -> str:
+        return self.sources[key]
+
+    def namespace(self, namespace: str) -> Dict[str, Any]:
+        """{'issuer_url': ..., ...} for every key in 'namespace:'"""
+        prefix = f"{namespace}:"
+        return {key[len(prefix):]: value for key, value in self.values.items() if key.startswith(prefix)}
+
+    def describe(self) -> List[str]:
+        """'key = value  (source)' lines for every key not left at its schema default"""
+        def show(value):
+            if isinstance(value, tuple):
+                return [show(v) for v in value]
+            return dict(value) if isinstance(value, Mapping) else value
+        return [f"{key} = {show(self.values[key])!r}  ({source})" for key, source in sorted(self.sources.items())
+                if source != "schema"]
+
+
+def _flatten(data: Dict[str, Any], origin: str) -> Dict[str, Any]:
+    """Normalize nested and flat 'namespace:key' YAML into flat keys"""
+    flat = {}
+    for key, value in (data or {}).items():
+        if ":" in key:
+            flat[key] = value
+        elif isinstance(value, dict):
+            flat.update({f"{key}:{sub}": v for sub, v in value.items()})
+        else:
+            raise ConfigError(f"{origin}: key '{key}' has no namespace (expected e.g. 'vpc:{key}')")
+    return flat
+
+
+def _read_yaml(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _stack_layer() -> Dict[str, Any]:
+    """Stack config for schema keys plus any set key in an owned or open namespace"""
+    import pulumi.runtime.config as runtime_config
+
+    keys = set(SCHEMA) | {key for key in {**runtime_config.get_config_env(), **runtime_config.CONFIG.get()}
+                          if key.split(":")[0] in OWNED_NAMESPACES + OPEN_NAMESPACES}
+    values = {key: runtime_config.get_config(key) for key in keys}
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def _layers(env: str) -> List[Tuple[str, Dict[str, Any]]]:
+    shared = _read_yaml(os.path.join(ENVS_DIR, "_shared.yaml"))
+    return [
+        ("envs/_shared.yaml", _flatten(shared.get("config"), "envs/_shared.yaml")),
+        (f"envs/{env}.yaml", _flatten(_read_yaml(os.path.join(ENVS_DIR, f"{env}.yaml")), f"envs/{env}.yaml")),
+        ("config/defaults.py", dict(environment_defaults(env))),
+        ("stack config", _stack_layer()),
+    ]
+
+
+def resolve(env: str, layers: List[Tuple[str, Dict[str, Any]]]) -> ResolvedConfig:
+    """Merge layers (lowest precedence first) over the schema defaults and validate"""
+    raw = {key: (setting.default, "schema") for key, setting in SCHEMA.items()}
+    errors = []
+    for origin, layer in layers:
+        for key, value in layer.items():
+            if key in SCHEMA or key.split(":")[0] in OPEN_NAMESPACES:
+                raw[key] = (value, origin)
+            elif key.split(":")[0] in OWNED_NAMESPACES:
+                errors.append(f"{key}: unknown key (from {origin})")
+
+    values, sources = {}, {}
+    for key, (value, origin) in raw.items():
+        try:
+            values[key] = coerce(key, value)
+        except ValueError as e:
+            errors.append(f"{key}: {e} (from {origin})")
+        sources[key] = origin
+
+    if errors:
+        raise ConfigError(f"Invalid configuration for '{env}':\n  " + "\n  ".join(errors))
+    return ResolvedConfig(env, MappingProxyType(values), MappingProxyType(sources))
+
+
+@lru_cache(maxsize=None)
+def load_config(env: str) -> ResolvedConfig:
+    """Resolve config for env once per program run"""
+    return resolve(env, _layers(env))
+
+
+def clear():
+    """Forget resolved configs (tests re-run programs with different stack config)"""
+    load_config.cache_clear()
+
+
+if __name__ == "__main__":
+    resolved = load_config(sys.argv[1] if len(sys.argv) > 1 else "dev")
+    if len(sys.argv) > 2:
+        print(resolved.get(sys.argv[2], ""))
+    else:
+        for line in resolved.describe():
+            print(line)
@@ -0,0 +1,211 @@
+"""
+Schema for every config key the stack programs read.
+
+Each key has a kind (str, int, bool, list, map, cidr, targets), a fallback default and
+optional allowed values. Values from YAML, code defaults and `pulumi config set`
+are coerced against this schema once at startup, so a typo or a "three" where
+an int belongs fails the preview instead of silently falling back.
+"""
+
+import ipaddress
+import json
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Tuple
+
+# Namespaces owned by this project: unknown keys in them are rejected as typos
+OWNED_NAMESPACES = ("vpc", "iam", "eks", "oidc", "cost")
+
+# Namespaces with free-form keys: every 'tags:<key>' is a string (common/tagging.py)
+OPEN_NAMESPACES = ("tags",)
+
+# Fields of one vpc:targets entry; only region is required
+TARGET_FIELDS = ("region", "account_id", "role_arn", "cidr_block")
+REGION_PATTERN = re.compile(r"^[a-z]{2}(-gov)?-[a-z]+-\d$")
+
+
+@dataclass(frozen=True)
+class Setting:
+    kind: str  # str, int, bool, list, map, cidr, targets
+    default: Any = None
+    choices: Tuple[Any, ...] = ()
+    help: str = ""
+
+
+SCHEMA: Dict[str, Setting] = {
+    # AWS provider
+    "aws:region": Setting("str", "us-east-1"),
+    "aws:profile": Setting("str"),
+
+    # VPC
+    "vpc:name": Setting("str", help="defaults to <env>-vpc; must start with <env>- (deploy role scoping)"),
+    "vpc:cidr_block": Setting("cidr", "10.0.0.0/16"),
+    "vpc:subnet_count": Setting("int", 2, help="subnets per tier, one per AZ"),
+    "vpc:public_subnet_prefix": Setting("int", 24),
+    "vpc:private_subnet_prefix": Setting("int", 24),
+    "vpc:private_subnet_offset": Setting("int", help="pin private subnets; unset packs after public"),
+    "vpc:secondary_cidr_blocks": Setting("list", (), help="e.g. 100.64.0.0/16; pod subnets use the first"),
+    "vpc:pod_subnet_prefix": Setting("int", 18, help="one pod subnet per AZ inside the first secondary block"),
+    "vpc:enable_dns_support": Setting("bool", True),
+    "vpc:enable_dns_hostnames": Setting("bool", True),
+    "vpc:nat_strategy": Setting("str", "none", ("none", "single", "zonal-pairs", "multi-az", "instance")),
+    "vpc:nat_count": Setting("int", 0, help="zonal-pairs only; 0 = one per two AZs"),
+    "vpc:nat_instance_type": Setting("str", "t4g.nano", help="instance strategy only"),
+    "vpc:nat_scheduled": Setting("bool", False, help="protect/retain EIPs, NAT follows vpc:nat_active"),
+    "vpc:nat_active": Setting("bool", True, help="set by scripts/nat_schedule.sh; scheduled mode only"),
+    "vpc:enable_vpc_endpoints": Setting("bool", False),
+    "vpc:interface_endpoints": Setting("list", ()),
+    "vpc:enable_flow_logs": Setting("bool", False),
+    "vpc:flow_logs_scope": Setting("str", "vpc", ("vpc", "subnet", "eni")),
+    "vpc:flow_logs_traffic_type": Setting("str", "ALL", ("ALL", "ACCEPT", "REJECT")),
+    "vpc:flow_logs_aggregation_interval": Setting("int", 600, (60, 600)),
+    "vpc:flow_logs_format": Setting("str", "", help="empty = DEFAULT_FLOW_LOG_FIELDS"),
+    "vpc:flow_logs_eni_ids": Setting("list", ()),
+    "vpc:flow_logs_retention_days": Setting("int", 30),
+    "vpc:enable_netbench": Setting("bool", False, help="paid: one agent instance per subnet, results in S3"),
+    "vpc:netbench_instance_type": Setting("str", "t4g.nano"),
+    "vpc:netbench_seconds": Setting("int", 10, help="per throughput test"),
+    "vpc:netbench_internet_url": Setting("str", "https://ip-ranges.amazonaws.com/ip-ranges.json",
+                                         help="downloaded through NAT by the via-nat tests"),
+    "vpc:targets": Setting("targets", (), help="[{region, account_id, role_arn, cidr_block}]; empty = aws:region only"),
+    "vpc:pool_slot": Setting("int", help="pr-<n> only: EPHEMERAL_CIDR_POOL slot, set by common/ephemeral.py"),
+    "vpc:pool_stack": Setting("str", help="pr-<n> only: claim shell vpc:pool_slot from this pool stack"),
+    "vpc:pool_size": Setting("int", 0, help="pr-pool only: warm VPC shells kept ready"),
+
+    # IAM
+    "iam:enable_eks_permissions": Setting("bool", False),
+    "iam:github_repo": Setting("str", "alkon/dns-etl-repo", help="owner/name allowed to assume the deploy role"),
+    "iam:github_oidc_provider_arn": Setting("str", help="empty = token.actions.githubusercontent.com in this account"),
+    "iam:create_github_oidc_provider": Setting("bool", False, help="once per account; other stacks reuse it"),
+
+    # EKS
+    "eks:vpc_stack": Setting("str", help="set by the orchestrator"),
+    "eks:cluster_version": Setting("str", "1.30"),
+    "eks:on_demand_instance_types": Setting("list", ("m6i.large",)),
+    "eks:on_demand_scaling": Setting("map", {}, help="per AZ, e.g. 'min=1,desired=1,max=3'; max=0 disables"),
+    "eks:spot_instance_types": Setting("list", ("m6i.large", "m5.large", "m6a.large")),
+    "eks:spot_scaling": Setting("map", {}, help="per AZ, e.g. 'min=0,desired=1,max=5'; max=0 disables"),
+    "eks:prefix_delegation": Setting("bool", True, help="sizes kubelet max-pods for VPC CNI /28 prefixes"),
+    "eks:max_pods": Setting("int", help="unset = computed from the pool's instance types"),
+    "eks:node_disk_gb": Setting("int", 50),
+    "eks:enable_karpenter": Setting("bool", False, help="IAM roles, interruption queue, discovery tags"),
+
+    # Cost model (common/pricing.py): expected GB/month per subnet tier, e.g. "private=500,public=50"
+    "cost:monthly_budget": Setting("int", help="USD; runs estimated above it fail, unset = no limit"),
+    "cost:eks_monthly_budget": Setting("int", help="USD; replaces cost:monthly_budget for <env>-eks stacks"),
+    "cost:internet_gb": Setting("map", {}),
+    "cost:s3_dynamodb_gb": Setting("map", {}, help="free through gateway endpoints"),
+    "cost:aws_api_gb": Setting("map", {}, help="ECR/STS/Logs...; interface endpoints when enabled"),
+    "cost:cross_az_gb": Setting("map", {}, help="traffic between AZs within a tier"),
+
+    # OIDC
+    "oidc:eks_stack": Setting("str", help="set by the orchestrator"),
+    "oidc:cluster_name": Setting("str"),
+    "oidc:issuer_url": Setting("str", help="empty = issuer exported by the <env>-eks stack"),
+    "oidc:client_ids": Setting("list", ("sts.amazonaws.com",)),
+    "oidc:thumbprints": Setting("list", (), help="pin instead of fetching the issuer's TLS chain"),
+}
+
+
+def _coerce_targets(value: Any) -> tuple:
+    """vpc:targets: regions ('us-east-1,eu-west-1') or a list of {region, account_id, role_arn, cidr_block}"""
+    if isinstance(value, str) and value.strip().startswith("["):
+        value = json.loads(value)
+    if isinstance(value, str):
+        value = [v.strip() for v in value.split(",") if v.strip()]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"expected a list of targets, got {value!r}")
+
+    targets = []
+    for entry in value:
+        if isinstance(entry, str):
+            entry = {"region": entry}
+        if not isinstance(entry, dict) or "region" not in entry:
+            raise ValueError(f"expected a region or a mapping with 'region', got {entry!r}")
+        unknown = set(entry) - set(TARGET_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown target fields {sorted(unknown)} (expected {', '.join(TARGET_FIELDS)})")
+        target = {field: (str(entry[field]).strip() if entry.get(field) not in (None, "") else None)
+                  for field in TARGET_FIELDS}
+        if not REGION_PATTERN.match(target["region"] or ""):
+            raise ValueError(f"invalid region {entry['region']!r}")
+        if target["account_id"] and not re.fullmatch(r"\d{12}", target["account_id"]):
+            raise ValueError(f"account_id must be 12 digits, got {target['account_id']!r}")
+        if target["role_arn"] and not target["role_arn"].startswith("arn:aws"):
+            raise ValueError(f"role_arn must be an IAM role ARN, got {target['role_arn']!r}")
+        if target["cidr_block"]:
+            try:
+                target["cidr_block"] = str(ipaddress.IPv4Network(target["cidr_block"]))
+            except ValueError as e:
+                raise ValueError(f"invalid CIDR block {target['cidr_block']!r}: {e}") from None
+        targets.append(MappingProxyType(target))
+    return tuple(targets)
+
+
+def coerce(key: str, value: Any) -> Any:
+    """Convert a raw config value to the kind declared for key; raises ValueError"""
+    setting = SCHEMA[key] if key in SCHEMA or key.split(":")[0] not in OPEN_NAMESPACES else Setting("str")
+    kind = setting.kind
+
+    if value is None or (isinstance(value, str) and value.strip() == "" and kind in ("int", "bool", "cidr")):
+        return None
+
+    if kind == "bool":
+        if isinstance(value, bool):
+            result = value
+        elif isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            result = value.strip().lower() == "true"
+        else:
+            raise ValueError(f"expected true/false, got {value!r}")
+    elif kind == "int":
+        if isinstance(value, bool):
+            raise ValueError(f"expected an integer, got {value!r}")
+        if isinstance(value, int):
+            result = value
+        elif isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            result = int(value)
+        else:
+            raise ValueError(f"expected an integer, got {value!r}")
+    elif kind == "list":
+        if isinstance(value, str) and value.strip().startswith("["):
+            value = json.loads(value)
+        if isinstance(value, str):
+            result = tuple(v.strip() for v in value.split(",") if v.strip())
+        elif isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value):
+            result = tuple(value)
+        else:
+            raise ValueError(f"expected a comma-separated string or list of strings, got {value!r}")
+    elif kind == "map":
+        if isinstance(value, str) and value.strip().startswith("{"):
+            value = json.loads(value)
+        if isinstance(value, str):
+            pairs = [p.split("=", 1) for p in value.split(",") if p.strip()]
+            if any(len(p) != 2 for p in pairs):
+                raise ValueError(f"expected 'name=number,...', got {value!r}")
+            value = {k.strip(): v.strip() for k, v in pairs}
+        if not isinstance(value, dict):
+            raise ValueError(f"expected a mapping, got {value!r}")
+        try:
+            result = MappingProxyType({str(k): float(v) for k, v in value.items()})
+        except (TypeError, ValueError):
+            raise ValueError(f"expected numeric values, got {value!r}") from None
+        if any(v < 0 for v in result.values()):
+            raise ValueError(f"expected non-negative values, got {value!r}")
+    elif kind == "targets":
+        result = _coerce_targets(value)
+    elif kind == "cidr":
+        if not isinstance(value, str):
+            raise ValueError(f"expected a CIDR block, got {value!r}")
+        try:
+            result = str(ipaddress.IPv4Network(value.strip()))
+        except ValueError as e:
+            raise ValueError(f"invalid CIDR block {value!r}: {e}") from None
+    else:
+        if not isinstance(value, str):
+            raise ValueError(f"expected a string, got {value!r}")
+        result = value
+
+    if setting.choices and result not in setting.choices:
+        raise ValueError(f"{result!r} is not one of {', '.join(map(str, setting.choices))}")
+    return result
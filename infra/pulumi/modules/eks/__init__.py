@@ -0,0 +1,6 @@
+# EKS module exports (eks_stack itself needs pulumi_eks and is loaded by dispatch_stack)
+from .node_groups import NodeGroupSet, max_pods, require_egress
+from .karpenter import KarpenterBootstrap
+from .vpc_cni import VpcCniAddon, cni_configuration
+
+__all__ = ['NodeGroupSet', 'KarpenterBootstrap', 'VpcCniAddon', 'max_pods', 'require_egress', 'cni_configuration']
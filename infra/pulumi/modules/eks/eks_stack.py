@@ -1,16 +1,119 @@
 import pulumi
-import pulumi_aws as aws
 import pulumi_eks as eks
-from common.config_loader import load_config
+import pulumi_kubernetes as k8s
+from common import pricing
+from common.stack_refs import get_vpc_outputs, require_output
+from config.resolver import load_config
+from modules.eks.node_groups import NodeGroupSet, NODE_POLICIES, require_egress
+from modules.eks.karpenter import KarpenterBootstrap
+from modules.eks.vpc_cni import VpcCniAddon
 
-def run(env):
-    config = load_config(env)
 
-    cluster = eks.Cluster("eksCluster",
-        role_arn=config["eks"]["role_arn"],
-        vpc_id=config["eks"]["vpc_id"],
-        public_subnet_ids=config["eks"]["public_subnet_ids"],
-        private_subnet_ids=config["eks"]["private_subnet_ids"],
-        skip_default_node_group=True)
+def _nth_subnet(subnets: list, i: int):
+    """subnets[i], failing clearly when the vpc stack created fewer subnets than vpc:subnet_count"""
+    if i >= len(subnets):
+        raise ValueError(f"vpc:subnet_count is above the {len(subnets)} subnets per tier of the vpc stack "
+                         f"(capped at the AZs available): lower vpc:subnet_count")
+    return subnets[i]
+
+
+def run(env: str):
+    """EKS stack wired to the <env>-vpc stack outputs, with managed node groups per AZ"""
+
+    cfg = load_config(env)
+
+    # VPC and subnet ids come straight from the <env>-vpc stack
+    vpc = get_vpc_outputs(env, "eks")
+
+    # On-demand base + spot burst per private subnet; max=0 disables a pool
+    pools = {
+        "on-demand": {
+            "capacity_type": "ON_DEMAND",
+            "instance_types": cfg["eks:on_demand_instance_types"],
+            "scaling": cfg["eks:on_demand_scaling"],
+        },
+        "spot": {
+            "capacity_type": "SPOT",
+            "instance_types": cfg["eks:spot_instance_types"],
+            "scaling": cfg["eks:spot_scaling"],
+        },
+    }
+
+    # The vpc stack creates one subnet per tier in each of its availability_zones, in that order.
+    # Node groups get their subnets only once the vpc stack is known to give nodes egress.
+    availability_zones = require_output(env, "eks", "vpc", "availability_zones")
+    subnet_count = cfg["vpc:subnet_count"]
+    egress = require_output(env, "eks", "vpc", "nat_strategy").apply(lambda nat: require_egress(pools, nat))
+    private_subnet_ids = [pulumi.Output.all(vpc["private_subnet_ids"], egress)
+                          .apply(lambda args, i=i: _nth_subnet(args[0], i)) for i in range(subnet_count)]
+    
+    # Pods get their own subnets when the vpc stack has a secondary CIDR (custom networking)
+    custom_networking = bool(cfg["vpc:secondary_cidr_blocks"])
+
+    cluster = eks.Cluster(f"{env}-eks",
+        vpc_id=vpc["vpc_id"],
+        public_subnet_ids=vpc["public_subnet_ids"],
+        private_subnet_ids=vpc["private_subnet_ids"],
+        version=cfg["eks:cluster_version"],
+        authentication_mode="API_AND_CONFIG_MAP",  # access entries for Karpenter nodes
+        skip_default_node_group=True,
+        use_default_vpc_cni=True)  # the vpc-cni EKS addon below replaces pulumi_eks' own CNI manifest
+    cluster_name = cluster.eks_cluster.name
+    cluster_security_group_id = cluster.eks_cluster.vpc_config.cluster_security_group_id
+
+    # VPC CNI: /28 prefixes per ENI slot, pod ENIs in the pod subnets
+    vpc_cni = VpcCniAddon(f"{env}-eks", cluster_name, {
+        "environment": env,
+        "prefix_delegation": cfg["eks:prefix_delegation"],
+        "custom_networking": custom_networking,
+    }, opts=pulumi.ResourceOptions(depends_on=[cluster]))
+
+    # One ENIConfig per AZ, named after the AZ (ENI_CONFIG_LABEL_DEF=topology.kubernetes.io/zone)
+    eni_configs = []
+    if custom_networking:
+        pod_subnets = pulumi.Output.all(availability_zones, require_output(env, "eks", "vpc", "pod_subnet_ids")) \
+            .apply(lambda args: list(zip(*args)))  # [(az, pod subnet id), ...]
+        for i in range(subnet_count):
+            eni_configs.append(k8s.apiextensions.CustomResource(f"{env}-eniconfig-{i + 1}",
+                api_version="crd.k8s.amazonaws.com/v1alpha1",
+                kind="ENIConfig",
+                metadata={"name": pod_subnets.apply(lambda pairs, i=i: _nth_subnet(pairs, i)[0])},
+                spec={
+                    "subnet": pod_subnets.apply(lambda pairs, i=i: _nth_subnet(pairs, i)[1]),
+                    "securityGroups": [cluster_security_group_id],
+                },
+                opts=pulumi.ResourceOptions(provider=cluster.provider, depends_on=[vpc_cni])))
+
+    # Managed node groups: on-demand base + spot burst, per private subnet
+    node_groups = NodeGroupSet(f"{env}-eks-nodes", cluster_name, private_subnet_ids, {
+        "environment": env,
+        "prefix_delegation": cfg["eks:prefix_delegation"],
+        "custom_networking": custom_networking,
+        "max_pods": cfg["eks:max_pods"],
+        "disk_gb": cfg["eks:node_disk_gb"],
+        "pools": pools,
+    }, opts=pulumi.ResourceOptions(depends_on=[cluster, vpc_cni] + eni_configs))  # nodes start with the CNI config
+
+    pricing.register(pricing.hourly(f"{env}-eks", "EKS control plane", "eks_cluster_hour"))
 
     pulumi.export("kubeconfig", cluster.kubeconfig)
+    pulumi.export("cluster_name", cluster_name)
+    pulumi.export("oidc_issuer_url", cluster.eks_cluster.identities[0].oidcs[0].issuer)
+    pulumi.export("node_role_arn", node_groups.node_role.arn)
+    pulumi.export("node_group_names", [ng.node_group_name for ng in node_groups.node_groups])
+    pulumi.export("max_pods", node_groups.max_pods)
+    pulumi.export("vpc_cni_configuration", vpc_cni.configuration)
+
+    # Optional Karpenter: AWS-side bootstrap only, the chart is installed on the cluster
+    if cfg["eks:enable_karpenter"]:
+        # The vpc stack tags the private subnets; the same value goes on the cluster security group
+        discovery = require_output(env, "eks", "vpc", "karpenter_discovery")
+        karpenter = KarpenterBootstrap(f"{env}-karpenter", cluster_name, [cluster_security_group_id], {
+            "environment": env,
+            "node_policies": NODE_POLICIES,
+            "discovery": discovery,
+        }, opts=pulumi.ResourceOptions(depends_on=[cluster]))
+        pulumi.export("karpenter_node_role", karpenter.node_role.name)
+        pulumi.export("karpenter_controller_role_arn", karpenter.controller_role.arn)
+        pulumi.export("karpenter_interruption_queue", karpenter.queue.name)
+        pulumi.export("karpenter_discovery", discovery)
@@ -0,0 +1,180 @@
+import pulumi
+import pulumi_aws as aws
+from typing import List
+
+# EventBridge events Karpenter drains nodes on (spot interruptions, rebalances, maintenance)
+INTERRUPTION_EVENTS = {
+    "spot-interruption": {"source": ["aws.ec2"], "detail-type": ["EC2 Spot Instance Interruption Warning"]},
+    "rebalance": {"source": ["aws.ec2"], "detail-type": ["EC2 Instance Rebalance Recommendation"]},
+    "instance-state-change": {"source": ["aws.ec2"], "detail-type": ["EC2 Instance State-change Notification"]},
+    "scheduled-change": {"source": ["aws.health"], "detail-type": ["AWS Health Event"]},
+}
+
+DISCOVERY_TAG = "karpenter.sh/discovery"
+
+
+class KarpenterBootstrap(pulumi.ComponentResource):
+    """AWS side of Karpenter: IAM roles, interruption queue and security group discovery tags
+
+    The controller authenticates through EKS Pod Identity (kube-system/karpenter),
+    so it does not depend on the <env>-oidc stack, which is deployed after eks.
+    Karpenter itself (Helm chart, NodePool, EC2NodeClass) is installed on the
+    cluster separately, using the exported role/queue names and discovery tag.
+    The private subnets get the same tag from the vpc stack (args["discovery"]
+    is its karpenter_discovery output), which owns them.
+    """
+
+    def __init__(self, name: str, cluster_name: pulumi.Input[str], security_group_ids: List[pulumi.Input[str]],
+                 args: dict, opts=None):
+        super().__init__('custom:eks:KarpenterBootstrap', name, None, opts)
+
+        namespace = args.get("namespace", "kube-system")
+        service_account = args.get("service_account", "karpenter")
+        discovery = args.get("discovery", cluster_name)
+
+        # Role for nodes Karpenter launches (EC2NodeClass spec.role)
+        self.node_role = aws.iam.Role(f"{name}-node-role",
+            assume_role_policy=pulumi.Output.json_dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"Service": "ec2.amazonaws.com"},
+                    "Action": "sts:AssumeRole"
+                }]
+            }),
+            tags={"Name": f"{name}-node-role"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        for policy_arn in args.get("node_policies", []):
+            aws.iam.RolePolicyAttachment(f"{name}-node-{policy_arn.rsplit('/', 1)[-1]}",
+                role=self.node_role.name,
+                policy_arn=policy_arn,
+                opts=pulumi.ResourceOptions(parent=self))
+
+        # Lets Karpenter-launched nodes join the cluster
+        aws.eks.AccessEntry(f"{name}-node-access",
+            cluster_name=cluster_name,
+            principal_arn=self.node_role.arn,
+            type="EC2_LINUX",
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # Interruption queue fed by EventBridge
+        self.queue = aws.sqs.Queue(f"{name}-interruption",
+            message_retention_seconds=300,
+            sqs_managed_sse_enabled=True,
+            tags={"Name": f"{name}-interruption"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.sqs.QueuePolicy(f"{name}-interruption-policy",
+            queue_url=self.queue.url,
+            policy=pulumi.Output.json_dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"Service": ["events.amazonaws.com", "sqs.amazonaws.com"]},
+                    "Action": "sqs:SendMessage",
+                    "Resource": self.queue.arn
+                }]
+            }),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        for event, pattern in INTERRUPTION_EVENTS.items():
+            rule = aws.cloudwatch.EventRule(f"{name}-{event}",
+                event_pattern=pulumi.Output.json_dumps(pattern),
+                tags={"Name": f"{name}-{event}"},
+                opts=pulumi.ResourceOptions(parent=self))
+            aws.cloudwatch.EventTarget(f"{name}-{event}-target",
+                rule=rule.name,
+                arn=self.queue.arn,
+                opts=pulumi.ResourceOptions(parent=self))
+
+        # Controller role, assumed through EKS Pod Identity
+        self.controller_role = aws.iam.Role(f"{name}-controller-role",
+            assume_role_policy=pulumi.Output.json_dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"Service": "pods.eks.amazonaws.com"},
+                    "Action": ["sts:AssumeRole", "sts:TagSession"]
+                }]
+            }),
+            tags={"Name": f"{name}-controller-role"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.iam.RolePolicy(f"{name}-controller-policy",
+            role=self.controller_role.id,
+            policy=pulumi.Output.json_dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Sid": "Provisioning",
+                        "Effect": "Allow",
+                        "Action": [
+                            "ec2:CreateFleet", "ec2:CreateLaunchTemplate", "ec2:DeleteLaunchTemplate",
+                            "ec2:RunInstances", "ec2:TerminateInstances", "ec2:CreateTags",
+                            "ec2:DescribeAvailabilityZones", "ec2:DescribeImages", "ec2:DescribeInstances",
+                            "ec2:DescribeInstanceTypeOfferings", "ec2:DescribeInstanceTypes",
+                            "ec2:DescribeLaunchTemplates", "ec2:DescribeSecurityGroups",
+                            "ec2:DescribeSpotPriceHistory", "ec2:DescribeSubnets",
+                            "pricing:GetProducts", "ssm:GetParameter"
+                        ],
+                        "Resource": "*"
+                    },
+                    {
+                        "Sid": "InstanceProfiles",
+                        "Effect": "Allow",
+                        "Action": [
+                            "iam:AddRoleToInstanceProfile", "iam:CreateInstanceProfile", "iam:DeleteInstanceProfile",
+                            "iam:GetInstanceProfile", "iam:RemoveRoleFromInstanceProfile", "iam:TagInstanceProfile"
+                        ],
+                        "Resource": "*"
+                    },
+                    {
+                        "Sid": "PassNodeRole",
+                        "Effect": "Allow",
+                        "Action": "iam:PassRole",
+                        "Resource": self.node_role.arn
+                    },
+                    {
+                        "Sid": "Interruption",
+                        "Effect": "Allow",
+                        "Action": ["sqs:DeleteMessage", "sqs:GetQueueUrl", "sqs:ReceiveMessage"],
+                        "Resource": self.queue.arn
+                    },
+                    {
+                        "Sid": "Cluster",
+                        "Effect": "Allow",
+                        "Action": "eks:DescribeCluster",
+                        "Resource": "*"
+                    }
+                ]
+            }),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.eks.Addon(f"{name}-pod-identity-agent",
+            cluster_name=cluster_name,
+            addon_name="eks-pod-identity-agent",
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.eks.PodIdentityAssociation(f"{name}-controller",
+            cluster_name=cluster_name,
+            namespace=namespace,
+            service_account=service_account,
+            role_arn=self.controller_role.arn,
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # EC2NodeClass selectors find security groups by this tag (the EKS-created
+        # cluster security group is not managed here, so it is tagged separately)
+        for i, security_group_id in enumerate(security_group_ids):
+            aws.ec2.Tag(f"{name}-sg-{i}-discovery",
+                resource_id=security_group_id,
+                key=DISCOVERY_TAG,
+                value=discovery,
+                opts=pulumi.ResourceOptions(parent=self))
+
+        self.register_outputs({
+            "node_role_name": self.node_role.name,
+            "controller_role_arn": self.controller_role.arn,
+            "interruption_queue_name": self.queue.name,
+            "discovery": discovery
+        })
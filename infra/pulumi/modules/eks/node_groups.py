@@ -0,0 +1,194 @@
+import base64
+import pulumi
+import pulumi_aws as aws
+from typing import Dict, List
+from common import pricing
+
+# (max ENIs, IPv4 addresses per ENI, vCPUs) - add instance types here before using them
+ENI_LIMITS: Dict[str, tuple] = {
+    "t3.medium": (3, 6, 2),
+    "t3.large": (3, 12, 2),
+    "t3a.large": (3, 12, 2),
+    "m5.large": (3, 10, 2),
+    "m6a.large": (3, 10, 2),
+    "m6i.large": (3, 10, 2),
+    "m5.xlarge": (4, 15, 4),
+    "m6a.xlarge": (4, 15, 4),
+    "m6i.xlarge": (4, 15, 4),
+    "c6i.xlarge": (4, 15, 4),
+    "m6i.2xlarge": (4, 15, 8),
+    "m6i.4xlarge": (8, 30, 16),
+    "m6i.8xlarge": (8, 30, 32),
+}
+
+NODE_POLICIES = [
+    "arn:aws:iam::aws:policy/AmazonEKSWorkerNodePolicy",
+    "arn:aws:iam::aws:policy/AmazonEKS_CNI_Policy",
+    "arn:aws:iam::aws:policy/AmazonEC2ContainerRegistryReadOnly",
+    "arn:aws:iam::aws:policy/AmazonSSMManagedInstanceCore",
+]
+
+
+def max_pods(instance_type: str, prefix_delegation: bool = True, custom_networking: bool = False) -> int:
+    """kubelet max-pods for one instance type (same formula as EKS max-pods-calculator.sh)
+
+    Each secondary IP slot holds a /28 prefix (16 addresses) with prefix delegation;
+    EKS recommends capping at 110 pods below 30 vCPUs and 250 above. With custom
+    networking the primary ENI stays in the node subnet and holds no pod IPs.
+    """
+    if instance_type not in ENI_LIMITS:
+        raise ValueError(f"No ENI limits for '{instance_type}' - add it to ENI_LIMITS in modules/eks/node_groups.py")
+    enis, ips_per_eni, vcpus = ENI_LIMITS[instance_type]
+    slots = (enis - 1 if custom_networking else enis) * (ips_per_eni - 1)
+    if not prefix_delegation:
+        return slots + 2
+    return min(slots * 16 + 2, 110 if vcpus < 30 else 250)
+
+
+def require_egress(pools: Dict[str, dict], nat_strategy: str) -> str:
+    """Fail before creating node groups whose nodes could never join
+
+    Nodes in the private subnets reach the (public) cluster endpoint and ECR
+    through NAT; with vpc:nat_strategy none they time out as NodeCreationFailure.
+    """
+    sized = sorted(pool for pool, spec in pools.items() if int(spec.get("scaling", {}).get("max", 0)) > 0)
+    if sized and nat_strategy == "none":
+        raise ValueError(f"Node pools {sized} need egress but the vpc stack has no NAT (vpc:nat_strategy none): "
+                         f"set a NAT strategy or max=0 in their eks:*_scaling")
+    return nat_strategy
+
+
+def node_user_data(pods: int) -> str:
+    """AL2023 nodeadm user data merged by EKS into the managed node group's bootstrap"""
+    return base64.b64encode(f"""MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="BOUNDARY"
+
+--BOUNDARY
+Content-Type: application/node.eks.aws
+
+apiVersion: node.eks.aws/v1alpha1
+kind: NodeConfig
+spec:
+  kubelet:
+    config:
+      maxPods: {pods}
+
+--BOUNDARY--
+""".encode()).decode()
+
+
+class NodeGroupSet(pulumi.ComponentResource):
+    """EKS managed node groups, one per pool per private subnet (AZ) - PAID
+
+    Pools come from eks:* config, e.g. an ON_DEMAND base and a SPOT burst pool,
+    each with its own instance types and per-AZ scaling. Every pool gets a
+    launch template with kubelet max-pods tuned for VPC CNI prefix delegation
+    (the smallest value across the pool's instance types).
+
+    WARNING: Nodes are billable EC2 instances. On-demand desired capacity is
+    registered with the cost model; spot capacity is left unpriced.
+    """
+
+    def __init__(self, name: str, cluster_name: pulumi.Input[str], subnet_ids: List[pulumi.Input[str]],
+                 args: dict, opts=None):
+        super().__init__('custom:eks:NodeGroupSet', name, None, opts)
+
+        prefix_delegation = args.get("prefix_delegation", True)
+        custom_networking = args.get("custom_networking", False)
+
+        # One node role shared by every pool (EKS maps it into the cluster automatically)
+        self.node_role = aws.iam.Role(f"{name}-node-role",
+            assume_role_policy=pulumi.Output.json_dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"Service": "ec2.amazonaws.com"},
+                    "Action": "sts:AssumeRole"
+                }]
+            }),
+            tags={"Name": f"{name}-node-role"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        for policy_arn in NODE_POLICIES:
+            aws.iam.RolePolicyAttachment(f"{name}-node-{policy_arn.rsplit('/', 1)[-1]}",
+                role=self.node_role.name,
+                policy_arn=policy_arn,
+                opts=pulumi.ResourceOptions(parent=self))
+
+        self.node_groups = []
+        self.max_pods = {}
+        cost_items = []
+        for pool, spec in args.get("pools", {}).items():
+            scaling = {k: int(v) for k, v in spec.get("scaling", {}).items()}
+            if scaling.get("max", 0) <= 0:
+                continue  # pool disabled for this environment
+            instance_types = list(spec["instance_types"])
+            capacity_type = spec.get("capacity_type", "ON_DEMAND")
+            pods = args.get("max_pods") or min(max_pods(t, prefix_delegation, custom_networking)
+                                               for t in instance_types)
+            self.max_pods[pool] = pods
+
+            launch_template = aws.ec2.LaunchTemplate(f"{name}-{pool}-lt",
+                user_data=node_user_data(pods),
+                block_device_mappings=[aws.ec2.LaunchTemplateBlockDeviceMappingArgs(
+                    device_name="/dev/xvda",
+                    ebs=aws.ec2.LaunchTemplateBlockDeviceMappingEbsArgs(
+                        volume_size=args.get("disk_gb", 50),
+                        volume_type="gp3",
+                        encrypted="true",
+                        delete_on_termination="true"
+                    )
+                )],
+                metadata_options=aws.ec2.LaunchTemplateMetadataOptionsArgs(
+                    http_tokens="required",
+                    http_put_response_hop_limit=2  # pods reach IMDS through the node
+                ),
+                tag_specifications=[aws.ec2.LaunchTemplateTagSpecificationArgs(
+                    resource_type="instance",
+                    tags={"Name": f"{name}-{pool}"}
+                )],
+                tags={"Name": f"{name}-{pool}-lt"},
+                opts=pulumi.ResourceOptions(parent=self))
+
+            for i, subnet_id in enumerate(subnet_ids):
+                node_group = aws.eks.NodeGroup(f"{name}-{pool}-{i}",
+                    cluster_name=cluster_name,
+                    node_group_name_prefix=f"{name}-{pool}-{i}-",
+                    node_role_arn=self.node_role.arn,
+                    subnet_ids=[subnet_id],
+                    capacity_type=capacity_type,
+                    instance_types=instance_types,
+                    scaling_config=aws.eks.NodeGroupScalingConfigArgs(
+                        min_size=scaling.get("min", 0),
+                        desired_size=scaling.get("desired", scaling.get("min", 0)),
+                        max_size=scaling["max"]
+                    ),
+                    update_config=aws.eks.NodeGroupUpdateConfigArgs(max_unavailable=1),
+                    launch_template=aws.eks.NodeGroupLaunchTemplateArgs(
+                        id=launch_template.id,
+                        version=launch_template.latest_version.apply(str)
+                    ),
+                    labels={
+                        "pool": pool,
+                        "capacity-type": capacity_type.lower().replace("_", "-")
+                    },
+                    tags={"Name": f"{name}-{pool}-{i}"},
+                    opts=pulumi.ResourceOptions(
+                        parent=self,
+                        # Cluster autoscaler / Karpenter own the desired size after creation
+                        ignore_changes=["scalingConfig.desiredSize"]))
+                self.node_groups.append(node_group)
+
+            if capacity_type == "ON_DEMAND" and scaling.get("desired", 0):
+                cost_items.append(pricing.hourly(name, f"{pool} nodes ({instance_types[0]})",
+                                                 f"ec2:{instance_types[0]}",
+                                                 scaling["desired"] * len(subnet_ids)))
+
+        pricing.register(*cost_items)
+        self.cost_items = cost_items
+
+        self.register_outputs({
+            "node_role_arn": self.node_role.arn,
+            "node_group_names": [ng.node_group_name for ng in self.node_groups],
+            "max_pods": self.max_pods
+        })
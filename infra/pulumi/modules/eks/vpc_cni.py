@@ -0,0 +1,52 @@
+import json
+import pulumi
+import pulumi_aws as aws
+
+# Worker nodes pick their ENIConfig (pod subnet + security groups) by AZ label
+ENI_CONFIG_LABEL = "topology.kubernetes.io/zone"
+
+
+def cni_configuration(prefix_delegation: bool, custom_networking: bool) -> dict:
+    """aws-node environment for the vpc-cni addon's configuration_values"""
+    env = {}
+    if prefix_delegation:
+        env.update({
+            "ENABLE_PREFIX_DELEGATION": "true",
+            "WARM_PREFIX_TARGET": "1",  # keep one spare /28 per node instead of 16 spare IPs
+        })
+    if custom_networking:
+        env.update({
+            "AWS_VPC_K8S_CNI_CUSTOM_NETWORK_CFG": "true",
+            "ENI_CONFIG_LABEL_DEF": ENI_CONFIG_LABEL,
+        })
+    return {"env": env}
+
+
+class VpcCniAddon(pulumi.ComponentResource):
+    """Managed vpc-cni addon configured for prefix delegation and custom networking
+
+    With custom networking, pod ENIs go to the pod subnets named by one
+    ENIConfig per AZ (created by eks_stack on the cluster), and node primary
+    ENIs stay in the private subnets. Nodes must be launched after this is applied.
+    """
+
+    def __init__(self, name: str, cluster_name: pulumi.Input[str], args: dict, opts=None):
+        super().__init__('custom:eks:VpcCniAddon', name, None, opts)
+
+        self.configuration = cni_configuration(args.get("prefix_delegation", True),
+                                               args.get("custom_networking", False))
+
+        self.addon = aws.eks.Addon(f"{name}-vpc-cni",
+            cluster_name=cluster_name,
+            addon_name="vpc-cni",
+            addon_version=args.get("addon_version"),
+            configuration_values=json.dumps(self.configuration),
+            resolve_conflicts_on_create="OVERWRITE",
+            resolve_conflicts_on_update="OVERWRITE",
+            tags={"Name": f"{name}-vpc-cni"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        self.register_outputs({
+            "addon_name": self.addon.addon_name,
+            "configuration": self.configuration
+        })
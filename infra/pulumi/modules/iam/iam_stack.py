@@ -1,157 +1,105 @@
 import pulumi
 import pulumi_aws as aws
 import json
-from typing import Dict, List
+from common.invoke_cache import cached_invoke
+from common.tagging import MANAGED_BY
+from config.defaults import EPHEMERAL_ENV
+from config.resolver import load_config
+from modules.iam.policy_compiler import compile_policies
+
+GITHUB_OIDC_HOST = "token.actions.githubusercontent.com"
+# Intermediate CA thumbprint; AWS validates GitHub's certificate itself but the API still requires one
+GITHUB_OIDC_THUMBPRINT = "6938fd4d98bab03faadb97b34396831e3780aea1"
 
 def run(env: str):
-    """Main IAM stack for creating users and policies"""
-    
-    config = pulumi.Config()
-    stack = pulumi.get_stack()
-    
-    # Check if user already exists by trying to get it
-    existing_user = None
-    user_name = f"pulumi-{env}-user"
-    
-    try:
-        # Try to import existing user
-        existing_user = aws.iam.get_user(user_name=user_name)
-        pulumi.log.info(f"User {user_name} already exists")
-    except:
-        pulumi.log.info(f"User {user_name} does not exist, will create it")
-    
-    # Create IAM user for Pulumi operations in this environment
-    user = aws.iam.User(f"{env}-pulumi-user",
-        name=user_name,
+    """Main IAM stack: an OIDC-assumable deploy role with a compiled least-privilege policy"""
+
+    cfg = load_config(env)
+
+    # Resource types declared by these modules decide the deploy role's actions
+    components = ["vpc"]
+    if cfg["iam:enable_eks_permissions"]:
+        components += ["eks", "oidc"]
+
+    # The shared 'pr' role deploys every pr-<n> environment and the pr-pool shells
+    scope = f"{env}-*" if env == EPHEMERAL_ENV else env
+    # Both tags are set on every resource by the stack tag policy (common/tagging.py)
+    compiled = compile_policies(scope, components, scope_tags={"Environment": scope, "ManagedBy": MANAGED_BY})
+    pulumi.log.info(f"Deploy policy for {env}: {len(compiled.actions)} actions over "
+                    f"{len(compiled.resource_types)} resource types "
+                    f"({'cached' if compiled.cached else 'compiled'} {compiled.digest[:12]})")
+
+    # GitHub Actions identity provider (one per account)
+    provider_arn = cfg["iam:github_oidc_provider_arn"]
+    if cfg["iam:create_github_oidc_provider"]:
+        provider = aws.iam.OpenIdConnectProvider(f"{env}-github-oidc",
+            url=f"https://{GITHUB_OIDC_HOST}",
+            client_id_lists=["sts.amazonaws.com"],
+            thumbprint_lists=[GITHUB_OIDC_THUMBPRINT])
+        provider_arn = provider.arn
+    elif not provider_arn:
+        account_id = cached_invoke(aws.get_caller_identity).account_id
+        provider_arn = f"arn:aws:iam::{account_id}:oidc-provider/{GITHUB_OIDC_HOST}"
+
+    # Only workflow jobs bound to the matching GitHub environment may assume the role
+    trust_policy = pulumi.Output.from_input(provider_arn).apply(lambda arn: json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Effect": "Allow",
+            "Principal": {"Federated": arn},
+            "Action": "sts:AssumeRoleWithWebIdentity",
+            "Condition": {
+                "StringEquals": {
+                    f"{GITHUB_OIDC_HOST}:aud": "sts.amazonaws.com",
+                    f"{GITHUB_OIDC_HOST}:sub": f"repo:{cfg['iam:github_repo']}:environment:{env}",
+                }
+            }
+        }]
+    }))
+
+    role = aws.iam.Role(f"{env}-deploy-role",
+        name=f"pulumi-{env}-deploy",
+        description=f"Pulumi deployments for the {env} environment (GitHub Actions OIDC)",
+        assume_role_policy=trust_policy,
+        max_session_duration=3600,
         tags={
-            "Environment": env,
-            "ManagedBy": "Pulumi",
-            "Purpose": "Infrastructure provisioning"
+            "Purpose": "Infrastructure provisioning",
+            "PolicyDigest": compiled.digest[:12]
         })
-    
-    # Create access key for the user
-    access_key = aws.iam.AccessKey(f"{env}-pulumi-access-key",
-        user=user.name)
-    
-    # Define policies for VPC management
-    vpc_policy_document = aws.iam.get_policy_document(statements=[
-        {
-            "sid": "VPCManagement",
-            "effect": "Allow",
-            "actions": [
-                "ec2:DescribeAvailabilityZones",
-                "ec2:DescribeVpcs",
-                "ec2:CreateVpc",
-                "ec2:DeleteVpc",
-                "ec2:ModifyVpcAttribute",
-                "ec2:DescribeVpcAttribute",
-                "ec2:DescribeInternetGateways",
-                "ec2:CreateInternetGateway",
-                "ec2:DeleteInternetGateway",
-                "ec2:AttachInternetGateway",
-                "ec2:DetachInternetGateway",
-                "ec2:DescribeSubnets",
-                "ec2:CreateSubnet",
-                "ec2:DeleteSubnet",
-                "ec2:ModifySubnetAttribute",
-                "ec2:DescribeRouteTables",
-                "ec2:CreateRouteTable",
-                "ec2:DeleteRouteTable",
-                "ec2:CreateRoute",
-                "ec2:DeleteRoute",
-                "ec2:ReplaceRoute",
-                "ec2:AssociateRouteTable",
-                "ec2:DisassociateRouteTable",
-                "ec2:DescribeSecurityGroups",
-                "ec2:CreateSecurityGroup",
-                "ec2:DeleteSecurityGroup",
-                "ec2:AuthorizeSecurityGroupIngress",
-                "ec2:AuthorizeSecurityGroupEgress",
-                "ec2:RevokeSecurityGroupIngress",
-                "ec2:RevokeSecurityGroupEgress",
-                "ec2:CreateTags",
-                "ec2:DeleteTags",
-                "ec2:DescribeTags",
-                "ec2:DescribeNatGateways",
-                "ec2:CreateNatGateway",
-                "ec2:DeleteNatGateway",
-                "ec2:AllocateAddress",
-                "ec2:ReleaseAddress",
-                "ec2:DescribeAddresses",
-                "ec2:AssociateAddress",
-                "ec2:DisassociateAddress"
-            ],
-            "resources": ["*"]
-        }
-    ])
-    
-    # Create VPC management policy
-    vpc_policy = aws.iam.Policy(f"{env}-vpc-policy",
-        name=f"{env}-vpc-management-policy",
-        description=f"Policy for managing VPCs in {env} environment",
-        policy=vpc_policy_document.json)
-    
-    # Attach the policy to the user
-    vpc_policy_attachment = aws.iam.UserPolicyAttachment(f"{env}-vpc-policy-attachment",
-        user=user.name,
-        policy_arn=vpc_policy.arn)
-    
-    # Additional policies for EKS (future use)
-    if config.get_bool("iam:enable_eks_permissions"):
-        eks_policy_document = aws.iam.get_policy_document(statements=[
-            {
-                "sid": "EKSManagement",
-                "effect": "Allow",
-                "actions": [
-                    "eks:*",
-                    "iam:CreateRole",
-                    "iam:DeleteRole",
-                    "iam:GetRole",
-                    "iam:ListRoles",
-                    "iam:AttachRolePolicy",
-                    "iam:DetachRolePolicy",
-                    "iam:GetRolePolicy",
-                    "iam:PutRolePolicy",
-                    "iam:DeleteRolePolicy",
-                    "iam:ListRolePolicies",
-                    "iam:CreateServiceLinkedRole",
-                    "iam:PassRole"
-                ],
-                "resources": ["*"]
-            }
-        ])
-        
-        eks_policy = aws.iam.Policy(f"{env}-eks-policy",
-            name=f"{env}-eks-management-policy",
-            description=f"Policy for managing EKS in {env} environment",
-            policy=eks_policy_document.json)
-        
-        eks_policy_attachment = aws.iam.UserPolicyAttachment(f"{env}-eks-policy-attachment",
-            user=user.name,
-            policy_arn=eks_policy.arn)
-    
+
+    policies = []
+    for i, document in enumerate(compiled.documents):
+        policy = aws.iam.Policy(f"{env}-deploy-policy-{i}",
+            name=f"{env}-deploy-policy-{i}",
+            description=f"Least-privilege deploy policy for {env} ({', '.join(components)}), part {i + 1}",
+            policy=json.dumps(document))
+        aws.iam.RolePolicyAttachment(f"{env}-deploy-policy-{i}-attachment",
+            role=role.name,
+            policy_arn=policy.arn)
+        policies.append(policy)
+
     # Export outputs
-    pulumi.export("iam_user_name", user.name)
-    pulumi.export("iam_user_arn", user.arn)
-    
-    # Export access key (marked as secret)
-    pulumi.export("access_key_id", pulumi.Output.secret(access_key.id))
-    pulumi.export("secret_access_key", pulumi.Output.secret(access_key.secret))
-    
-    # Export instructions for using the credentials
-    pulumi.export("setup_instructions", pulumi.Output.all(access_key.id, user.name).apply(
-        lambda args: f"""
-To use these credentials:
+    pulumi.export("deploy_role_name", role.name)
+    pulumi.export("deploy_role_arn", role.arn)
+    pulumi.export("deploy_policy_arns", [policy.arn for policy in policies])
+    pulumi.export("deploy_policy_resource_types", compiled.resource_types)
+
+    # Export instructions for using the role
+    pulumi.export("setup_instructions", role.arn.apply(
+        lambda arn: f"""
+To deploy {env} from GitHub Actions (no long-lived access keys):
 
-1. Configure AWS CLI profile:
-   aws configure --profile {env}-pulumi
-   AWS Access Key ID: [Run 'pulumi stack output access_key_id --show-secrets' to see]
-   AWS Secret Access Key: [Run 'pulumi stack output secret_access_key --show-secrets' to see]
-   Default region: us-east-1
-   Default output format: json
+1. Store the role ARN as the AWS_DEPLOY_ROLE_ARN secret of the '{env}' GitHub environment:
+   {arn}
 
-2. Update VPC stack to use this profile:
-   pulumi config set aws:profile {env}-pulumi --stack {env}-vpc
+2. Give the job OIDC permissions and assume the role:
+   permissions:
+     id-token: write
+     contents: read
+   - uses: aws-actions/configure-aws-credentials@v4
+     with:
+       role-to-assume: ${{{{ secrets.AWS_DEPLOY_ROLE_ARN }}}}
+       aws-region: us-east-1
 
-User ARN: {args[1]}
-"""))
\ No newline at end of file
+Trusted subject: repo:{cfg['iam:github_repo']}:environment:{env}
+"""))
@@ -0,0 +1,448 @@
+"""
+Least-privilege policy compiler for the deploy role.
+
+Scans the stack modules (vpc, eks, oidc) for the resource types and invokes
+they actually declare, maps each one to the IAM actions Pulumi needs to
+create, update, read and delete it, and emits policy documents scoped to one
+environment:
+
+- create actions require the environment's tags on the request (aws:RequestTag/...)
+- update/delete actions require them on the resource (aws:ResourceTag/...)
+- services without tag conditions (IAM, S3, Glue, EKS) are scoped by the
+  '<env>-' name prefix Pulumi gives every resource in this project
+- actions without resource-level permissions get their own UnscopedCreate
+  statement on '*'
+
+Documents are built locally (no get_policy_document invokes) and cached by a
+hash of the scanned sources, the action map and the scope, so unchanged
+previews skip the scan entirely.
+"""
+
+import ast
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MODULES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(MODULES_DIR), ".cache", "policies")
+
+# Managed policies are limited to 6,144 characters (whitespace excluded)
+MAX_POLICY_SIZE = 6144
+
+# Provider packages whose constructors/invokes are tracked: import name -> prefix
+PROVIDER_PACKAGES = {"pulumi_aws": "aws", "pulumi_eks": "eks"}
+
+
+@dataclass(frozen=True)
+class ActionSet:
+    """IAM actions for one resource type or invoke.
+
+    `resources` (ARN templates with {env}) switches from tag conditions to
+    name-prefix scoping for services that cannot condition on tags.
+    `unscoped` actions do not support resource-level permissions at all.
+    """
+    create: Tuple[str, ...] = ()
+    manage: Tuple[str, ...] = ()
+    read: Tuple[str, ...] = ()
+    unscoped: Tuple[str, ...] = ()
+    resources: Tuple[str, ...] = ()
+    includes: Tuple[str, ...] = ()  # resource types a component creates internally
+
+
+_EC2_TAGS = ("ec2:CreateTags", "ec2:DeleteTags")
+_ROLE_ARN = "arn:aws:iam::*:role/{env}-*"
+_INSTANCE_PROFILE_ARN = "arn:aws:iam::*:instance-profile/{env}-*"
+
+ACTION_MAP: Dict[str, ActionSet] = {
+    # EC2 / VPC
+    "aws.ec2.Vpc": ActionSet(
+        create=("ec2:CreateVpc",),
+        manage=("ec2:DeleteVpc", "ec2:ModifyVpcAttribute") + _EC2_TAGS,
+        # reading a VPC also reads its default network ACL, default security group and main route table
+        read=("ec2:DescribeVpcs", "ec2:DescribeVpcAttribute", "ec2:DescribeTags", "ec2:DescribeNetworkAcls",
+              "ec2:DescribeSecurityGroups", "ec2:DescribeRouteTables")),
+    "aws.ec2.VpcIpv4CidrBlockAssociation": ActionSet(
+        manage=("ec2:AssociateVpcCidrBlock", "ec2:DisassociateVpcCidrBlock"),
+        read=("ec2:DescribeVpcs",)),
+    "aws.ec2.InternetGateway": ActionSet(
+        create=("ec2:CreateInternetGateway",),
+        manage=("ec2:DeleteInternetGateway", "ec2:AttachInternetGateway", "ec2:DetachInternetGateway") + _EC2_TAGS,
+        read=("ec2:DescribeInternetGateways",)),
+    "aws.ec2.Subnet": ActionSet(
+        create=("ec2:CreateSubnet",),
+        manage=("ec2:DeleteSubnet", "ec2:ModifySubnetAttribute") + _EC2_TAGS,
+        read=("ec2:DescribeSubnets",)),
+    "aws.ec2.RouteTable": ActionSet(
+        create=("ec2:CreateRouteTable",),
+        manage=("ec2:DeleteRouteTable",) + _EC2_TAGS,
+        read=("ec2:DescribeRouteTables",)),
+    "aws.ec2.Route": ActionSet(
+        manage=("ec2:CreateRoute", "ec2:ReplaceRoute", "ec2:DeleteRoute"),
+        read=("ec2:DescribeRouteTables",)),
+    "aws.ec2.RouteTableAssociation": ActionSet(
+        manage=("ec2:AssociateRouteTable", "ec2:DisassociateRouteTable", "ec2:ReplaceRouteTableAssociation"),
+        read=("ec2:DescribeRouteTables",)),
+    "aws.ec2.Eip": ActionSet(
+        create=("ec2:AllocateAddress",),
+        manage=("ec2:ReleaseAddress", "ec2:AssociateAddress", "ec2:DisassociateAddress") + _EC2_TAGS,
+        read=("ec2:DescribeAddresses", "ec2:DescribeAddressesAttribute")),
+    "aws.ec2.NatGateway": ActionSet(
+        create=("ec2:CreateNatGateway",),
+        manage=("ec2:DeleteNatGateway",) + _EC2_TAGS,
+        read=("ec2:DescribeNatGateways",)),
+    "aws.ec2.SecurityGroup": ActionSet(
+        create=("ec2:CreateSecurityGroup",),
+        manage=("ec2:DeleteSecurityGroup", "ec2:AuthorizeSecurityGroupIngress", "ec2:AuthorizeSecurityGroupEgress",
+                "ec2:RevokeSecurityGroupIngress", "ec2:RevokeSecurityGroupEgress") + _EC2_TAGS,
+        read=("ec2:DescribeSecurityGroups", "ec2:DescribeSecurityGroupRules")),
+    "aws.ec2.SecurityGroupRule": ActionSet(
+        manage=("ec2:AuthorizeSecurityGroupIngress", "ec2:AuthorizeSecurityGroupEgress",
+                "ec2:RevokeSecurityGroupIngress", "ec2:RevokeSecurityGroupEgress"),
+        read=("ec2:DescribeSecurityGroups", "ec2:DescribeSecurityGroupRules")),
+    "aws.ec2.VpcEndpoint": ActionSet(
+        create=("ec2:CreateVpcEndpoint",),
+        manage=("ec2:ModifyVpcEndpoint", "ec2:DeleteVpcEndpoints") + _EC2_TAGS,
+        read=("ec2:DescribeVpcEndpoints", "ec2:DescribePrefixLists")),
+    "aws.ec2.NetworkInterface": ActionSet(
+        create=("ec2:CreateNetworkInterface",),
+        manage=("ec2:DeleteNetworkInterface", "ec2:ModifyNetworkInterfaceAttribute") + _EC2_TAGS,
+        read=("ec2:DescribeNetworkInterfaces",)),
+    "aws.ec2.LaunchTemplate": ActionSet(
+        create=("ec2:CreateLaunchTemplate",),
+        manage=("ec2:CreateLaunchTemplateVersion", "ec2:ModifyLaunchTemplate", "ec2:DeleteLaunchTemplate") + _EC2_TAGS,
+        read=("ec2:DescribeLaunchTemplates", "ec2:DescribeLaunchTemplateVersions")),
+    "aws.ec2.FlowLog": ActionSet(
+        create=("ec2:CreateFlowLogs",),
+        manage=("ec2:DeleteFlowLogs",) + _EC2_TAGS,
+        read=("ec2:DescribeFlowLogs",),
+        unscoped=("logs:CreateLogDelivery", "logs:DeleteLogDelivery")),
+
+    # NetBench agents; RunInstances also touches the subnet, AMI, ENI and volume, which carry no request tags
+    "aws.ec2.Instance": ActionSet(
+        manage=("ec2:TerminateInstances", "ec2:StopInstances", "ec2:StartInstances",
+                "ec2:ModifyInstanceAttribute", "ec2:ModifyInstanceMetadataOptions") + _EC2_TAGS,
+        read=("ec2:DescribeInstances", "ec2:DescribeInstanceAttribute", "ec2:DescribeInstanceTypes",
+              "ec2:DescribeInstanceCreditSpecifications", "ec2:DescribeVolumes", "ec2:DescribeTags"),
+        unscoped=("ec2:RunInstances",)),
+
+    # Auto Scaling (NAT instances); validating the launch template needs RunInstances/PassRole
+    "aws.autoscaling.Group": ActionSet(
+        create=("autoscaling:CreateAutoScalingGroup",),
+        manage=("autoscaling:UpdateAutoScalingGroup", "autoscaling:DeleteAutoScalingGroup",
+                "autoscaling:CreateOrUpdateTags", "autoscaling:DeleteTags"),
+        read=("autoscaling:DescribeAutoScalingGroups", "autoscaling:DescribeScalingActivities"),
+        unscoped=("ec2:RunInstances", "iam:CreateServiceLinkedRole")),
+
+    # IAM: no tag conditions on most actions, scoped by name prefix
+    "aws.iam.Role": ActionSet(
+        manage=("iam:CreateRole", "iam:DeleteRole", "iam:TagRole", "iam:UntagRole", "iam:UpdateAssumeRolePolicy",
+                "iam:PassRole"),
+        read=("iam:GetRole", "iam:ListRolePolicies", "iam:ListAttachedRolePolicies",
+              "iam:ListInstanceProfilesForRole"),
+        resources=(_ROLE_ARN,)),
+    "aws.iam.RolePolicy": ActionSet(
+        manage=("iam:PutRolePolicy", "iam:DeleteRolePolicy"),
+        read=("iam:GetRolePolicy",),
+        resources=(_ROLE_ARN,)),
+    "aws.iam.RolePolicyAttachment": ActionSet(
+        manage=("iam:AttachRolePolicy", "iam:DetachRolePolicy"),
+        read=("iam:ListAttachedRolePolicies",),
+        resources=(_ROLE_ARN,)),
+    "aws.iam.InstanceProfile": ActionSet(
+        manage=("iam:CreateInstanceProfile", "iam:DeleteInstanceProfile", "iam:AddRoleToInstanceProfile",
+                "iam:RemoveRoleFromInstanceProfile", "iam:TagInstanceProfile"),
+        read=("iam:GetInstanceProfile",),
+        resources=(_INSTANCE_PROFILE_ARN, _ROLE_ARN)),
+    "aws.iam.OpenIdConnectProvider": ActionSet(
+        manage=("iam:CreateOpenIDConnectProvider", "iam:DeleteOpenIDConnectProvider",
+                "iam:UpdateOpenIDConnectProviderThumbprint", "iam:TagOpenIDConnectProvider"),
+        read=("iam:GetOpenIDConnectProvider",),
+        resources=("arn:aws:iam::*:oidc-provider/oidc.eks.*",)),
+
+    # S3 / Glue (flow logs, netbench): scoped by bucket and database name;
+    # force_destroy empties a bucket object by object before deleting it
+    "aws.s3.BucketV2": ActionSet(
+        manage=("s3:CreateBucket", "s3:DeleteBucket", "s3:PutBucketTagging",
+                "s3:ListBucketVersions", "s3:DeleteObject", "s3:DeleteObjectVersion"),
+        read=("s3:ListBucket", "s3:GetBucket*", "s3:GetAccelerateConfiguration", "s3:GetLifecycleConfiguration",
+              "s3:GetReplicationConfiguration", "s3:GetEncryptionConfiguration"),
+        resources=("arn:aws:s3:::{env}-*", "arn:aws:s3:::{env}-*/*")),
+    "aws.s3.BucketPublicAccessBlock": ActionSet(
+        manage=("s3:PutBucketPublicAccessBlock",),
+        resources=("arn:aws:s3:::{env}-*",)),
+    "aws.s3.BucketServerSideEncryptionConfigurationV2": ActionSet(
+        manage=("s3:PutEncryptionConfiguration",),
+        resources=("arn:aws:s3:::{env}-*",)),
+    "aws.s3.BucketLifecycleConfigurationV2": ActionSet(
+        manage=("s3:PutLifecycleConfiguration",),
+        resources=("arn:aws:s3:::{env}-*",)),
+    "aws.s3.BucketPolicy": ActionSet(
+        manage=("s3:PutBucketPolicy", "s3:DeleteBucketPolicy"),
+        resources=("arn:aws:s3:::{env}-*",)),
+    "aws.glue.CatalogDatabase": ActionSet(
+        manage=("glue:CreateDatabase", "glue:UpdateDatabase", "glue:DeleteDatabase"),
+        read=("glue:GetDatabase",),
+        resources=("arn:aws:glue:*:*:catalog", "arn:aws:glue:*:*:database/{env_}_*")),
+    "aws.glue.CatalogTable": ActionSet(
+        manage=("glue:CreateTable", "glue:UpdateTable", "glue:DeleteTable"),
+        read=("glue:GetTable",),
+        resources=("arn:aws:glue:*:*:catalog", "arn:aws:glue:*:*:database/{env_}_*",
+                   "arn:aws:glue:*:*:table/{env_}_*/*")),
+
+    # EKS (pulumi_eks component)
+    "eks.Cluster": ActionSet(
+        manage=("eks:CreateCluster", "eks:DeleteCluster", "eks:UpdateClusterConfig", "eks:UpdateClusterVersion",
+                "eks:TagResource", "eks:UntagResource"),
+        read=("eks:DescribeCluster", "eks:DescribeUpdate", "eks:ListClusters"),
+        resources=("arn:aws:eks:*:*:cluster/{env}-*",),
+        includes=("aws.iam.Role", "aws.iam.RolePolicyAttachment", "aws.iam.InstanceProfile",
+                  "aws.ec2.SecurityGroup", "aws.ec2.SecurityGroupRule")),
+
+    "aws.eks.NodeGroup": ActionSet(
+        manage=("eks:CreateNodegroup", "eks:DeleteNodegroup", "eks:UpdateNodegroupConfig",
+                "eks:UpdateNodegroupVersion", "eks:TagResource", "eks:UntagResource"),
+        read=("eks:DescribeNodegroup", "eks:ListNodegroups", "eks:DescribeUpdate"),
+        resources=("arn:aws:eks:*:*:cluster/{env}-*", "arn:aws:eks:*:*:nodegroup/{env}-*/*/*"),
+        unscoped=("ec2:RunInstances", "iam:CreateServiceLinkedRole"),
+        includes=("aws.iam.Role",)),
+    "aws.eks.Addon": ActionSet(
+        manage=("eks:CreateAddon", "eks:DeleteAddon", "eks:UpdateAddon", "eks:TagResource"),
+        read=("eks:DescribeAddon", "eks:DescribeAddonVersions", "eks:DescribeAddonConfiguration"),
+        resources=("arn:aws:eks:*:*:cluster/{env}-*", "arn:aws:eks:*:*:addon/{env}-*/*/*")),
+    "aws.eks.AccessEntry": ActionSet(
+        manage=("eks:CreateAccessEntry", "eks:DeleteAccessEntry", "eks:UpdateAccessEntry", "eks:TagResource"),
+        read=("eks:DescribeAccessEntry",),
+        resources=("arn:aws:eks:*:*:cluster/{env}-*", "arn:aws:eks:*:*:access-entry/{env}-*/*")),
+    "aws.eks.PodIdentityAssociation": ActionSet(
+        manage=("eks:CreatePodIdentityAssociation", "eks:DeletePodIdentityAssociation",
+                "eks:UpdatePodIdentityAssociation", "eks:TagResource", "iam:PassRole"),
+        read=("eks:DescribePodIdentityAssociation",),
+        resources=("arn:aws:eks:*:*:cluster/{env}-*", "arn:aws:eks:*:*:podidentityassociation/{env}-*/*",
+                   _ROLE_ARN)),
+    "aws.ec2.Tag": ActionSet(
+        manage=_EC2_TAGS,
+        read=("ec2:DescribeTags",)),
+
+    # SQS / EventBridge (Karpenter interruption handling)
+    "aws.sqs.Queue": ActionSet(
+        manage=("sqs:CreateQueue", "sqs:DeleteQueue", "sqs:SetQueueAttributes", "sqs:TagQueue", "sqs:UntagQueue"),
+        read=("sqs:GetQueueAttributes", "sqs:GetQueueUrl", "sqs:ListQueueTags"),
+        resources=("arn:aws:sqs:*:*:{env}-*",)),
+    "aws.sqs.QueuePolicy": ActionSet(
+        manage=("sqs:SetQueueAttributes",),
+        read=("sqs:GetQueueAttributes",),
+        resources=("arn:aws:sqs:*:*:{env}-*",)),
+    "aws.cloudwatch.EventRule": ActionSet(
+        manage=("events:PutRule", "events:DeleteRule", "events:TagResource", "events:UntagResource"),
+        read=("events:DescribeRule", "events:ListTagsForResource", "events:ListTargetsByRule"),
+        resources=("arn:aws:events:*:*:rule/{env}-*",)),
+    "aws.cloudwatch.EventTarget": ActionSet(
+        manage=("events:PutTargets", "events:RemoveTargets"),
+        read=("events:ListTargetsByRule",),
+        resources=("arn:aws:events:*:*:rule/{env}-*",)),
+
+    # Explicit providers (vpc:targets) assume pulumi-<env>-* roles in the target accounts
+    "aws.Provider": ActionSet(
+        manage=("sts:AssumeRole", "sts:TagSession"),
+        resources=("arn:aws:iam::*:role/pulumi-{env}-*",)),
+
+    # Invokes
+    "aws.get_availability_zones": ActionSet(read=("ec2:DescribeAvailabilityZones",)),
+    "aws.ec2.get_ami": ActionSet(read=("ec2:DescribeImages",)),
+    "aws.get_caller_identity": ActionSet(),
+    "aws.iam.get_policy_document": ActionSet(),
+}
+
+
+class PolicyCompileError(ValueError):
+    """A scanned resource type has no entry in ACTION_MAP"""
+
+
+@dataclass
+class CompiledPolicy:
+    """Policy documents for one environment, plus what they were compiled from"""
+    documents: List[dict]
+    resource_types: List[str]
+    digest: str
+    cached: bool = False
+    actions: List[str] = field(default_factory=list)
+
+
+def _dotted(node: ast.AST) -> Optional[str]:
+    """'aws.ec2.Vpc' for an Attribute chain rooted at a Name, else None"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def scan_source(source: str) -> Set[str]:
+    """Resource constructors and invokes of tracked providers used in one module"""
+    tree = ast.parse(source)
+    aliases = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for name in node.names:
+                if name.name in PROVIDER_PACKAGES:
+                    aliases[name.asname or name.name] = PROVIDER_PACKAGES[name.name]
+
+    found = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        # aws.ec2.Vpc(...) / aws.get_availability_zones(...) / cached_invoke(aws.ec2.get_ami, ...)
+        candidates = [node.func] + ([node.args[0]] if node.args else [])
+        for candidate in candidates:
+            dotted = _dotted(candidate)
+            if not dotted or "." not in dotted:
+                continue
+            root, rest = dotted.split(".", 1)
+            name = rest.rsplit(".", 1)[-1]
+            if root not in aliases or name.endswith("Args"):
+                continue
+            if candidate is not node.func and not name.startswith("get_"):
+                continue
+            found.add(f"{aliases[root]}.{rest}")
+    return found
+
+
+def module_sources(components: Iterable[str], modules_dir: str = MODULES_DIR) -> Dict[str, str]:
+    """{relative path: source} of every .py file in the given component modules"""
+    sources = {}
+    for component in components:
+        directory = os.path.join(modules_dir, component)
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".py"):
+                with open(os.path.join(directory, filename)) as f:
+                    sources[f"{component}/{filename}"] = f.read()
+    return sources
+
+
+def resource_types(sources: Dict[str, str]) -> List[str]:
+    """Every tracked type in the sources, with component-internal types expanded"""
+    types = set()
+    for source in sources.values():
+        types |= scan_source(source)
+    unmapped = sorted(t for t in types if t not in ACTION_MAP)
+    if unmapped:
+        raise PolicyCompileError(f"No IAM actions mapped for: {', '.join(unmapped)} "
+                                 "(add them to ACTION_MAP in modules/iam/policy_compiler.py)")
+    for t in list(types):
+        types |= set(ACTION_MAP[t].includes)
+    return sorted(types)
+
+
+def _statement(sid: str, actions: Iterable[str], resources: List[str], condition: Optional[dict] = None) -> dict:
+    statement = {"Sid": sid, "Effect": "Allow", "Action": sorted(set(actions)), "Resource": resources}
+    if condition:
+        statement["Condition"] = condition
+    return statement
+
+
+def _tag_condition(key: str, scope_tags: Dict[str, str]) -> dict:
+    """StringEquals on each scope tag, StringLike for wildcard values such as 'pr-*'"""
+    condition: Dict[str, Dict[str, str]] = {}
+    for k, v in scope_tags.items():
+        condition.setdefault("StringLike" if "*" in v else "StringEquals", {})[f"{key}/{k}"] = v
+    return condition
+
+
+def build_statements(types: List[str], env: str, scope_tags: Dict[str, str]) -> List[dict]:
+    """Minimal statements for the given resource types, scoped to env"""
+    read, create, manage, unscoped = set(), set(), set(), set()
+    by_resources: Dict[Tuple[str, ...], Set[str]] = {}
+    for t in types:
+        actions = ACTION_MAP[t]
+        read |= set(actions.read)
+        unscoped |= set(actions.unscoped)
+        if actions.resources:
+            arns = tuple(sorted(a.format(env=env, env_=env.replace("-", "_")) for a in actions.resources))
+            by_resources.setdefault(arns, set()).update(actions.create + actions.manage)
+        else:
+            create |= set(actions.create)
+            manage |= set(actions.manage)
+
+    statements = []
+    if read:
+        statements.append(_statement("Read", read, ["*"]))
+    if unscoped:
+        # Mutating actions without resource-level permissions (RunInstances, service-linked roles, ...)
+        statements.append(_statement("UnscopedCreate", unscoped, ["*"]))
+    if create:
+        statements.append(_statement("CreateTagged", create, ["*"], _tag_condition("aws:RequestTag", scope_tags)))
+        ec2_creates = sorted(a.split(":", 1)[1] for a in create if a.startswith("ec2:"))
+        if ec2_creates:
+            # Tag-on-create is authorized separately from the create call itself
+            statements.append(_statement("TagOnCreate", ["ec2:CreateTags"], ["*"], {
+                "StringEquals": {"ec2:CreateAction": ec2_creates}}))
+    if manage:
+        statements.append(_statement("ManageTagged", manage, ["*"], _tag_condition("aws:ResourceTag", scope_tags)))
+    for i, (arns, actions) in enumerate(sorted(by_resources.items())):
+        if actions:
+            statements.append(_statement(f"ManageByName{i + 1}", actions, list(arns)))
+    return statements
+
+
+def _size(document: dict) -> int:
+    return len(json.dumps(document, separators=(",", ":")))
+
+
+def pack_documents(statements: List[dict]) -> List[dict]:
+    """Split statements over as few managed-policy-sized documents as possible"""
+    documents: List[dict] = []
+    for statement in statements:
+        for document in documents:
+            if _size({**document, "Statement": document["Statement"] + [statement]}) <= MAX_POLICY_SIZE:
+                document["Statement"].append(statement)
+                break
+        else:
+            document = {"Version": "2012-10-17", "Statement": [statement]}
+            if _size(document) > MAX_POLICY_SIZE:
+                raise PolicyCompileError(f"Statement {statement['Sid']} alone exceeds {MAX_POLICY_SIZE} characters")
+            documents.append(document)
+    return documents
+
+
+def _cache_dir() -> str:
+    return os.environ.get("PULUMI_POLICY_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def compile_policies(env: str, components: Iterable[str], scope_tags: Dict[str, str],
+                     modules_dir: str = MODULES_DIR) -> CompiledPolicy:
+    """Policy documents for the resources declared by `components`, cached by content hash"""
+    sources = module_sources(components, modules_dir)
+    digest = hashlib.sha256(json.dumps({
+        "env": env,
+        "scope_tags": scope_tags,
+        "sources": sources,
+        "action_map": {k: v.__dict__ for k, v in sorted(ACTION_MAP.items())},
+    }, sort_keys=True).encode()).hexdigest()
+
+    path = os.path.join(_cache_dir(), f"{digest}.json")
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        return CompiledPolicy(entry["documents"], entry["resource_types"], digest, cached=True,
+                              actions=entry["actions"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    types = resource_types(sources)
+    statements = build_statements(types, env, scope_tags)
+    compiled = CompiledPolicy(pack_documents(statements), types, digest,
+                              actions=sorted({a for s in statements for a in s["Action"]}))
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        tmp_path = os.path.join(_cache_dir(), f".{digest}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"documents": compiled.documents, "resource_types": types, "actions": compiled.actions}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # the cache is an optimization only
+    return compiled
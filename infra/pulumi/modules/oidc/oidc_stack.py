@@ -1,19 +1,33 @@
 import pulumi
 import pulumi_aws as aws
-from utils.config import get_env_config
+from config.resolver import load_config
+from common.stack_refs import require_output
+from modules.oidc.thumbprint import resolve_thumbprints
 
-def configure_oidc_provider():
-    cfg = get_env_config("oidc")
-    issuer_url = cfg.get("issuer_url")
-    if not issuer_url:
-        raise Exception("OIDC issuer_url must be set in config")
+def run(env: str):
+    """OIDC identity provider for the <env>-eks cluster's service account tokens"""
 
-    oidc = aws.iam.OpenIdConnectProvider("eks-oidc",
-        client_id_list=["sts.amazonaws.com"],
-        thumbprint_list=["9e99a48a9960b14926bb7f3b02e22da0afd4e3e5"],
-        url=issuer_url)
+    cfg = load_config(env)
 
-    pulumi.export("oidc_provider_arn", oidc.arn)
-    # pulumi.export("oidc_provider_url", oidc.url)  // ???
+    # Issuer comes from the <env>-eks stack unless pinned in config
+    issuer_url = cfg["oidc:issuer_url"] or require_output(env, "oidc", "eks", "oidc_issuer_url")
+
+    # Pinned thumbprints skip the TLS fetch entirely (air-gapped previews)
+    thumbprints = list(cfg["oidc:thumbprints"])
+    if not thumbprints:
+        def lookup(url: str):
+            chain = resolve_thumbprints(url)
+            pulumi.log.info(f"OIDC thumbprint for {chain.host}: {chain.top} "
+                            f"({chain.source}, valid until {chain.not_after:%Y-%m-%d})")
+            return [chain.top]
+        thumbprints = pulumi.Output.from_input(issuer_url).apply(lookup)
 
-    return oidc
+    oidc = aws.iam.OpenIdConnectProvider(f"{env}-eks-oidc",
+        url=issuer_url,
+        client_id_lists=list(cfg["oidc:client_ids"]),
+        thumbprint_lists=thumbprints,
+        tags={"Cluster": cfg.get("oidc:cluster_name", f"{env}-eks")})
+
+    pulumi.export("oidc_provider_arn", oidc.arn)
+    pulumi.export("oidc_provider_url", oidc.url)
+    pulumi.export("oidc_thumbprints", oidc.thumbprint_lists)
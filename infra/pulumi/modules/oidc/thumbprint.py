@@ -0,0 +1,196 @@
+"""
+Certificate thumbprints for OIDC identity providers.
+
+IAM wants the SHA-1 thumbprint of the top intermediate CA an issuer serves
+(the last certificate of the TLS chain). Fetching that chain needs a TLS
+handshake with the issuer, so results are cached on disk per issuer host
+until the earliest certificate in the chain expires:
+
+    .cache/oidc/<host>_<port>.json
+    {"host": ..., "port": ..., "not_after": "2026-...Z",
+     "certificates": [<base64 DER>, ...], "thumbprints": [<sha1 hex>, ...]}
+
+Cached entries carry the certificates themselves, so they are verified
+offline (thumbprints recomputed, expiry re-read from the DER) before use.
+
+Usage (from infra/pulumi):
+    python -m modules.oidc.thumbprint https://oidc.eks.us-east-1.amazonaws.com/id/EXAMPLE
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import ssl
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache", "oidc")
+
+# (host, port) -> DER certificates as served, leaf first
+ChainFetcher = Callable[[str, int], List[bytes]]
+
+_PEM_RE = re.compile(r"-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----", re.DOTALL)
+
+# Chains resolved by this process: (host, port) -> ThumbprintChain
+_resolved: Dict[Tuple[str, int], "ThumbprintChain"] = {}
+
+
+class ThumbprintError(RuntimeError):
+    """An issuer's certificate chain could not be fetched or parsed"""
+
+
+@dataclass(frozen=True)
+class ThumbprintChain:
+    """Thumbprints of one issuer's chain, leaf first"""
+    host: str
+    port: int
+    thumbprints: Tuple[str, ...]
+    not_after: datetime
+    source: str  # "fetched", "disk" or "memory"
+
+    @property
+    def top(self) -> str:
+        """Thumbprint IAM expects: the top intermediate CA (last served certificate)"""
+        return self.thumbprints[-1]
+
+
+def sha1_thumbprint(der: bytes) -> str:
+    return hashlib.sha1(der).hexdigest()
+
+
+def _der_element(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """(tag, content start, content end) of the DER element at offset"""
+    tag = data[offset]
+    length = data[offset + 1]
+    start = offset + 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[start:start + size], "big")
+        start += size
+    return tag, start, start + length
+
+
+def not_after(der: bytes) -> datetime:
+    """Expiry of a DER certificate (validity.notAfter of the TBSCertificate)"""
+    _, cert_start, _ = _der_element(der, 0)
+    _, tbs_start, _ = _der_element(der, cert_start)
+    offset = tbs_start
+    tag, _, end = _der_element(der, offset)
+    if tag == 0xA0:  # explicit [0] version
+        offset = end
+    for _field in ("serialNumber", "signature", "issuer"):
+        _, _, offset = _der_element(der, offset)
+    _, validity_start, _ = _der_element(der, offset)
+    _, _, not_before_end = _der_element(der, validity_start)
+    tag, start, end = _der_element(der, not_before_end)
+    value = der[start:end].decode("ascii")
+    layout = "%y%m%d%H%M%SZ" if tag == 0x17 else "%Y%m%d%H%M%SZ"  # UTCTime / GeneralizedTime
+    return datetime.strptime(value, layout).replace(tzinfo=timezone.utc)
+
+
+def fetch_chain(host: str, port: int = 443, timeout: float = 10.0) -> List[bytes]:
+    """Certificates the issuer serves, via 'openssl s_client -showcerts'.
+
+    The chain is not verified here; IAM only needs its thumbprints.
+    """
+    try:
+        result = subprocess.run(
+            ["openssl", "s_client", "-connect", f"{host}:{port}", "-servername", host, "-showcerts"],
+            input=b"", capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ThumbprintError(f"Could not fetch the certificate chain of {host}:{port}: {e}")
+    pems = _PEM_RE.findall(result.stdout.decode("utf-8", "replace"))
+    if not pems:
+        raise ThumbprintError(f"{host}:{port} served no certificates "
+                              f"({result.stderr.decode('utf-8', 'replace').strip()[:200]})")
+    return [ssl.PEM_cert_to_DER_cert(pem) for pem in pems]
+
+
+def _cache_dir() -> str:
+    return os.environ.get("PULUMI_OIDC_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def _cache_path(host: str, port: int) -> str:
+    return os.path.join(_cache_dir(), f"{host}_{port}.json")
+
+
+def _chain(host: str, port: int, certificates: List[bytes], source: str) -> ThumbprintChain:
+    return ThumbprintChain(host, port, tuple(sha1_thumbprint(der) for der in certificates),
+                           min(not_after(der) for der in certificates), source)
+
+
+def _read_cache(host: str, port: int, now: datetime) -> Optional[ThumbprintChain]:
+    """Cached chain for host, if it verifies offline and has not expired"""
+    try:
+        with open(_cache_path(host, port)) as f:
+            entry = json.load(f)
+        certificates = [base64.b64decode(der) for der in entry["certificates"]]
+        chain = _chain(host, port, certificates, "disk")
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+    if list(chain.thumbprints) != entry.get("thumbprints") or chain.not_after.isoformat() != entry.get("not_after"):
+        return None  # edited or corrupted entry
+    return chain if chain.not_after > now else None
+
+
+def _write_cache(chain: ThumbprintChain, certificates: List[bytes]):
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        path = _cache_path(chain.host, chain.port)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({
+                "host": chain.host,
+                "port": chain.port,
+                "not_after": chain.not_after.isoformat(),
+                "certificates": [base64.b64encode(der).decode("ascii") for der in certificates],
+                "thumbprints": list(chain.thumbprints),
+            }, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass  # the cache is an optimization only
+
+
+def resolve_thumbprints(issuer_url: str, fetcher: Optional[ChainFetcher] = None,
+                        now: Optional[datetime] = None) -> ThumbprintChain:
+    """Thumbprint chain of an issuer: process memo, then disk cache, then a TLS fetch"""
+    parsed = urlparse(issuer_url if "://" in issuer_url else f"https://{issuer_url}")
+    if not parsed.hostname:
+        raise ThumbprintError(f"Issuer URL '{issuer_url}' has no host")
+    host, port = parsed.hostname, parsed.port or 443
+    now = now or datetime.now(timezone.utc)
+
+    chain = _resolved.get((host, port))
+    if chain and chain.not_after > now:
+        return ThumbprintChain(host, port, chain.thumbprints, chain.not_after, "memory")
+
+    chain = _read_cache(host, port, now)
+    if chain is None:
+        certificates = (fetcher or fetch_chain)(host, port)
+        chain = _chain(host, port, certificates, "fetched")
+        if chain.not_after <= now:
+            raise ThumbprintError(f"{host}:{port} serves a certificate that expired {chain.not_after:%Y-%m-%d}")
+        _write_cache(chain, certificates)
+    _resolved[(host, port)] = chain
+    return chain
+
+
+def clear():
+    """Forget chains resolved by this process (the disk cache is kept)"""
+    _resolved.clear()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m modules.oidc.thumbprint <issuer_url>")
+        sys.exit(1)
+    resolved = resolve_thumbprints(sys.argv[1])
+    print(f"{resolved.host}:{resolved.port} ({resolved.source}, valid until {resolved.not_after:%Y-%m-%d})")
+    for i, thumbprint in enumerate(resolved.thumbprints):
+        print(f"  {'top' if i == len(resolved.thumbprints) - 1 else i}: {thumbprint}")
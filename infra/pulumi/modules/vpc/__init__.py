@@ -2,5 +2,7 @@
 from .vpc_base import VpcBase
 from .subnets import SubnetGroup  
 from .nat_gateway import NatGatewayGroup
+from .endpoints import VpcEndpointGroup
+from .flow_logs import FlowLogGroup
 
-__all__ = ['VpcBase', 'SubnetGroup', 'NatGatewayGroup']
\ No newline at end of file
+__all__ = ['VpcBase', 'SubnetGroup', 'NatGatewayGroup', 'VpcEndpointGroup', 'FlowLogGroup']
\ No newline at end of file
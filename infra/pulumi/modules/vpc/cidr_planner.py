@@ -0,0 +1,145 @@
+"""
+CIDR allocation engine for VPC subnets.
+
+Carves variable-size, aligned subnets out of a VPC block per tier and per AZ
+and checks address ranges for overlaps in bulk. Everything works on integer
+address ranges, so planning hundreds of subnets across many VPCs is a matter
+of sorting a few lists.
+"""
+
+import ipaddress
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class TierSpec:
+    """One subnet tier: a subnet of `prefix` length in each AZ.
+
+    `offset` pins the tier's first subnet to the offset-th block of its own size
+    inside the VPC (e.g. prefix 24, offset 100 -> x.y.100.0/24). Tiers without an
+    offset are packed into the lowest free aligned blocks.
+    """
+    name: str
+    prefix: int
+    offset: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class SubnetPlan:
+    tier: str
+    az_index: int
+    cidr: str
+
+
+def _range(cidr: str) -> Tuple[int, int]:
+    """CIDR -> [start, end) integer range"""
+    network = ipaddress.ip_network(cidr)
+    start = int(network.network_address)
+    return start, start + network.num_addresses
+
+
+def _to_cidr(start: int, prefix: int) -> str:
+    return f"{ipaddress.IPv4Address(start)}/{prefix}"
+
+
+def _first_fit(size: int, lower: int, upper: int, allocated: List[Tuple[int, int]]) -> Optional[int]:
+    """Lowest start aligned to `size` in [lower, upper) that avoids all sorted allocated ranges"""
+    candidate = -(-lower // size) * size
+    for start, end in allocated:
+        if candidate + size <= start:
+            break
+        if end > candidate:
+            candidate = -(-end // size) * size
+    return candidate if candidate + size <= upper else None
+
+
+def plan_subnets(vpc_cidr: str, tiers: Sequence[TierSpec], az_count: int) -> List[SubnetPlan]:
+    """Allocate one subnet per tier per AZ inside vpc_cidr.
+
+    Pinned tiers are placed first, then the remaining tiers largest-first so big
+    pod/node ranges do not get fragmented by small ones. The result is ordered by
+    tier (as given) and AZ index.
+    """
+    vpc_start, vpc_end = _range(vpc_cidr)
+    vpc_prefix = ipaddress.ip_network(vpc_cidr).prefixlen
+    allocated: List[Tuple[int, int]] = []
+    placed: Dict[Tuple[str, int], str] = {}
+
+    for tier in tiers:
+        if not vpc_prefix <= tier.prefix <= 28:
+            raise ValueError(f"Tier '{tier.name}': /{tier.prefix} must be between /{vpc_prefix} and /28")
+
+    ordered = sorted(tiers, key=lambda t: (t.offset is None, t.prefix))
+    for tier in ordered:
+        size = 1 << (32 - tier.prefix)
+        for az in range(az_count):
+            if tier.offset is not None:
+                start = vpc_start + (tier.offset + az) * size
+                if start + size > vpc_end:
+                    raise ValueError(f"Tier '{tier.name}' subnet {az + 1} (/{tier.prefix} at offset "
+                                     f"{tier.offset + az}) falls outside VPC {vpc_cidr}")
+            else:
+                start = _first_fit(size, vpc_start, vpc_end, allocated)
+                if start is None:
+                    raise ValueError(f"VPC {vpc_cidr} has no room for tier '{tier.name}' "
+                                     f"subnet {az + 1} (/{tier.prefix})")
+            allocated.append((start, start + size))
+            allocated.sort()
+            placed[(tier.name, az)] = _to_cidr(start, tier.prefix)
+
+    plans = [SubnetPlan(tier.name, az, placed[(tier.name, az)]) for tier in tiers for az in range(az_count)]
+    overlaps = find_overlaps({f"{p.tier}-{p.az_index + 1}": p.cidr for p in plans})
+    if overlaps:
+        raise ValueError(f"Subnet plan for {vpc_cidr} has overlapping subnets: {overlaps}")
+    return plans
+
+
+def find_overlaps(cidrs: Dict[str, str]) -> List[Tuple[str, str]]:
+    """All pairs of named CIDRs whose address ranges intersect (sort + sweep)"""
+    ranges = sorted((*_range(cidr), name) for name, cidr in cidrs.items())
+    overlaps = []
+    active: List[Tuple[int, str]] = []  # (end, name) of ranges still open
+    for start, end, name in ranges:
+        active = [(e, n) for e, n in active if e > start]
+        overlaps.extend((n, name) for _, n in active)
+        active.append((end, name))
+    return overlaps
+
+
+def plan_vpcs(vpcs: Dict[str, Tuple[str, Sequence[TierSpec], int]]) -> Dict[str, List[SubnetPlan]]:
+    """Plan subnets for many VPCs at once: {name: (vpc_cidr, tiers, az_count)}.
+
+    Raises if any two VPC blocks overlap.
+    """
+    overlaps = find_overlaps({name: spec[0] for name, spec in vpcs.items()})
+    if overlaps:
+        raise ValueError(f"Overlapping VPC CIDR blocks: {overlaps}")
+    return {name: plan_subnets(cidr, tiers, az_count) for name, (cidr, tiers, az_count) in vpcs.items()}
+
+
+def allocate_vpc_blocks(requested: Dict[str, Optional[str]], prefix: int, after: str,
+                        reserved: Iterable[str] = (), pool: str = "10.0.0.0/8") -> Dict[str, str]:
+    """Fill in VPC blocks left as None: the lowest free /prefix blocks in `pool` from `after` onwards.
+
+    Requested and reserved blocks (e.g. other environments' VPCs) are never handed out,
+    so auto-allocated blocks stay stable while earlier ones keep their CIDR.
+    """
+    pool_start, pool_end = _range(pool)
+    allocated = sorted(_range(cidr) for cidr in list(reserved) + [c for c in requested.values() if c])
+    size = 1 << (32 - prefix)
+    blocks = {}
+    for name, cidr in requested.items():
+        if cidr is None:
+            start = _first_fit(size, max(pool_start, _range(after)[0]), pool_end, allocated)
+            if start is None:
+                raise ValueError(f"No free /{prefix} block left in {pool} after {after} for VPC '{name}'")
+            cidr = _to_cidr(start, prefix)
+            allocated = sorted(allocated + [_range(cidr)])
+        blocks[name] = cidr
+    return blocks
+
+
+def cidrs_for_tier(plans: Iterable[SubnetPlan], tier: str) -> List[str]:
+    """CIDRs of one tier ordered by AZ index"""
+    return [p.cidr for p in sorted(plans, key=lambda p: p.az_index) if p.tier == tier]
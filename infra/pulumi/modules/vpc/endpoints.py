@@ -0,0 +1,79 @@
+import pulumi
+import pulumi_aws as aws
+from typing import List
+from common import pricing
+
+# Gateway endpoints are free and are attached to route tables
+GATEWAY_SERVICES = ["s3", "dynamodb"]
+
+
+class VpcEndpointGroup(pulumi.ComponentResource):
+    """VPC endpoints for AWS services - gateway endpoints FREE, interface endpoints PAID
+
+    Gateway endpoints (S3, DynamoDB) add prefix-list routes to the given route
+    tables, so that traffic skips NAT data processing ($0.045/GB).
+
+    WARNING: Interface endpoints are billable:
+    - ~$7.30/month per endpoint per AZ + $0.01/GB processed
+    """
+
+    def __init__(self, name: str, vpc_id: pulumi.Output[str], route_table_ids: List[pulumi.Output[str]],
+                 subnet_ids: List[pulumi.Output[str]], args: dict, opts=None):
+        super().__init__('custom:vpc:VpcEndpointGroup', name, None, opts)
+
+        self.gateway_endpoints = []
+        self.interface_endpoints = []
+        self.security_group = None
+
+        region = args.get("region", "us-east-1")
+
+        # Gateway endpoints on every route table (public and private)
+        for service in args.get("gateway_services", GATEWAY_SERVICES):
+            endpoint = aws.ec2.VpcEndpoint(f"{name}-{service}-gateway",
+                vpc_id=vpc_id,
+                service_name=f"com.amazonaws.{region}.{service}",
+                vpc_endpoint_type="Gateway",
+                route_table_ids=route_table_ids,
+                tags={"Name": f"{name}-{service}-gateway"},
+                opts=pulumi.ResourceOptions(parent=self))
+            self.gateway_endpoints.append(endpoint)
+
+        interface_services = args.get("interface_services", [])
+        if interface_services:
+            # HTTPS from inside the VPC only
+            self.security_group = aws.ec2.SecurityGroup(f"{name}-endpoints-sg",
+                vpc_id=vpc_id,
+                description="HTTPS to interface VPC endpoints",
+                ingress=[aws.ec2.SecurityGroupIngressArgs(
+                    protocol="tcp",
+                    from_port=443,
+                    to_port=443,
+                    cidr_blocks=[args.get("vpc_cidr", "10.0.0.0/16")]
+                )],
+                tags={"Name": f"{name}-endpoints-sg"},
+                opts=pulumi.ResourceOptions(parent=self))
+
+            for service in interface_services:
+                endpoint = aws.ec2.VpcEndpoint(f"{name}-{service.replace('.', '-')}-interface",
+                    vpc_id=vpc_id,
+                    service_name=f"com.amazonaws.{region}.{service}",
+                    vpc_endpoint_type="Interface",
+                    subnet_ids=subnet_ids,
+                    security_group_ids=[self.security_group.id],
+                    private_dns_enabled=True,
+                    tags={"Name": f"{name}-{service}-interface"},
+                    opts=pulumi.ResourceOptions(parent=self))
+                self.interface_endpoints.append(endpoint)
+
+            # Billed per endpoint per AZ (one ENI in every subnet)
+            cost_items = [pricing.hourly(name, f"interface endpoint {service}", "vpc_endpoint_interface_hour",
+                                         len(subnet_ids)) for service in interface_services]
+            pricing.register(*cost_items)
+            interface_cost = pricing.monthly_cost(cost_items, region)
+            pulumi.log.warn(f"Interface endpoints estimated monthly cost: ${interface_cost:.2f} " +
+                            f"({len(self.interface_endpoints)} endpoints x {len(subnet_ids)} AZs)")
+
+        self.register_outputs({
+            "gateway_endpoint_ids": [e.id for e in self.gateway_endpoints],
+            "interface_endpoint_ids": [e.id for e in self.interface_endpoints]
+        })
@@ -0,0 +1,214 @@
+import json
+import pulumi
+import pulumi_aws as aws
+from typing import List
+from common.invoke_cache import cached_invoke
+
+FLOW_LOG_SCOPES = ["vpc", "subnet", "eni"]
+
+# Record fields delivered when vpc:flow_logs_format is empty: the v2 defaults
+# plus the VPC/subnet/AZ and packet-level addresses the DNS ETL joins on
+DEFAULT_FLOW_LOG_FIELDS = [
+    "version", "account-id", "interface-id", "srcaddr", "dstaddr", "srcport", "dstport",
+    "protocol", "packets", "bytes", "start", "end", "action", "log-status",
+    "vpc-id", "subnet-id", "az-id", "flow-direction", "pkt-srcaddr", "pkt-dstaddr", "tcp-flags",
+]
+
+# Glue column types for fields that are not strings in the Parquet files
+FLOW_LOG_FIELD_TYPES = {
+    "version": "int",
+    "srcport": "int",
+    "dstport": "int",
+    "protocol": "int",
+    "packets": "bigint",
+    "bytes": "bigint",
+    "start": "bigint",
+    "end": "bigint",
+    "tcp-flags": "int",
+    "type": "string",
+    "traffic-path": "int",
+}
+
+
+def parse_flow_log_fields(record_format: str) -> List[str]:
+    """Field names from a comma/space separated list or an AWS '${field} ${field}' format string"""
+    raw = record_format.replace("${", " ").replace("}", " ").replace(",", " ").split()
+    return raw or list(DEFAULT_FLOW_LOG_FIELDS)
+
+
+class FlowLogGroup(pulumi.ComponentResource):
+    """VPC flow logs delivered to S3 as hourly-partitioned Parquet, with a Glue table on top
+
+    Scope is the whole VPC, every given subnet, or an explicit list of ENIs.
+    The Glue table uses partition projection over the Hive-compatible S3 prefixes,
+    so new hours are queryable without crawlers or MSCK REPAIR.
+
+    WARNING: Flow logs to S3 are billable:
+    - ~$0.25/GB ingested (vended logs) + $0.035/GB for Parquet conversion, plus S3 storage
+    """
+
+    def __init__(self, name: str, vpc_id: pulumi.Output[str], subnet_ids: List[pulumi.Output[str]],
+                 args: dict, opts=None):
+        super().__init__('custom:vpc:FlowLogGroup', name, None, opts)
+
+        environment = args.get("environment", "dev")
+        region = args.get("region", "us-east-1")
+        scope = args.get("scope", "vpc")
+        if scope not in FLOW_LOG_SCOPES:
+            raise ValueError(f"Unknown flow log scope '{scope}', expected one of {FLOW_LOG_SCOPES}")
+        fields = parse_flow_log_fields(args.get("record_format", ""))
+        prefix = "vpc-flow-logs/"
+        account_id = cached_invoke(aws.get_caller_identity, region=region,
+                                   opts=pulumi.InvokeOptions(parent=self)).account_id
+
+        self.flow_logs = []
+
+        # Destination bucket (private, encrypted, expiring)
+        self.bucket = aws.s3.BucketV2(f"{name}-flow-logs",
+            force_destroy=environment != "prod",
+            tags={"Name": f"{name}-flow-logs"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.s3.BucketPublicAccessBlock(f"{name}-flow-logs-pab",
+            bucket=self.bucket.id,
+            block_public_acls=True,
+            block_public_policy=True,
+            ignore_public_acls=True,
+            restrict_public_buckets=True,
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.s3.BucketServerSideEncryptionConfigurationV2(f"{name}-flow-logs-sse",
+            bucket=self.bucket.id,
+            rules=[aws.s3.BucketServerSideEncryptionConfigurationV2RuleArgs(
+                apply_server_side_encryption_by_default=aws.s3.BucketServerSideEncryptionConfigurationV2RuleApplyServerSideEncryptionByDefaultArgs(
+                    sse_algorithm="AES256"
+                )
+            )],
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.s3.BucketLifecycleConfigurationV2(f"{name}-flow-logs-lifecycle",
+            bucket=self.bucket.id,
+            rules=[aws.s3.BucketLifecycleConfigurationV2RuleArgs(
+                id="expire-flow-logs",
+                status="Enabled",
+                filter=aws.s3.BucketLifecycleConfigurationV2RuleFilterArgs(prefix=prefix),
+                expiration=aws.s3.BucketLifecycleConfigurationV2RuleExpirationArgs(
+                    days=int(args.get("retention_days", 30))
+                )
+            )],
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # Let the log delivery service write into this account's prefix only
+        policy = aws.s3.BucketPolicy(f"{name}-flow-logs-policy",
+            bucket=self.bucket.id,
+            policy=self.bucket.arn.apply(lambda arn: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Sid": "AWSLogDeliveryWrite",
+                        "Effect": "Allow",
+                        "Principal": {"Service": "delivery.logs.amazonaws.com"},
+                        "Action": "s3:PutObject",
+                        "Resource": f"{arn}/{prefix}AWSLogs/aws-account-id={account_id}/*",  # hive-compatible partitions
+                        "Condition": {
+                            "StringEquals": {
+                                "s3:x-amz-acl": "bucket-owner-full-control",
+                                "aws:SourceAccount": account_id
+                            }
+                        }
+                    },
+                    {
+                        "Sid": "AWSLogDeliveryAclCheck",
+                        "Effect": "Allow",
+                        "Principal": {"Service": "delivery.logs.amazonaws.com"},
+                        "Action": ["s3:GetBucketAcl", "s3:ListBucket"],
+                        "Resource": arn,
+                        "Condition": {"StringEquals": {"aws:SourceAccount": account_id}}
+                    }
+                ]
+            })),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # One flow log per scoped target
+        if scope == "vpc":
+            targets = [("vpc", {"vpc_id": vpc_id})]
+        elif scope == "subnet":
+            targets = [(f"subnet-{i+1}", {"subnet_id": subnet_id}) for i, subnet_id in enumerate(subnet_ids)]
+        else:
+            eni_ids = args.get("eni_ids", [])
+            if not eni_ids:
+                raise ValueError("Flow log scope 'eni' requires vpc:flow_logs_eni_ids")
+            targets = [(f"eni-{i+1}", {"eni_id": eni_id}) for i, eni_id in enumerate(eni_ids)]
+
+        for suffix, target in targets:
+            flow_log = aws.ec2.FlowLog(f"{name}-flow-log-{suffix}",
+                log_destination_type="s3",
+                log_destination=self.bucket.arn.apply(lambda arn: f"{arn}/{prefix}"),
+                traffic_type=args.get("traffic_type", "ALL"),
+                max_aggregation_interval=int(args.get("aggregation_interval", 600)),
+                log_format=" ".join(f"${{{field}}}" for field in fields),
+                destination_options=aws.ec2.FlowLogDestinationOptionsArgs(
+                    file_format="parquet",
+                    hive_compatible_partitions=True,
+                    per_hour_partition=True
+                ),
+                tags={"Name": f"{name}-flow-log-{suffix}"},
+                opts=pulumi.ResourceOptions(parent=self, depends_on=[policy]),
+                **target)
+            self.flow_logs.append(flow_log)
+
+        # Glue catalog: Parquet columns use underscores where the record format uses dashes
+        self.database = aws.glue.CatalogDatabase(f"{name}-flow-logs-db",
+            name=f"{name}_flow_logs".replace("-", "_"),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        location = self.bucket.bucket.apply(
+            lambda bucket: f"s3://{bucket}/{prefix}AWSLogs/aws-account-id={account_id}/"
+                           f"aws-service=vpcflowlogs/aws-region={region}")
+
+        self.table = aws.glue.CatalogTable(f"{name}-flow-logs-table",
+            name="vpc_flow_logs",
+            database_name=self.database.name,
+            table_type="EXTERNAL_TABLE",
+            parameters=location.apply(lambda loc: {
+                "EXTERNAL": "TRUE",
+                "classification": "parquet",
+                "projection.enabled": "true",
+                "projection.year.type": "integer",
+                "projection.year.range": "2024,2099",
+                "projection.month.type": "integer",
+                "projection.month.range": "1,12",
+                "projection.month.digits": "2",
+                "projection.day.type": "integer",
+                "projection.day.range": "1,31",
+                "projection.day.digits": "2",
+                "projection.hour.type": "integer",
+                "projection.hour.range": "0,23",
+                "projection.hour.digits": "2",
+                "storage.location.template": f"{loc}/year=${{year}}/month=${{month}}/day=${{day}}/hour=${{hour}}/",
+            }),
+            partition_keys=[aws.glue.CatalogTablePartitionKeyArgs(name=key, type="int")
+                            for key in ["year", "month", "day", "hour"]],
+            storage_descriptor=aws.glue.CatalogTableStorageDescriptorArgs(
+                location=location.apply(lambda loc: f"{loc}/"),
+                input_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                output_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+                ser_de_info=aws.glue.CatalogTableStorageDescriptorSerDeInfoArgs(
+                    serialization_library="org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+                ),
+                columns=[aws.glue.CatalogTableStorageDescriptorColumnArgs(
+                    name=field.replace("-", "_"),
+                    type=FLOW_LOG_FIELD_TYPES.get(field, "string")
+                ) for field in fields]
+            ),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        pulumi.log.warn(f"Flow logs ({scope} scope, {len(self.flow_logs)} flow logs) are billed per GB " +
+                        "ingested: ~$0.25/GB + $0.035/GB Parquet conversion")
+
+        self.register_outputs({
+            "bucket_name": self.bucket.bucket,
+            "flow_log_ids": [f.id for f in self.flow_logs],
+            "glue_database": self.database.name,
+            "glue_table": self.table.name
+        })
@@ -1,16 +1,95 @@
+import base64
+import json
 import pulumi
 import pulumi_aws as aws
-from typing import List
+from typing import Dict, List, Optional
+from common import pricing
+from common.invoke_cache import cached_invoke
+
+NAT_STRATEGIES = ["none", "single", "zonal-pairs", "multi-az", "instance"]
+
+# fck-nat AMIs (https://fck-nat.dev) are published by this account
+FCK_NAT_AMI_OWNER = "568608671756"
+
+# fck-nat attaches the static ENI and EIP on boot, so routes and egress IPs survive instance replacement
+NAT_INSTANCE_USER_DATA = """#!/bin/bash
+cat > /etc/fck-nat.conf <<CONF
+eni_id={eni_id}
+eip_id={eip_id}
+CONF
+systemctl restart fck-nat.service
+"""
+
+
+def plan_nat_placement(availability_zones: List[str], strategy: str,
+                       nat_count: Optional[int] = None) -> Dict[str, str]:
+    """Map every AZ to the AZ of the NAT its private route table targets.
+
+    - single: all AZs use a NAT in the first AZ
+    - multi-az / instance: every AZ uses its own NAT
+    - zonal-pairs: nat_count NATs (default: one per two AZs); AZs are split into
+      contiguous groups and each group uses the NAT in its first AZ
+    """
+    if strategy == "none" or not availability_zones:
+        return {}
+    if strategy == "single":
+        nat_count = 1
+    elif strategy in ("multi-az", "instance"):
+        nat_count = len(availability_zones)
+    elif strategy == "zonal-pairs":
+        nat_count = nat_count or (len(availability_zones) + 1) // 2
+    else:
+        raise ValueError(f"Unknown NAT strategy '{strategy}' (expected one of {', '.join(NAT_STRATEGIES)})")
+    
+    nat_count = max(1, min(nat_count, len(availability_zones)))
+    groups: Dict[int, List[str]] = {}
+    for i, az in enumerate(availability_zones):
+        groups.setdefault(i * nat_count // len(availability_zones), []).append(az)
+    return {az: members[0] for members in groups.values() for az in members}
+
+
+def nat_cost_items(component: str, strategy: str, nat_count: int, instance_type: str,
+                   active: bool = True) -> List[pricing.LineItem]:
+    """Always-on billable resources of nat_count NATs (data processing is estimated separately).
+
+    While a scheduled NAT is inactive only its Elastic IPs are billed.
+    """
+    if strategy == "none" or not nat_count:
+        return []
+    items = [pricing.hourly(component, "Elastic IP", "eip_hour", nat_count)]
+    if not active:
+        return items
+    if strategy == "instance":
+        items.append(pricing.hourly(component, f"NAT instance ({instance_type})", f"ec2:{instance_type}", nat_count))
+    else:
+        items.append(pricing.hourly(component, "NAT Gateway", "nat_gateway_hour", nat_count))
+    return items
+
+
+def nat_instance_architecture(instance_type: str) -> str:
+    """'t4g.nano' / 'c7gn.medium' -> 'arm64', 't3.micro' -> 'x86_64'"""
+    family = instance_type.split(".")[0]
+    return "arm64" if "g" in family[2:] else "x86_64"
+
 
 class NatGatewayGroup(pulumi.ComponentResource):
-    """NAT Gateways and EIPs - PAID RESOURCES
+    """NAT Gateways (or NAT instances) and EIPs - PAID RESOURCES
     
     WARNING: This creates billable resources:
     - Elastic IPs: ~$3.65/month each when associated
-    - NAT Gateways: ~$45/month each + data transfer costs
+    - NAT Gateways: ~$33/month each + $0.045/GB processed
+    - NAT instances (strategy 'instance'): EC2 hours only, e.g. ~$3/month for a t4g.nano
     
-    For dev/test environments, consider using a single NAT instance or 
+    Prices come from config/prices.yaml through common.pricing.
+    
+    For dev/test environments, consider the 'instance' strategy or a
     NAT Gateway in one AZ only to reduce costs.
+    
+    Scheduled mode (args 'scheduled'/'active', e.g. off-hours staging): EIPs are
+    protected and retained, while NAT Gateways and their routes (or the NAT
+    instances' capacity) follow 'active'. `schedule_targets` holds the URNs a
+    targeted `pulumi up` needs to stop/start NAT without touching anything else,
+    and egress IPs stay the same across restores.
     """
     
     def __init__(self, name: str, public_subnet_ids: List[pulumi.Output[str]], 
@@ -20,78 +99,247 @@ class NatGatewayGroup(pulumi.ComponentResource):
         self.nat_gateways = []
         self.eips = []
         self.private_route_tables = []
+        self.nat_gateway_ids = []
+        self.estimated_monthly_cost = 0
+        self.placement: Dict[str, str] = {}
+        self.nat_gateways_by_az: Dict[str, aws.ec2.NatGateway] = {}
+        self.nat_instances = []  # (static ENI, autoscaling group) per AZ for strategy 'instance'
+        self.route_tables_by_az: Dict[str, aws.ec2.RouteTable] = {}
+        self.schedule_targets: List[pulumi.Output[str]] = []
+        self.region = args.get("region", "us-east-1")
         
         # Determine NAT Gateway strategy
-        strategy = args.get("strategy", "single")  # single, multi-az, or none
-        environment = args.get("environment", "dev")
+        strategy = args.get("strategy", "single")  # single, zonal-pairs, multi-az, instance, or none
+        scheduled = args.get("scheduled", False)
+        active = args.get("active", True) or not scheduled
         
         if strategy == "none":
             pulumi.log.info("NAT Gateway strategy is 'none' - skipping NAT Gateway creation")
             return
         
-        # For single NAT strategy, use only first subnet
-        subnet_count = 1 if strategy == "single" else len(public_subnet_ids)
+        # Shared AZ map: public_subnet_ids[i] lives in availability_zones[i]
+        availability_zones = args.get("availability_zones", [])
+        if len(availability_zones) != len(public_subnet_ids):
+            raise ValueError(f"NatGatewayGroup {name}: {len(public_subnet_ids)} public subnets for "
+                             f"{len(availability_zones)} availability zones")
+        
+        # AZ -> AZ of the NAT it routes through; only the target AZs get a NAT
+        self.placement = plan_nat_placement(availability_zones, strategy, args.get("nat_count"))
+        nat_azs = [az for az in availability_zones if az in self.placement.values()]
         
-        for i in range(subnet_count):
-            # Allocate Elastic IP
+        instance_type = args.get("instance_type", "t4g.nano")
+        if strategy == "instance":
+            instance_profile, security_group = self._nat_instance_prerequisites(name, vpc_id, args)
+        
+        # Route target (NAT Gateway id or static ENI id) for each AZ that gets a NAT
+        nat_targets: Dict[str, dict] = {}
+        for i, az in enumerate(nat_azs):
+            public_subnet_id = public_subnet_ids[availability_zones.index(az)]
+            
+            if strategy == "instance":
+                # Static ENI the route points at; the NAT instance attaches it on boot
+                eni = aws.ec2.NetworkInterface(f"{name}-nat-eni-{i+1}",
+                    subnet_id=public_subnet_id,
+                    security_groups=[security_group.id],
+                    source_dest_check=False,
+                    tags={"Name": f"{name}-nat-eni-{i+1}"},
+                    opts=pulumi.ResourceOptions(parent=self))
+                
+                eip = aws.ec2.Eip(f"{name}-nat-eip-{i+1}",
+                    domain="vpc",
+                    network_interface=eni.id,
+                    tags={"Name": f"{name}-nat-eip-{i+1}"},
+                    opts=pulumi.ResourceOptions(parent=self, protect=scheduled, retain_on_delete=scheduled))
+                self.eips.append(eip)
+                
+                asg = self._nat_instance(f"{name}-nat-{i+1}", az, public_subnet_id, eni, eip,
+                                         instance_type, instance_profile, security_group,
+                                         capacity=1 if active else 0)
+                self.nat_instances.append((eni, asg))
+                self.schedule_targets.append(pulumi.resource.create_urn(
+                    f"{name}-nat-{i+1}-asg", "aws:autoscaling/group:Group", parent=self))
+                nat_targets[az] = {"network_interface_id": eni.id}
+                continue
+            
+            # Allocate Elastic IP (scheduled mode: protected and retained so the egress IP never changes)
             eip = aws.ec2.Eip(f"{name}-nat-eip-{i+1}",
                 domain="vpc",
-                tags={
-                    "Name": f"{name}-nat-eip-{i+1}",
-                    "Environment": environment,
-                    "CostCenter": "networking"
-                },
-                opts=pulumi.ResourceOptions(parent=self))
+                tags={"Name": f"{name}-nat-eip-{i+1}"},
+                opts=pulumi.ResourceOptions(parent=self, protect=scheduled, retain_on_delete=scheduled))
             self.eips.append(eip)
             
-            # Create NAT Gateway
+            self.schedule_targets.append(pulumi.resource.create_urn(
+                f"{name}-nat-{i+1}", "aws:ec2/natGateway:NatGateway", parent=self))
+            if not active:
+                continue
+            
+            # Create NAT Gateway in the public subnet of its own AZ
             nat = aws.ec2.NatGateway(f"{name}-nat-{i+1}",
-                subnet_id=public_subnet_ids[i],
+                subnet_id=public_subnet_id,
                 allocation_id=eip.id,
                 tags={
                     "Name": f"{name}-nat-{i+1}",
-                    "Environment": environment,
-                    "CostCenter": "networking"
+                    "AvailabilityZone": az
                 },
                 opts=pulumi.ResourceOptions(parent=self))
             self.nat_gateways.append(nat)
+            self.nat_gateways_by_az[az] = nat
+            nat_targets[az] = {"nat_gateway_id": nat.id}
         
-        # Create private route tables
-        # For single NAT, all private subnets use the same NAT
-        private_subnet_count = args.get("private_subnet_count", 2)
-        
-        for i in range(private_subnet_count):
-            # Determine which NAT to use
-            nat_index = 0 if strategy == "single" else min(i, len(self.nat_gateways) - 1)
-            
+        # One private route table per AZ, targeting the NAT chosen for that AZ
+        for i, az in enumerate(availability_zones):
             private_rt = aws.ec2.RouteTable(f"{name}-private-rt-{i+1}",
                 vpc_id=vpc_id,
                 tags={
                     "Name": f"{name}-private-rt-{i+1}",
-                    "Environment": environment
+                    "AvailabilityZone": az
                 },
                 opts=pulumi.ResourceOptions(parent=self))
             
-            # Add route to NAT Gateway
-            aws.ec2.Route(f"{name}-private-route-{i+1}",
-                route_table_id=private_rt.id,
-                destination_cidr_block="0.0.0.0/0",
-                nat_gateway_id=self.nat_gateways[nat_index].id,
-                opts=pulumi.ResourceOptions(parent=self))
+            # Add route to the NAT Gateway / NAT instance ENI (absent while a scheduled NAT Gateway is off)
+            if self.placement[az] in nat_targets:
+                aws.ec2.Route(f"{name}-private-route-{i+1}",
+                    route_table_id=private_rt.id,
+                    destination_cidr_block="0.0.0.0/0",
+                    **nat_targets[self.placement[az]],
+                    opts=pulumi.ResourceOptions(parent=self))
+            if strategy != "instance":
+                self.schedule_targets.append(pulumi.resource.create_urn(
+                    f"{name}-private-route-{i+1}", "aws:ec2/route:Route", parent=self))
             
             self.private_route_tables.append(private_rt)
+            self.route_tables_by_az[az] = private_rt
         
-        # Calculate monthly cost estimate
-        eip_cost = len(self.eips) * 3.65
-        nat_cost = len(self.nat_gateways) * 45
-        total_cost = eip_cost + nat_cost
+        cross_az = sorted(az for az, nat_az in self.placement.items() if az != nat_az)
+        if cross_az:
+            pulumi.log.warn(f"Private subnets in {', '.join(cross_az)} route through a NAT in another AZ " +
+                            "(cross-AZ data transfer applies)")
         
-        pulumi.log.warn(f"NAT Gateway estimated monthly cost: ${total_cost:.2f} " +
-                       f"(EIPs: ${eip_cost:.2f}, NAT Gateways: ${nat_cost:.2f})")
+        # Register the always-on billable resources with the cost model
+        self.cost_items = nat_cost_items(name, strategy, len(nat_azs), instance_type, active)
+        pricing.register(*self.cost_items)
+        region = self.region
+        total_cost = round(pricing.monthly_cost(self.cost_items, region), 2)
+        self.nat_gateway_ids = [n.id for n in self.nat_gateways]
+        self.estimated_monthly_cost = total_cost
+        
+        pulumi.log.warn(f"NAT estimated monthly cost: ${total_cost:.2f} (" +
+                        ", ".join(f"{item.resource}: ${pricing.item_cost(item, region) or 0:.2f}"
+                                  for item in self.cost_items) +
+                        f") + data processing, price table {pricing.price_table_version()}")
         
         self.register_outputs({
-            "nat_gateway_ids": [n.id for n in self.nat_gateways],
+            "nat_gateway_ids": self.nat_gateway_ids,
+            "nat_instance_eni_ids": [eni.id for eni, _ in self.nat_instances],
             "eip_ids": [e.id for e in self.eips],
             "private_route_table_ids": [rt.id for rt in self.private_route_tables],
-            "estimated_monthly_cost": total_cost
-        })
\ No newline at end of file
+            "nat_placement": self.placement,
+            "estimated_monthly_cost": total_cost,
+            "schedule_targets": self.schedule_targets
+        })
+
+    def _nat_instance_prerequisites(self, name: str, vpc_id: pulumi.Output[str], args: dict):
+        """Instance profile and security group shared by all NAT instances"""
+        role = aws.iam.Role(f"{name}-nat-instance-role",
+            assume_role_policy=json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"Service": "ec2.amazonaws.com"},
+                    "Action": "sts:AssumeRole"
+                }]
+            }),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # fck-nat attaches its static ENI/EIP and disables source/dest checks itself
+        aws.iam.RolePolicy(f"{name}-nat-instance-policy",
+            role=role.id,
+            policy=json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Action": [
+                        "ec2:AttachNetworkInterface",
+                        "ec2:ModifyNetworkInterfaceAttribute",
+                        "ec2:ModifyInstanceAttribute",
+                        "ec2:AssociateAddress",
+                        "ec2:DisassociateAddress"
+                    ],
+                    "Resource": "*"
+                }]
+            }),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # Shell access through Session Manager instead of SSH keys
+        aws.iam.RolePolicyAttachment(f"{name}-nat-instance-ssm",
+            role=role.name,
+            policy_arn="arn:aws:iam::aws:policy/AmazonSSMManagedInstanceCore",
+            opts=pulumi.ResourceOptions(parent=self))
+
+        profile = aws.iam.InstanceProfile(f"{name}-nat-instance-profile",
+            role=role.name,
+            opts=pulumi.ResourceOptions(parent=self))
+
+        security_group = aws.ec2.SecurityGroup(f"{name}-nat-instance-sg",
+            vpc_id=vpc_id,
+            description="NAT instances: all traffic from the VPC, all egress",
+            ingress=[aws.ec2.SecurityGroupIngressArgs(
+                protocol="-1",
+                from_port=0,
+                to_port=0,
+                cidr_blocks=[args.get("vpc_cidr", "10.0.0.0/16")]
+            )],
+            egress=[aws.ec2.SecurityGroupEgressArgs(
+                protocol="-1",
+                from_port=0,
+                to_port=0,
+                cidr_blocks=["0.0.0.0/0"]
+            )],
+            tags={"Name": f"{name}-nat-instance-sg"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        return profile, security_group
+
+    def _nat_instance(self, name: str, az: str, subnet_id: pulumi.Output[str],
+                      eni: aws.ec2.NetworkInterface, eip: aws.ec2.Eip, instance_type: str,
+                      instance_profile: aws.iam.InstanceProfile,
+                      security_group: aws.ec2.SecurityGroup,
+                      capacity: int = 1) -> aws.autoscaling.Group:
+        """Self-healing NAT instance: an ASG of one that re-attaches the static ENI on boot"""
+        ami = cached_invoke(aws.ec2.get_ami,
+            region=self.region,  # AMI ids are regional; the lookup goes through this group's provider
+            opts=pulumi.InvokeOptions(parent=self),
+            owners=[FCK_NAT_AMI_OWNER],
+            most_recent=True,
+            filters=[
+                {"name": "name", "values": ["fck-nat-al2023-*"]},
+                {"name": "architecture", "values": [nat_instance_architecture(instance_type)]}
+            ])
+
+        user_data = pulumi.Output.all(eni.id, eip.allocation_id).apply(
+            lambda ids: base64.b64encode(
+                NAT_INSTANCE_USER_DATA.format(eni_id=ids[0], eip_id=ids[1]).encode()).decode())
+
+        launch_template = aws.ec2.LaunchTemplate(f"{name}-lt",
+            image_id=ami.id,
+            instance_type=instance_type,
+            iam_instance_profile=aws.ec2.LaunchTemplateIamInstanceProfileArgs(arn=instance_profile.arn),
+            vpc_security_group_ids=[security_group.id],
+            user_data=user_data,
+            metadata_options=aws.ec2.LaunchTemplateMetadataOptionsArgs(http_tokens="required"),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        return aws.autoscaling.Group(f"{name}-asg",
+            min_size=capacity,
+            max_size=capacity,
+            desired_capacity=capacity,
+            vpc_zone_identifiers=[subnet_id],
+            launch_template=aws.autoscaling.GroupLaunchTemplateArgs(
+                id=launch_template.id,
+                version=launch_template.latest_version.apply(str)
+            ),
+            tags=[
+                aws.autoscaling.GroupTagArgs(key="Name", value=name, propagate_at_launch=True),
+                aws.autoscaling.GroupTagArgs(key="AvailabilityZone", value=az, propagate_at_launch=True)
+            ],
+            opts=pulumi.ResourceOptions(parent=self))
@@ -0,0 +1,246 @@
+import base64
+import gzip
+import json
+import os
+import pulumi
+import pulumi_aws as aws
+from typing import Dict, List
+from common import pricing
+from common.invoke_cache import cached_invoke
+from . import netbench_harness
+from .nat_gateway import nat_instance_architecture
+
+BUCKET_PLACEHOLDER = "{bucket}"  # results bucket name, known once the bucket exists
+HARNESS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "netbench_harness.py")
+
+# Agents start from the harness embedded in (gzipped) user data, so instances in private
+# subnets without NAT or endpoints need no package or S3 access to run one
+AGENT_USER_DATA = """#!/bin/bash
+mkdir -p /opt/netbench
+cat > /opt/netbench/harness.py <<'HARNESS'
+{harness}
+HARNESS
+systemd-run --unit netbench-agent python3 /opt/netbench/harness.py agent --port {port}
+"""
+
+CONTROLLER_USER_DATA = """cat > /opt/netbench/plan.json <<'PLAN'
+{plan}
+PLAN
+systemd-run --unit netbench-controller python3 /opt/netbench/harness.py controller \\
+  --plan /opt/netbench/plan.json --results {results}
+"""
+
+
+def compress_user_data(script: str) -> str:
+    """gzip + base64: cloud-init unpacks it, and the harness plus a plan stay under the 16 KB limit"""
+    return base64.b64encode(gzip.compress(script.encode(), mtime=0)).decode()
+
+
+class NetBenchGroup(pulumi.ComponentResource):
+    """Network benchmark agents in every public and private subnet - PAID RESOURCES
+
+    One small instance per subnet runs the agent from netbench_harness.py; the
+    public agent of the first AZ also runs the controller, which measures
+    same-AZ, cross-AZ, via-NAT and via-endpoint paths one at a time and writes
+    the results to s3://<bucket>/results/ (<run id>.json and latest.json).
+
+    The controller's user data holds the plan, so a NAT strategy, endpoint or
+    subnet change replaces it and measures again. Agents run until
+    vpc:enable_netbench is turned off, billed as EC2 hours of instance_type.
+    """
+
+    def __init__(self, name: str, vpc_id: pulumi.Output[str], public_subnet_ids: List[pulumi.Output[str]],
+                 private_subnet_ids: List[pulumi.Output[str]], args: dict, opts=None):
+        super().__init__('custom:vpc:NetBenchGroup', name, None, opts)
+
+        environment = args.get("environment", "dev")
+        region = args.get("region", "us-east-1")
+        instance_type = args.get("instance_type", "t4g.nano")
+        availability_zones = args.get("availability_zones", [])
+        nat_placement: Dict[str, str] = args.get("nat_placement", {})
+        port = netbench_harness.DEFAULT_PORT
+        if not len(public_subnet_ids) == len(private_subnet_ids) == len(availability_zones):
+            raise ValueError(f"NetBenchGroup {name}: {len(public_subnet_ids)} public and "
+                             f"{len(private_subnet_ids)} private subnets for {len(availability_zones)} AZs")
+
+        # Results bucket (private, encrypted, expiring)
+        self.bucket = aws.s3.BucketV2(f"{name}-netbench",
+            force_destroy=True,
+            tags={"Name": f"{name}-netbench"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.s3.BucketPublicAccessBlock(f"{name}-netbench-pab",
+            bucket=self.bucket.id,
+            block_public_acls=True,
+            block_public_policy=True,
+            ignore_public_acls=True,
+            restrict_public_buckets=True,
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.s3.BucketServerSideEncryptionConfigurationV2(f"{name}-netbench-sse",
+            bucket=self.bucket.id,
+            rules=[aws.s3.BucketServerSideEncryptionConfigurationV2RuleArgs(
+                apply_server_side_encryption_by_default=aws.s3.BucketServerSideEncryptionConfigurationV2RuleApplyServerSideEncryptionByDefaultArgs(
+                    sse_algorithm="AES256"
+                )
+            )],
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.s3.BucketLifecycleConfigurationV2(f"{name}-netbench-lifecycle",
+            bucket=self.bucket.id,
+            rules=[aws.s3.BucketLifecycleConfigurationV2RuleArgs(
+                id="expire-payloads",
+                status="Enabled",
+                filter=aws.s3.BucketLifecycleConfigurationV2RuleFilterArgs(prefix="payload/"),
+                expiration=aws.s3.BucketLifecycleConfigurationV2RuleExpirationArgs(days=1)
+            )],
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # Agents copy S3 payloads and the controller writes results; nothing else
+        role = aws.iam.Role(f"{name}-netbench-role",
+            assume_role_policy=json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"Service": "ec2.amazonaws.com"},
+                    "Action": "sts:AssumeRole"
+                }]
+            }),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        aws.iam.RolePolicy(f"{name}-netbench-policy",
+            role=role.id,
+            policy=self.bucket.arn.apply(lambda arn: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Action": ["s3:PutObject", "s3:GetObject"],
+                    "Resource": [f"{arn}/results/*", f"{arn}/payload/*"]
+                }]
+            })),
+            opts=pulumi.ResourceOptions(parent=self))
+
+        # Shell access through Session Manager instead of SSH keys
+        aws.iam.RolePolicyAttachment(f"{name}-netbench-ssm",
+            role=role.name,
+            policy_arn="arn:aws:iam::aws:policy/AmazonSSMManagedInstanceCore",
+            opts=pulumi.ResourceOptions(parent=self))
+
+        profile = aws.iam.InstanceProfile(f"{name}-netbench-profile",
+            role=role.name,
+            opts=pulumi.ResourceOptions(parent=self))
+
+        security_group = aws.ec2.SecurityGroup(f"{name}-netbench-sg",
+            vpc_id=vpc_id,
+            description="NetBench agents: agent port from the VPC, all egress",
+            ingress=[aws.ec2.SecurityGroupIngressArgs(
+                protocol="tcp",
+                from_port=port,
+                to_port=port,
+                cidr_blocks=[args.get("vpc_cidr", "10.0.0.0/16")]
+            )],
+            egress=[aws.ec2.SecurityGroupEgressArgs(
+                protocol="-1",
+                from_port=0,
+                to_port=0,
+                cidr_blocks=["0.0.0.0/0"]
+            )],
+            tags={"Name": f"{name}-netbench-sg"},
+            opts=pulumi.ResourceOptions(parent=self))
+
+        ami = cached_invoke(aws.ec2.get_ami,
+            region=region,
+            opts=pulumi.InvokeOptions(parent=self),
+            owners=["amazon"],
+            most_recent=True,
+            filters=[
+                {"name": "name", "values": ["al2023-ami-2023.*-kernel-*"]},
+                {"name": "architecture", "values": [nat_instance_architecture(instance_type)]}
+            ])
+
+        # Test matrix over agent names; hosts are filled in once the agents have addresses
+        agents = {f"{tier}-{az}": {"az": az, "tier": tier, "port": port}
+                  for tier in ("public", "private") for az in availability_zones}
+        plan = netbench_harness.build_plan(agents, nat_placement, {
+            "seconds": args.get("seconds", 10),
+            "internet_url": args.get("internet_url"),
+            "gateway_endpoints": args.get("gateway_endpoints", False),
+            "interface_services": args.get("interface_services", []),
+            "region": region,
+            "bucket": BUCKET_PLACEHOLDER,
+            "metadata": {
+                "environment": environment,
+                "region": region,
+                "instance_type": instance_type,
+                "nat_strategy": args.get("nat_strategy", "none"),
+                "nat_placement": nat_placement,
+                "gateway_endpoints": args.get("gateway_endpoints", False),
+                "interface_services": args.get("interface_services", []),
+            },
+        })
+        pulumi.log.info(f"NetBench {name}: {len(agents)} agents, {len(plan['tests'])} tests")
+
+        with open(HARNESS_FILE) as f:
+            agent_user_data = AGENT_USER_DATA.format(harness=f.read().rstrip("\n"), port=port)
+        controller = f"public-{availability_zones[0]}"
+        self.instances: Dict[str, aws.ec2.Instance] = {}
+
+        def instance(agent: str, subnet_id, user_data) -> aws.ec2.Instance:
+            tier, az = agents[agent]["tier"], agents[agent]["az"]
+            return aws.ec2.Instance(f"{name}-netbench-{tier}-{availability_zones.index(az) + 1}",
+                ami=ami.id,
+                instance_type=instance_type,
+                subnet_id=subnet_id,
+                vpc_security_group_ids=[security_group.id],
+                iam_instance_profile=profile.name,
+                user_data_base64=user_data,
+                user_data_replace_on_change=True,
+                metadata_options=aws.ec2.InstanceMetadataOptionsArgs(http_tokens="required"),
+                tags={
+                    "Name": f"{name}-netbench-{agent}",
+                    "AvailabilityZone": az
+                },
+                opts=pulumi.ResourceOptions(parent=self))
+
+        for subnet_ids, tier in ((public_subnet_ids, "public"), (private_subnet_ids, "private")):
+            for az, subnet_id in zip(availability_zones, subnet_ids):
+                if f"{tier}-{az}" != controller:
+                    self.instances[f"{tier}-{az}"] = instance(f"{tier}-{az}", subnet_id,
+                                                              compress_user_data(agent_user_data))
+
+        # The controller's own agent is "self" in its plan, so no agent depends on the controller
+        peers = sorted(self.instances)
+        controller_user_data = pulumi.Output.all(self.bucket.bucket,
+                                                 *[self.instances[a].private_ip for a in peers]).apply(
+            lambda values: compress_user_data(agent_user_data + CONTROLLER_USER_DATA.format(
+                plan=json.dumps(self._resolve(plan, dict(zip(peers, values[1:])), controller, values[0])),
+                results=f"s3://{values[0]}/results/")))
+        self.instances[controller] = instance(controller, public_subnet_ids[0], controller_user_data)
+
+        self.results_uri = pulumi.Output.concat("s3://", self.bucket.bucket, "/results/latest.json")
+
+        # Register the always-on billable resources with the cost model
+        self.cost_items = [pricing.hourly(name, f"NetBench agent ({instance_type})", f"ec2:{instance_type}",
+                                          len(self.instances))]
+        pricing.register(*self.cost_items)
+        pulumi.log.warn(f"NetBench creates {len(self.instances)} {instance_type} instances - these are PAID "
+                        "resources; turn vpc:enable_netbench off once the results are in")
+
+        self.register_outputs({
+            "bucket": self.bucket.bucket,
+            "results_uri": self.results_uri,
+            "instance_ids": {agent: i.id for agent, i in self.instances.items()},
+            "tests": [t["name"] for t in plan["tests"]]
+        })
+
+    @staticmethod
+    def _resolve(plan: dict, hosts: Dict[str, str], controller: str, bucket: str) -> dict:
+        """Plan with every agent's private IP ('self' for the controller's own agent) and the bucket name"""
+        agents = {name: {**agent, "host": hosts.get(name, netbench_harness.SELF)}
+                  for name, agent in plan["agents"].items()}
+        for name in agents:
+            if name != controller and name not in hosts:
+                raise ValueError(f"No address for NetBench agent {name}")
+        tests = [{**test, "command": [arg.replace(BUCKET_PLACEHOLDER, bucket) for arg in test["command"]]}
+                 if "command" in test else test for test in plan["tests"]]
+        return {**plan, "agents": agents, "tests": tests}
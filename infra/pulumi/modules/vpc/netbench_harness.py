@@ -0,0 +1,378 @@
+"""
+NetBench harness: iperf-style throughput and RTT measurements between agents.
+
+Standard library only: modules/vpc/netbench.py ships this file to the NetBench
+instances as-is. Every instance runs an agent. The controller (one of them)
+reads the plan, waits for every agent, then asks each test's client agent to
+measure against its target, one test at a time so no two measurements share a
+link, and publishes the results (S3 or a local file).
+
+Agent protocol: one JSON request line per connection, then
+- echo:  64-byte messages are echoed back (RTT)
+- sink:  everything is read until EOF, answered with {"bytes": n} (throughput)
+- run:   the agent runs a test itself and answers with its result
+- ping:  readiness check
+
+Test kinds: tcp (RTT + throughput to another agent), connect (TCP handshake
+RTT, e.g. to an interface endpoint), http (download through NAT) and command
+(e.g. 'aws s3 cp' through the S3 gateway endpoint).
+
+    python3 netbench_harness.py agent --port 5201
+    python3 netbench_harness.py controller --plan plan.json --results s3://bucket/results/
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+DEFAULT_PORT = 5201
+SELF = "self"  # plan host of the controller's own agent
+MESSAGE_SIZE = 64
+CHUNK_SIZE = 128 * 1024
+
+
+def rtt_stats(samples_ms: List[float]) -> dict:
+    """min/avg/p50/p99/max of RTT samples in milliseconds"""
+    ordered = sorted(samples_ms)
+    return {
+        "min": round(ordered[0], 3),
+        "avg": round(statistics.fmean(ordered), 3),
+        "p50": round(statistics.median(ordered), 3),
+        "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+        "max": round(ordered[-1], 3),
+        "samples": len(ordered),
+    }
+
+
+def _open(host: str, port: int, op: str, timeout: float) -> socket.socket:
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall((json.dumps({"op": op}) + "\n").encode())
+    return sock
+
+
+def _read_line(sock: socket.socket) -> bytes:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def measure_rtt(host: str, port: int, count: int = 20, timeout: float = 5.0) -> dict:
+    """Round trips of a 64-byte message over one TCP connection to an agent"""
+    samples = []
+    with _open(host, port, "echo", timeout) as sock:
+        message = b"x" * MESSAGE_SIZE
+        for _ in range(count):
+            start = time.perf_counter()
+            sock.sendall(message)
+            received = 0
+            while received < MESSAGE_SIZE:
+                chunk = sock.recv(MESSAGE_SIZE - received)
+                if not chunk:
+                    raise ConnectionError(f"{host}:{port} closed the echo connection")
+                received += len(chunk)
+            samples.append((time.perf_counter() - start) * 1000)
+    return rtt_stats(samples)
+
+
+def measure_connect(host: str, port: int, count: int = 5, timeout: float = 5.0) -> dict:
+    """TCP handshake times, for targets that are not agents (endpoints, the internet)"""
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        socket.create_connection((host, port), timeout=timeout).close()
+        samples.append((time.perf_counter() - start) * 1000)
+    return rtt_stats(samples)
+
+
+def measure_throughput(host: str, port: int, seconds: float = 5.0, timeout: float = 5.0) -> float:
+    """Megabits/s streamed to an agent for `seconds`, as counted by the agent"""
+    payload = os.urandom(CHUNK_SIZE)
+    with _open(host, port, "sink", timeout) as sock:
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            sock.sendall(payload)
+        sock.shutdown(socket.SHUT_WR)
+        received = json.loads(_read_line(sock))["bytes"]
+        elapsed = time.perf_counter() - start
+    return round(received * 8 / elapsed / 1e6, 2)
+
+
+def measure_http(url: str, max_bytes: int = 64 * 1024 * 1024, timeout: float = 10.0) -> float:
+    """Megabits/s downloading `url` (at most max_bytes)"""
+    received = 0
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        while received < max_bytes:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+    return round(received * 8 / (time.perf_counter() - start) / 1e6, 2)
+
+
+def measure_command(command: List[str], payload_bytes: int, timeout: float = 120.0) -> float:
+    """Megabits/s of a command moving payload_bytes; '{payload}' in it is a file of that size"""
+    with tempfile.NamedTemporaryFile() as payload:
+        payload.write(os.urandom(payload_bytes))
+        payload.flush()
+        start = time.perf_counter()
+        subprocess.run([arg.replace("{payload}", payload.name) for arg in command],
+                       check=True, capture_output=True, timeout=timeout)
+        elapsed = time.perf_counter() - start
+    return round(payload_bytes * 8 / elapsed / 1e6, 2)
+
+
+def run_test(test: dict) -> dict:
+    """Run one (resolved) test from this host; failures are recorded, not raised"""
+    result = {key: test.get(key) for key in ("name", "path", "kind", "client", "target")}
+    result.update({"rtt_ms": None, "throughput_mbps": None, "error": None})
+    start = time.perf_counter()
+    try:
+        kind = test["kind"]
+        if kind == "tcp":
+            result["rtt_ms"] = measure_rtt(test["host"], test["port"], test.get("count", 20))
+            result["throughput_mbps"] = measure_throughput(test["host"], test["port"], test.get("seconds", 5))
+        elif kind == "connect":
+            result["rtt_ms"] = measure_connect(test["host"], test["port"], test.get("count", 5))
+        elif kind == "http":
+            if test.get("host"):
+                result["rtt_ms"] = measure_connect(test["host"], test.get("port", 443), test.get("count", 5))
+            result["throughput_mbps"] = measure_http(test["url"])
+        elif kind == "command":
+            result["throughput_mbps"] = measure_command(test["command"], test.get("payload_bytes", 0))
+        else:
+            raise ValueError(f"unknown test kind '{kind}'")
+    except Exception as e:  # a failed path (e.g. no NAT) is a result too
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    for key in ("nat_az", "cross_az"):
+        if key in test:
+            result[key] = test[key]
+    return result
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline() or b"{}")
+        op = request.get("op")
+        if op == "echo":
+            while True:
+                data = self.rfile.read1(MESSAGE_SIZE)
+                if not data:
+                    return
+                self.wfile.write(data)
+                self.wfile.flush()
+        elif op == "sink":
+            received = 0
+            while True:
+                data = self.rfile.read1(CHUNK_SIZE)  # the buffer may already hold data after the request line
+                if not data:
+                    break
+                received += len(data)
+            self._reply({"bytes": received})
+        elif op == "run":
+            self._reply(run_test(request["test"]))
+        elif op == "ping":
+            self._reply({"ok": True})
+        else:
+            self._reply({"error": f"unknown op {op!r}"})
+
+    def _reply(self, message: dict):
+        self.wfile.write((json.dumps(message) + "\n").encode())
+
+
+class Agent(socketserver.ThreadingTCPServer):
+    """Serves the agent protocol; start() runs it on a background thread"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "0.0.0.0", port: int = DEFAULT_PORT):
+        super().__init__((host, port), _Handler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "Agent":
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.1}, daemon=True).start()
+        return self
+
+
+def request(host: str, port: int, message: dict, timeout: float) -> dict:
+    """Send one request to an agent and return its JSON answer"""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps(message) + "\n").encode())
+        return json.loads(_read_line(sock))
+
+
+def wait_for_agents(agents: Dict[str, dict], timeout: float = 600.0, interval: float = 5.0):
+    """Block until every agent answers a ping; raises TimeoutError naming the missing ones"""
+    deadline = time.monotonic() + timeout
+    waiting = dict(agents)
+    while waiting:
+        for name, agent in list(waiting.items()):
+            try:
+                request(agent["host"], agent["port"], {"op": "ping"}, timeout=2.0)
+                del waiting[name]
+            except OSError:
+                pass
+        if waiting:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"NetBench agents not reachable: {', '.join(sorted(waiting))}")
+            time.sleep(interval)
+
+
+def build_plan(agents: Dict[str, dict], nat_placement: Dict[str, str], options: dict) -> dict:
+    """Test matrix over agents {name: {"az", "tier"}} (hosts are filled in at deploy time).
+
+    - same-az:      private agent -> public agent of its AZ
+    - cross-az:     private agent -> private agent of the next AZ
+    - via-nat:      private agents download options["internet_url"] (when a NAT exists)
+    - via-endpoint: private agents copy to/from S3 (gateway endpoint) and
+                    connect to every interface endpoint
+    """
+    by_tier: Dict[str, Dict[str, str]] = {}
+    for name, agent in agents.items():
+        by_tier.setdefault(agent["tier"], {})[agent["az"]] = name
+    private, public = by_tier.get("private", {}), by_tier.get("public", {})
+    azs = list(private)
+    seconds, count = options.get("seconds", 5), options.get("count", 20)
+
+    tests = []
+    for az in azs:
+        if az in public:
+            tests.append({"name": f"same-az {az}", "path": "same-az", "kind": "tcp", "client": private[az],
+                          "target": public[az], "seconds": seconds, "count": count})
+    pairs = list(zip(azs, azs[1:] + azs[:1])) if len(azs) > 2 else list(zip(azs[:1], azs[1:]))
+    for az, peer in pairs:
+        tests.append({"name": f"cross-az {az}->{peer}", "path": "cross-az", "kind": "tcp", "client": private[az],
+                      "target": private[peer], "seconds": seconds, "count": count})
+
+    if nat_placement and options.get("internet_url"):
+        url = urllib.parse.urlsplit(options["internet_url"])
+        port = url.port or (443 if url.scheme == "https" else 80)
+        for az in azs:
+            tests.append({"name": f"via-nat {az}", "path": "via-nat", "kind": "http", "client": private[az],
+                          "target": "internet", "url": url.geturl(), "host": url.hostname, "port": port,
+                          "nat_az": nat_placement.get(az), "cross_az": nat_placement.get(az) != az})
+
+    bucket, region = options.get("bucket"), options.get("region")
+    for az in azs:
+        if options.get("gateway_endpoints") and bucket:
+            key = f"s3://{bucket}/payload/{private[az]}.bin"
+            payload = options.get("payload_bytes", 32 * 1024 * 1024)
+            tests.append({"name": f"s3-put {az}", "path": "via-endpoint", "kind": "command", "client": private[az],
+                          "target": "s3", "payload_bytes": payload,
+                          "command": ["aws", "s3", "cp", "--region", region, "--quiet", "{payload}", key]})
+            tests.append({"name": f"s3-get {az}", "path": "via-endpoint", "kind": "command", "client": private[az],
+                          "target": "s3", "payload_bytes": payload,
+                          "command": ["aws", "s3", "cp", "--region", region, "--quiet", key, "{payload}"]})
+        for service in options.get("interface_services", []):
+            tests.append({"name": f"{service} {az}", "path": "via-endpoint", "kind": "connect",
+                          "client": private[az], "target": service,
+                          "host": f"{service}.{region}.amazonaws.com", "port": 443})
+    return {"agents": {name: dict(agent) for name, agent in agents.items()}, "tests": tests,
+            "metadata": dict(options.get("metadata", {}))}
+
+
+def _local_ip(peer: str) -> str:
+    """Address this host uses to reach `peer` (no packets are sent)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((peer, 9))
+        return sock.getsockname()[0]
+
+
+def run_plan(plan: dict, timeout: float = 600.0) -> dict:
+    """Run every test on its client agent, in order; returns the results document.
+
+    An agent whose host is "self" is the controller's own agent.
+    """
+    agents = {name: dict(agent) for name, agent in plan["agents"].items()}
+    peers = [a["host"] for a in agents.values() if a["host"] != SELF]
+    for agent in agents.values():
+        if agent["host"] == SELF:
+            agent["host"] = _local_ip(peers[0]) if peers else "127.0.0.1"
+    wait_for_agents(agents, timeout)
+    started = datetime.now(timezone.utc)
+    results = []
+    for test in plan["tests"]:
+        test = dict(test)
+        if test["target"] in agents:
+            test.update(host=agents[test["target"]]["host"], port=agents[test["target"]]["port"])
+        client = agents[test["client"]]
+        try:
+            result = request(client["host"], client["port"], {"op": "run", "test": test},
+                             timeout=test.get("seconds", 5) + 120)
+        except OSError as e:
+            result = {"name": test["name"], "path": test["path"], "error": f"{type(e).__name__}: {e}"}
+        results.append(result)
+    return {
+        "run_id": started.strftime("%Y%m%dT%H%M%SZ"),
+        "started_at": started.isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "metadata": plan.get("metadata", {}),
+        "results": results,
+    }
+
+
+def publish(document: dict, destination: str, run: Callable = subprocess.run) -> List[str]:
+    """Write results as <run_id>.json and latest.json under an s3:// prefix or a directory"""
+    body = json.dumps(document, indent=2)
+    names = [f"{document['run_id']}.json", "latest.json"]
+    if destination.startswith("s3://"):
+        for name in names:
+            run(["aws", "s3", "cp", "-", destination.rstrip("/") + "/" + name,
+                 "--content-type", "application/json"], input=body.encode(), check=True)
+        return [destination.rstrip("/") + "/" + name for name in names]
+    os.makedirs(destination, exist_ok=True)
+    for name in names:
+        with open(os.path.join(destination, name), "w") as f:
+            f.write(body + "\n")
+    return [os.path.join(destination, name) for name in names]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="NetBench agent and controller")
+    sub = parser.add_subparsers(dest="command", required=True)
+    agent = sub.add_parser("agent")
+    agent.add_argument("--port", type=int, default=DEFAULT_PORT)
+    controller = sub.add_parser("controller")
+    controller.add_argument("--plan", required=True, help="plan JSON file")
+    controller.add_argument("--results", required=True, help="s3://bucket/prefix/ or a directory")
+    controller.add_argument("--timeout", type=float, default=900.0, help="seconds to wait for agents")
+    args = parser.parse_args(argv)
+
+    if args.command == "agent":
+        Agent(port=args.port).serve_forever()
+        return 0
+
+    with open(args.plan) as f:
+        plan = json.load(f)
+    document = run_plan(plan, args.timeout)
+    for location in publish(document, args.results):
+        print(f"NetBench results: {location}")
+    failed = [r["name"] for r in document["results"] if r.get("error")]
+    if failed:
+        print(f"NetBench: {len(failed)} tests failed: {', '.join(failed)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Warm pool of VPC shells for ephemeral per-PR environments.
+
+A shell is what every VPC starts with and what costs nothing: a VpcBase (VPC,
+internet gateway, public route table) plus public and private SubnetGroups.
+The pr-pool-vpc stack keeps vpc:pool_size shells ready, shell i in slot i of
+EPHEMERAL_CIDR_POOL. A pr-<n>-vpc stack whose claimed slot is a shell
+(vpc:pool_stack set by common/ephemeral.py) reads the shell's ids from the pool
+stack instead of creating them, and only adds what the PR asks for on top
+(NAT, endpoints, flow logs). Destroying the PR stack leaves the shell intact,
+ready for the next claim.
+
+Shells are built from the pr-pool config and PR stacks read them with their
+own config, so both must agree on region, vpc:subnet_count and subnet prefixes
+(the ephemeral defaults in config/defaults.py).
+"""
+
+import pulumi
+import pulumi_aws as aws
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Tuple
+from .vpc_base import VpcBase
+from .subnets import SubnetGroup
+from .cidr_planner import SubnetPlan, TierSpec, cidrs_for_tier, plan_subnets
+from common.stack_refs import get_stack_reference
+from config.defaults import POOL_ENV, ephemeral_block
+from config.resolver import ResolvedConfig
+
+POOL_STACK = f"{POOL_ENV}-vpc"
+
+
+def karpenter_discovery(env: str, cfg: ResolvedConfig) -> Optional[str]:
+    """karpenter.sh/discovery value of the env's private subnets, None without eks:enable_karpenter
+
+    Owned by the vpc stack so the subnets' tags don't drift; the eks stack
+    reads it back (karpenter_discovery output) to tag the cluster security group.
+    """
+    return f"{env}-eks" if cfg["eks:enable_karpenter"] else None
+
+
+def build_shell(name: str, env: str, cfg: ResolvedConfig, cidr_block: str, availability_zones: List[str],
+                subnet_plan: List[SubnetPlan], on_target: Callable[..., pulumi.ResourceOptions]):
+    """VpcBase and public/private SubnetGroups (free resources only); returns all three"""
+    vpc_base = VpcBase(name, {
+        "cidr_block": cidr_block,
+        "environment": env,
+        "enable_dns_support": cfg["vpc:enable_dns_support"],
+        "enable_dns_hostnames": cfg["vpc:enable_dns_hostnames"],
+        "secondary_cidr_blocks": list(cfg["vpc:secondary_cidr_blocks"])
+    }, opts=on_target())
+
+    public_subnets = SubnetGroup(f"{name}-public",
+        vpc_base.vpc.id,
+        {
+            "type": "public",
+            "environment": env,
+            "availability_zones": availability_zones,
+            "cidr_blocks": cidrs_for_tier(subnet_plan, "public")
+        }, opts=on_target())
+
+    # Associate public subnets with public route table
+    for i, subnet_id in enumerate(public_subnets.subnets):
+        aws.ec2.RouteTableAssociation(f"{name}-public-rta-{i+1}",
+            subnet_id=subnet_id.id,
+            route_table_id=vpc_base.public_route_table.id,
+            opts=on_target())
+
+    private_subnets = SubnetGroup(f"{name}-private",
+        vpc_base.vpc.id,
+        {
+            "type": "private",
+            "environment": env,
+            "availability_zones": availability_zones,
+            "cidr_blocks": cidrs_for_tier(subnet_plan, "private"),
+            "karpenter_discovery": karpenter_discovery(env, cfg)
+        }, opts=on_target())
+
+    return vpc_base, public_subnets, private_subnets
+
+
+def build_pool(env: str, cfg: ResolvedConfig, availability_zones: List[str]) -> List[dict]:
+    """vpc:pool_size shells, shell i in ephemeral_block(i); returns the 'shells' export"""
+    tiers = [
+        TierSpec("public", cfg["vpc:public_subnet_prefix"]),
+        TierSpec("private", cfg["vpc:private_subnet_prefix"], cfg["vpc:private_subnet_offset"]),
+    ]
+    shells = []
+    for slot in range(cfg["vpc:pool_size"]):
+        cidr_block = ephemeral_block(slot)
+        vpc_base, public_subnets, private_subnets = build_shell(
+            f"{env}-shell-{slot}", env, cfg, cidr_block, availability_zones,
+            plan_subnets(cidr_block, tiers, len(availability_zones)), pulumi.ResourceOptions)
+        shells.append({
+            "slot": slot,
+            "vpc_id": vpc_base.vpc.id,
+            "vpc_cidr": vpc_base.vpc.cidr_block,
+            "internet_gateway_id": vpc_base.igw.id,
+            "public_route_table_id": vpc_base.public_route_table.id,
+            "public_subnet_ids": [s.id for s in public_subnets.subnets],
+            "private_subnet_ids": [s.id for s in private_subnets.subnets],
+            "availability_zones": availability_zones,
+        })
+
+    pulumi.log.info(f"VPC shell pool: {len(shells)} shells (claims: python -m common.ephemeral status)")
+    return shells
+
+
+def claimed_shell(pool_stack: str, slot: int, availability_zones: List[str]) -> Tuple[SimpleNamespace, ...]:
+    """Stand-ins for (VpcBase, public SubnetGroup, private SubnetGroup) backed by a pool shell's outputs"""
+    def shell_of(shells):
+        shell = next((s for s in shells or [] if s["slot"] == slot), None)
+        if shell is None:
+            raise ValueError(f"{pool_stack} has no shell in slot {slot}; claim again or unset vpc:pool_stack")
+        if shell["availability_zones"] != list(availability_zones):
+            raise ValueError(f"Shell {slot} spans {shell['availability_zones']}, expected {availability_zones}")
+        return shell
+
+    shell = get_stack_reference(pool_stack).require_output("shells").apply(shell_of)
+
+    def subnet_group(tier: str) -> SimpleNamespace:
+        subnets = [SimpleNamespace(id=shell.apply(lambda s, i=i: s[f"{tier}_subnet_ids"][i]))
+                   for i in range(len(availability_zones))]
+        return SimpleNamespace(subnets=subnets, subnets_by_az=dict(zip(availability_zones, subnets)))
+
+    vpc_base = SimpleNamespace(
+        vpc=SimpleNamespace(id=shell.apply(lambda s: s["vpc_id"]), cidr_block=shell.apply(lambda s: s["vpc_cidr"])),
+        igw=SimpleNamespace(id=shell.apply(lambda s: s["internet_gateway_id"])),
+        public_route_table=SimpleNamespace(id=shell.apply(lambda s: s["public_route_table_id"])),
+        secondary_cidrs=[])
+    return vpc_base, subnet_group("public"), subnet_group("private")
@@ -1,53 +1,53 @@
 import pulumi
 import pulumi_aws as aws
-from typing import List
+from typing import Dict, List
 
 class SubnetGroup(pulumi.ComponentResource):
-    """Manages a group of subnets (public or private)"""
+    """Manages a group of subnets (public or private), one per availability zone"""
     
     def __init__(self, name: str, vpc_id: pulumi.Output[str], args: dict, opts=None):
         super().__init__('custom:vpc:SubnetGroup', name, None, opts)
         
         self.subnets: List[aws.ec2.Subnet] = []
+        self.subnets_by_az: Dict[str, aws.ec2.Subnet] = {}
         subnet_type = args.get("type", "public")
-        environment = args.get("environment", "dev")
+        # karpenter.sh/discovery value for private subnets (EC2NodeClass subnetSelectorTerms)
+        karpenter_discovery = args.get("karpenter_discovery")
         
-        # Get availability zones
-        azs = aws.get_availability_zones(state="available")
+        # Shared AZ map: cidr_blocks[i] goes to availability_zones[i]
+        # (see cidr_planner.plan_subnets and vpc_stack)
+        availability_zones = args.get("availability_zones", [])
+        cidr_blocks = args.get("cidr_blocks", [])
+        if len(cidr_blocks) != len(availability_zones):
+            raise ValueError(f"SubnetGroup {name}: {len(cidr_blocks)} CIDRs for "
+                             f"{len(availability_zones)} availability zones")
         
-        # Create subnets
-        for i in range(args.get("count", 2)):
-            if i >= len(azs.names):
-                break
-                
-            # Calculate subnet CIDR
-            base_cidr = args.get("base_cidr_prefix", "10.0")
-            cidr_offset = args.get("cidr_offset", 0)
-            subnet_cidr = f"{base_cidr}.{cidr_offset + i}.0/24"
-            
-            # EKS-specific tags
+        for i, (az, subnet_cidr) in enumerate(zip(availability_zones, cidr_blocks)):
+            # EKS-specific tags (pod subnets only hold pod ENIs, never load balancers)
             eks_tags = {}
             if subnet_type == "public":
                 eks_tags["kubernetes.io/role/elb"] = "1"
-            else:
+            elif subnet_type == "private":
                 eks_tags["kubernetes.io/role/internal-elb"] = "1"
+                if karpenter_discovery:
+                    eks_tags["karpenter.sh/discovery"] = karpenter_discovery
             
             subnet = aws.ec2.Subnet(f"{name}-{i+1}",
                 vpc_id=vpc_id,
                 cidr_block=subnet_cidr,
-                availability_zone=azs.names[i],
+                availability_zone=az,
                 map_public_ip_on_launch=(subnet_type == "public"),
                 tags={
                     "Name": f"{name}-{i+1}",
-                    "Environment": environment,
                     "Type": subnet_type,
                     **eks_tags
                 },
                 opts=pulumi.ResourceOptions(parent=self))
             
             self.subnets.append(subnet)
+            self.subnets_by_az[az] = subnet
         
         self.register_outputs({
             "subnet_ids": [s.id for s in self.subnets],
             "subnet_cidrs": [s.cidr_block for s in self.subnets]
-        })
\ No newline at end of file
+        })
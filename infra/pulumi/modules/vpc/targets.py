@@ -0,0 +1,84 @@
+"""
+Regions and accounts the vpc stack builds VPCs in (vpc:targets).
+
+plan_targets turns vpc:targets into VpcTargets, each with its own
+non-overlapping CIDR block, and target_provider gives the targets outside the
+stack's own region/account an explicit provider that assumes their role.
+"""
+
+import pulumi_aws as aws
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence
+from .cidr_planner import allocate_vpc_blocks, find_overlaps
+
+
+@dataclass(frozen=True)
+class VpcTarget:
+    """One region/account the vpc stack builds a VPC in"""
+    region: str
+    name: str  # VPC name; resource names derive from it
+    cidr_block: str
+    account_id: Optional[str] = None
+    role_arn: Optional[str] = None
+    primary: bool = False  # first target: its outputs are also exported unkeyed
+
+    @property
+    def key(self) -> str:
+        """Output key: the region, plus '/<account_id>' whenever the target sets an account"""
+        return self.region if not self.account_id else f"{self.region}/{self.account_id}"
+
+    def uses_default_provider(self, default_region: str) -> bool:
+        """Primary target in the stack's own region and account keeps the default provider (no replacement)"""
+        return self.primary and self.region == default_region and not self.role_arn and not self.account_id
+
+
+def plan_targets(vpc_name: str, vpc_cidr: str, default_region: str, targets: Sequence[Mapping],
+                 reserved: Optional[Dict[str, str]] = None) -> List[VpcTarget]:
+    """VpcTargets for vpc:targets, with a non-overlapping CIDR block for each.
+
+    No targets means one VPC in aws:region, exactly as before. The first target keeps
+    vpc:name and vpc:cidr_block; the others are named '<vpc>-<region>' and, without an
+    explicit cidr_block, get the next free blocks of the same size after vpc:cidr_block.
+    `reserved` ({name: cidr}, e.g. other environments' VPCs) must not be overlapped.
+    """
+    if not targets:
+        return [VpcTarget(default_region, vpc_name, vpc_cidr, primary=True)]
+
+    regions = [t["region"] for t in targets]
+    names, requested = [], {}
+    for i, target in enumerate(targets):
+        if i == 0:
+            name = vpc_name
+        else:
+            name = f"{vpc_name}-{target['region']}"
+            if regions.count(target["region"]) > 1:
+                name += f"-{target['account_id'] or i}"
+        if name in requested:
+            raise ValueError(f"vpc:targets lists {target['region']} twice for the same account")
+        names.append(name)
+        requested[name] = target.get("cidr_block") or (vpc_cidr if i == 0 else None)
+
+    reserved = dict(reserved or {})
+    prefix = int(vpc_cidr.split("/")[1])
+    blocks = allocate_vpc_blocks(requested, prefix, vpc_cidr, reserved.values())
+
+    overlaps = find_overlaps({**reserved, **blocks})
+    overlaps = [pair for pair in overlaps if pair[0] in blocks or pair[1] in blocks]
+    if overlaps:
+        raise ValueError(f"vpc:targets CIDR blocks overlap: {overlaps}")
+
+    return [VpcTarget(target["region"], name, blocks[name], target.get("account_id"), target.get("role_arn"),
+                      primary=(i == 0))
+            for i, (target, name) in enumerate(zip(targets, names))]
+
+
+def target_provider(env: str, target: VpcTarget, profile: Optional[str] = None) -> aws.Provider:
+    """Explicit provider for a target's region, assuming its role and pinned to its account"""
+    return aws.Provider(f"{env}-aws-{target.key.replace('/', '-')}",
+        region=target.region,
+        profile=profile,
+        assume_role=aws.ProviderAssumeRoleArgs(
+            role_arn=target.role_arn,
+            session_name=f"pulumi-{env}-vpc"
+        ) if target.role_arn else None,
+        allowed_account_ids=[target.account_id] if target.account_id else None)
@@ -11,29 +11,28 @@ class VpcBase(pulumi.ComponentResource):
             cidr_block=args.get("cidr_block", "10.0.0.0/16"),
             enable_dns_support=args.get("enable_dns_support", True),
             enable_dns_hostnames=args.get("enable_dns_hostnames", True),
-            tags={
-                "Name": f"{name}-vpc",
-                "Environment": args.get("environment", "dev"), # fallback default
-                "ManagedBy": "Pulumi"
-            },
+            tags={"Name": f"{name}-vpc"},
             opts=pulumi.ResourceOptions(parent=self))
         
+        # Secondary CIDR blocks (free), e.g. 100.64.0.0/16 for pod subnets
+        self.secondary_cidrs = []
+        for i, cidr in enumerate(args.get("secondary_cidr_blocks", [])):
+            association = aws.ec2.VpcIpv4CidrBlockAssociation(f"{name}-cidr-{i+1}",
+                vpc_id=self.vpc.id,
+                cidr_block=cidr,
+                opts=pulumi.ResourceOptions(parent=self))
+            self.secondary_cidrs.append(association)
+        
         # Internet Gateway (free resource)
         self.igw = aws.ec2.InternetGateway(f"{name}-igw",
             vpc_id=self.vpc.id,
-            tags={
-                "Name": f"{name}-igw",
-                "Environment": args.get("environment", "dev")
-            },
+            tags={"Name": f"{name}-igw"},
             opts=pulumi.ResourceOptions(parent=self))
         
         # Public Route Table (free resource)
         self.public_route_table = aws.ec2.RouteTable(f"{name}-public-rt",
             vpc_id=self.vpc.id,
-            tags={
-                "Name": f"{name}-public-rt",
-                "Environment": args.get("environment", "dev")
-            },
+            tags={"Name": f"{name}-public-rt"},
             opts=pulumi.ResourceOptions(parent=self))
         
         # Default route to IGW (free)
@@ -46,6 +45,7 @@ class VpcBase(pulumi.ComponentResource):
         self.register_outputs({
             "vpc_id": self.vpc.id,
             "vpc_cidr": self.vpc.cidr_block,
+            "secondary_cidrs": [a.cidr_block for a in self.secondary_cidrs],
             "igw_id": self.igw.id,
             "public_route_table_id": self.public_route_table.id
         })
\ No newline at end of file
@@ -1,144 +1,348 @@
 import pulumi
 import pulumi_aws as aws
-from .vpc_base import VpcBase
+from typing import Dict, List, Optional
 from .subnets import SubnetGroup
 from .nat_gateway import NatGatewayGroup
-from config.defaults import ENVIRONMENT_DEFAULTS, get_environment_from_stack
+from .endpoints import VpcEndpointGroup
+from .flow_logs import FlowLogGroup
+from .netbench import NetBenchGroup
+from .cidr_planner import SubnetPlan, TierSpec, cidrs_for_tier, find_overlaps, plan_subnets, plan_vpcs
+from .targets import VpcTarget, plan_targets, target_provider
+from .pool import build_pool, build_shell, claimed_shell, karpenter_discovery
+from common import pricing
+from common.invoke_cache import cached_invoke
+from config.defaults import ENVIRONMENT_DEFAULTS, POOL_ENV, ephemeral_block
+from config.resolver import ResolvedConfig, load_config
 
 def run(env: str):
-    """Main VPC stack that orchestrates all VPC components"""
-    
-    # Get configuration using Pulumi's config system
-    config = pulumi.Config()
-    stack = pulumi.get_stack()
-    
-    # Get environment defaults
-    env_defaults = ENVIRONMENT_DEFAULTS.get(env, {})
-    
-    # Helper function to get config with environment defaults
-    def get_config(key: str, default=None):
-        """Get config value with fallback to environment defaults"""
-        value = config.get(key)
-        if value is None:
-            # Remove namespace prefix for lookup in defaults
-            default_key = key.replace("vpc:", "vpc:")
-            value = env_defaults.get(default_key, default)
-        return value
-    
-    def get_config_bool(key: str, default=False):
-        """Get boolean config value with fallback to environment defaults"""
-        value = config.get_bool(key)
-        if value is None:
-            default_key = key.replace("vpc:", "vpc:")
-            default_value = env_defaults.get(default_key, str(default)).lower()
-            value = default_value == "true"
-        return value
-    
-    def get_config_int(key: str, default=0):
-        """Get integer config value with fallback to environment defaults"""
-        value = config.get_int(key)
-        if value is None:
-            default_key = key.replace("vpc:", "vpc:")
-            value = int(env_defaults.get(default_key, str(default)))
-        return value
+    """Main VPC stack: one VPC per vpc:targets region/account (default: aws:region only)"""
+    
+    # Typed config merged from envs/*.yaml, code defaults and stack config
+    cfg = load_config(env)
     
     # VPC configuration with defaults
-    vpc_name = get_config("vpc:name") or f"{env}-vpc"
-    vpc_cidr = get_config("vpc:cidr_block", "10.0.0.0/16")
+    vpc_name = cfg["vpc:name"] or f"{env}-vpc"
+    if not vpc_name.startswith(f"{env}-"):
+        # The deploy role scopes buckets, Glue databases and roles by this prefix (modules/iam/policy_compiler.py)
+        raise ValueError(f"vpc:name '{vpc_name}' must start with '{env}-'")
+    vpc_cidr = cfg["vpc:cidr_block"]
     
     # Subnet configuration
-    subnet_count = get_config_int("vpc:subnet_count", 2)
+    subnet_count = cfg["vpc:subnet_count"]
     
-    # NAT Gateway configuration (IMPORTANT: These are paid resources!)
-    nat_strategy = get_config("vpc:nat_strategy", "none")  # none, single, multi-az
+    # Secondary CIDR blocks; the first one holds a pod subnet per AZ (VPC CNI custom networking)
+    secondary_cidrs = list(cfg["vpc:secondary_cidr_blocks"])
+    
+    # Warm pool of VPC shells that PR environments claim (see modules/vpc/pool.py)
+    if env == POOL_ENV:
+        available_azs = cached_invoke(aws.get_availability_zones, state="available").names
+        pulumi.export("shells", build_pool(env, cfg, list(available_azs[:subnet_count])))
+        pulumi.export("environment", env)
+        return
+    
+    # PR environments: the slot claimed through common/ephemeral.py decides the block
+    pool_slot = cfg["vpc:pool_slot"]
+    cidr_source = cfg.source("vpc:cidr_block")
+    if pool_slot is not None:
+        if cfg["vpc:targets"]:
+            raise ValueError("vpc:pool_slot environments are single-region; unset vpc:targets")
+        vpc_cidr = ephemeral_block(pool_slot)
+        cidr_source = f"vpc:pool_slot {pool_slot}"
+    if cfg["vpc:pool_stack"] and (pool_slot is None or secondary_cidrs):
+        raise ValueError("vpc:pool_stack needs vpc:pool_slot, and pool shells have no vpc:secondary_cidr_blocks")
     
     # Log configuration source
     pulumi.log.info(f"Loading configuration for environment: {env}")
-    pulumi.log.info(f"VPC CIDR: {vpc_cidr} (from {'config' if config.get('vpc:cidr_block') else 'defaults'})")
-    pulumi.log.info(f"NAT Strategy: {nat_strategy} (from {'config' if config.get('vpc:nat_strategy') else 'defaults'})")
-    
-    # Determine CIDR prefix based on environment
-    cidr_prefix_map = {
-        "dev": "10.10",
-        "staging": "10.20", 
-        "prod": "10.30"
-    }
-    base_cidr_prefix = cidr_prefix_map.get(env, "10.0")
-    
-    # 1. Create base VPC (free resources only)
-    vpc_base = VpcBase(vpc_name, {
-        "cidr_block": vpc_cidr,
-        "environment": env,
-        "enable_dns_support": get_config_bool("vpc:enable_dns_support", True),
-        "enable_dns_hostnames": get_config_bool("vpc:enable_dns_hostnames", True)
-    })
-    
-    # 2. Create public subnets
-    public_subnets = SubnetGroup(f"{vpc_name}-public", 
-        vpc_base.vpc.id,
-        {
-            "type": "public",
-            "count": subnet_count,
-            "environment": env,
-            "base_cidr_prefix": base_cidr_prefix,
-            "cidr_offset": 0  # Start at .0.0/24, .1.0/24, etc.
-        })
-    
-    # Associate public subnets with public route table
-    for i, subnet_id in enumerate(public_subnets.subnets):
-        aws.ec2.RouteTableAssociation(f"{vpc_name}-public-rta-{i+1}",
-            subnet_id=subnet_id.id,
-            route_table_id=vpc_base.public_route_table.id)
-    
-    # 3. Create private subnets
-    private_subnets = SubnetGroup(f"{vpc_name}-private",
-        vpc_base.vpc.id,
-        {
-            "type": "private", 
-            "count": subnet_count,
-            "environment": env,
-            "base_cidr_prefix": base_cidr_prefix,
-            "cidr_offset": 100  # Start at .100.0/24, .101.0/24, etc.
-        })
+    pulumi.log.info(f"VPC CIDR: {vpc_cidr} (from {cidr_source})")
+    pulumi.log.info(f"NAT Strategy: {cfg['vpc:nat_strategy']} (from {cfg.source('vpc:nat_strategy')})")
+    
+    # Refuse VPC blocks that overlap another environment's VPC
+    env_cidrs = {name: defaults["vpc:cidr_block"] for name, defaults in ENVIRONMENT_DEFAULTS.items()
+                 if name != env and "vpc:cidr_block" in defaults}
+    env_cidrs[env] = vpc_cidr
+    overlaps = [pair for pair in find_overlaps(env_cidrs) if env in pair]
+    if overlaps:
+        raise ValueError(f"VPC CIDR {vpc_cidr} for '{env}' overlaps other environments: {overlaps}")
+    del env_cidrs[env]
+    
+    # One VPC per region/account target; extra regions get the next free blocks after vpc_cidr
+    targets = plan_targets(vpc_name, vpc_cidr, cfg["aws:region"], cfg["vpc:targets"], reserved=env_cidrs)
+    
+    # Secondary blocks must not overlap the primary block or each other
+    for target in targets:
+        block_overlaps = find_overlaps({cidr: cidr for cidr in [target.cidr_block] + secondary_cidrs})
+        if block_overlaps or len(set(secondary_cidrs)) != len(secondary_cidrs) or target.cidr_block in secondary_cidrs:
+            raise ValueError(f"vpc:secondary_cidr_blocks {secondary_cidrs} overlap each other or {target.cidr_block}")
+    
+    # Explicit provider per extra region/account, and the AZ map of each target:
+    # subnet i of every tier and its NAT route table live in availability_zones[i]
+    providers: Dict[str, Optional[aws.Provider]] = {}
+    zones: Dict[str, List[str]] = {}
+    for target in targets:
+        provider = None
+        if not target.uses_default_provider(cfg["aws:region"]):
+            provider = target_provider(env, target, cfg["aws:profile"])
+        providers[target.key] = provider
+    
+        available_azs = cached_invoke(aws.get_availability_zones, state="available", region=target.region,
+                                      opts=pulumi.InvokeOptions(provider=provider) if provider else None).names
+        if subnet_count > len(available_azs):
+            pulumi.log.warn(f"vpc:subnet_count is {subnet_count} but only {len(available_azs)} AZs are " +
+                            f"available in {target.region} - creating {len(available_azs)} subnets per tier")
+        zones[target.key] = list(available_azs[:subnet_count])
+    
+    # Carve public/private subnets out of every VPC block at once, one per AZ per tier
+    subnet_plans = plan_vpcs({target.key: (target.cidr_block, [
+        TierSpec("public", cfg["vpc:public_subnet_prefix"]),
+        TierSpec("private", cfg["vpc:private_subnet_prefix"], cfg["vpc:private_subnet_offset"]),
+    ], len(zones[target.key])) for target in targets})
+    for target in targets:
+        if secondary_cidrs:
+            subnet_plans[target.key] += plan_subnets(secondary_cidrs[0],
+                                                     [TierSpec("pods", cfg["vpc:pod_subnet_prefix"])],
+                                                     len(zones[target.key]))
+        for plan in subnet_plans[target.key]:
+            pulumi.log.debug(f"Planned {target.key} {plan.tier} subnet {plan.az_index + 1}: {plan.cidr}")
+    
+    # A claimed pool shell stands in for the VPC and subnets (nothing base is created)
+    shell = None
+    if cfg["vpc:pool_stack"]:
+        pulumi.log.info(f"Claiming VPC shell {pool_slot} from {cfg['vpc:pool_stack']}")
+        shell = claimed_shell(cfg["vpc:pool_stack"], pool_slot, zones[targets[0].key])
+    
+    # Register every target's VPC; the engine creates the regions' resources concurrently
+    outputs = {}
+    for target in targets:
+        # Items of other regions are priced with that region's prices
+        with pricing.in_region(None if target.region == cfg["aws:region"] else target.region):
+            outputs[target.key] = build_vpc(env, cfg, target, providers[target.key], zones[target.key],
+                                            subnet_plans[target.key], shell if target.primary else None)
+    
+    # Export outputs: the primary target unkeyed (the eks stack reads these), every target by region.
+    # nat_schedule_targets covers every region (scripts/nat_schedule.sh), so it is not the primary's alone.
+    multi_region_schedule = bool(cfg["vpc:targets"] and cfg["vpc:nat_scheduled"])
+    for name, value in outputs[targets[0].key].items():
+        if not (multi_region_schedule and name == "nat_schedule_targets"):
+            pulumi.export(name, value)
+    if cfg["vpc:targets"]:
+        pulumi.export("regions", outputs)
+        if multi_region_schedule:
+            pulumi.export("nat_schedule_targets", [urn for region_outputs in outputs.values()
+                                                   for urn in region_outputs.get("nat_schedule_targets", [])])
+    
+    # Export configuration info
+    pulumi.export("nat_strategy", cfg["vpc:nat_strategy"])
+    pulumi.export("environment", env)
+    discovery = karpenter_discovery(env, cfg)
+    if discovery and not shell:  # a claimed pool shell's subnets carry the pool's tags
+        pulumi.export("karpenter_discovery", discovery)
+
+
+def build_vpc(env: str, cfg: ResolvedConfig, target: VpcTarget, provider: Optional[aws.Provider],
+              availability_zones: List[str], subnet_plan: List[SubnetPlan], shell: Optional[tuple] = None) -> dict:
+    """VPC, subnets, NAT, endpoints and flow logs for one target; returns its outputs.
+
+    `shell` (see pool.claimed_shell) replaces the VPC and subnets with a warm pool shell.
+    """
+    
+    vpc_name = target.name
+    vpc_cidr = target.cidr_block
+    region = target.region
+    secondary_cidrs = list(cfg["vpc:secondary_cidr_blocks"])
+    
+    def on_target(**kwargs) -> pulumi.ResourceOptions:
+        return pulumi.ResourceOptions(provider=provider, **kwargs)
+    
+    # NAT Gateway configuration (IMPORTANT: These are paid resources!)
+    nat_strategy = cfg["vpc:nat_strategy"]  # none, single, zonal-pairs, multi-az, instance
+    nat_count = cfg["vpc:nat_count"] or None  # zonal-pairs only; default one per two AZs
+    nat_instance_type = cfg["vpc:nat_instance_type"]  # instance strategy only
+    nat_scheduled = cfg["vpc:nat_scheduled"]  # off-hours teardown keeps EIPs, see scripts/nat_schedule.sh
+    nat_active = cfg["vpc:nat_active"] or not nat_scheduled
+    
+    # VPC endpoints (gateway endpoints are free, interface endpoints are paid)
+    enable_vpc_endpoints = cfg["vpc:enable_vpc_endpoints"]
+    interface_services = list(cfg["vpc:interface_endpoints"])
+    
+    # VPC flow logs (Parquet to S3, billed per GB ingested)
+    enable_flow_logs = cfg["vpc:enable_flow_logs"]
+    
+    # 1-3. Base VPC, public and private subnets (free resources only): claimed from the warm pool or created
+    if shell:
+        vpc_base, public_subnets, private_subnets = shell
+    else:
+        vpc_base, public_subnets, private_subnets = build_shell(vpc_name, env, cfg, vpc_cidr, availability_zones,
+                                                                subnet_plan, on_target)
+    
+    # 3b. Pod subnets in the first secondary block (created once the block is associated)
+    pod_subnets = None
+    if secondary_cidrs:
+        pod_subnets = SubnetGroup(f"{vpc_name}-pods",
+            vpc_base.secondary_cidrs[0].vpc_id,
+            {
+                "type": "pods",
+                "environment": env,
+                "availability_zones": availability_zones,
+                "cidr_blocks": cidrs_for_tier(subnet_plan, "pods")
+            }, opts=on_target())
     
     # 4. Conditionally create NAT Gateways (PAID RESOURCES)
     nat_group = None
     if nat_strategy != "none":
-        pulumi.log.warn(f"Creating NAT Gateways with strategy '{nat_strategy}' - these are PAID resources!")
-        
+        pulumi.log.warn(f"Creating NAT Gateways with strategy '{nat_strategy}' in {region} - these are PAID resources!")
+    
         nat_group = NatGatewayGroup(vpc_name,
             [s.id for s in public_subnets.subnets],
             vpc_base.vpc.id,
             {
                 "strategy": nat_strategy,
                 "environment": env,
-                "private_subnet_count": subnet_count
-            })
-        
-        # Associate private subnets with NAT route tables
-        for i, subnet in enumerate(private_subnets.subnets):
-            if i < len(nat_group.private_route_tables):
-                aws.ec2.RouteTableAssociation(f"{vpc_name}-private-rta-{i+1}",
-                    subnet_id=subnet.id,
-                    route_table_id=nat_group.private_route_tables[i].id)
+                "availability_zones": availability_zones,
+                "nat_count": nat_count,
+                "instance_type": nat_instance_type,
+                "vpc_cidr": vpc_cidr,
+                "region": region,
+                "scheduled": nat_scheduled,
+                "active": nat_active
+            }, opts=on_target())
+    
+        # Associate each private subnet with the route table of its own AZ
+        for i, az in enumerate(availability_zones):
+            aws.ec2.RouteTableAssociation(f"{vpc_name}-private-rta-{i+1}",
+                subnet_id=private_subnets.subnets_by_az[az].id,
+                route_table_id=nat_group.route_tables_by_az[az].id,
+                opts=on_target())
+            if pod_subnets:
+                aws.ec2.RouteTableAssociation(f"{vpc_name}-pods-rta-{i+1}",
+                    subnet_id=pod_subnets.subnets_by_az[az].id,
+                    route_table_id=nat_group.route_tables_by_az[az].id,
+                    opts=on_target())
     else:
         pulumi.log.info("NAT Gateway strategy is 'none' - private subnets will have no internet access")
         pulumi.log.info("To enable NAT, set vpc:nat_strategy to 'single' (dev) or 'multi-az' (prod)")
     
-    # Export outputs
-    pulumi.export("vpc_id", vpc_base.vpc.id)
-    pulumi.export("vpc_cidr", vpc_base.vpc.cidr_block)
-    pulumi.export("internet_gateway_id", vpc_base.igw.id)
-    pulumi.export("public_subnet_ids", [s.id for s in public_subnets.subnets])
-    pulumi.export("private_subnet_ids", [s.id for s in private_subnets.subnets])
+    # 5. Optionally create VPC endpoints so AWS service traffic skips the NAT hop
+    endpoint_group = None
+    if enable_vpc_endpoints:
+        if nat_group:
+            private_route_tables = nat_group.private_route_tables
+        else:
+            # Without NAT, private subnets still need a route table for gateway endpoints (free)
+            private_rt = aws.ec2.RouteTable(f"{vpc_name}-private-rt",
+                vpc_id=vpc_base.vpc.id,
+                tags={"Name": f"{vpc_name}-private-rt"},
+                opts=on_target())
+            for i, subnet in enumerate(private_subnets.subnets):
+                aws.ec2.RouteTableAssociation(f"{vpc_name}-private-rta-{i+1}",
+                    subnet_id=subnet.id,
+                    route_table_id=private_rt.id,
+                    opts=on_target())
+            for i, subnet in enumerate(pod_subnets.subnets if pod_subnets else []):
+                aws.ec2.RouteTableAssociation(f"{vpc_name}-pods-rta-{i+1}",
+                    subnet_id=subnet.id,
+                    route_table_id=private_rt.id,
+                    opts=on_target())
+            private_route_tables = [private_rt]
+    
+        endpoint_group = VpcEndpointGroup(vpc_name,
+            vpc_base.vpc.id,
+            [vpc_base.public_route_table.id] + [rt.id for rt in private_route_tables],
+            [s.id for s in private_subnets.subnets],
+            {
+                "region": region,
+                "environment": env,
+                "vpc_cidr": vpc_cidr,
+                "interface_services": interface_services
+            }, opts=on_target())
+    
+    # 6. Optionally deliver flow logs to S3 for the DNS ETL
+    flow_log_group = None
+    if enable_flow_logs:
+        flow_log_group = FlowLogGroup(vpc_name,
+            vpc_base.vpc.id,
+            [s.id for s in public_subnets.subnets] + [s.id for s in private_subnets.subnets] +
+            [s.id for s in (pod_subnets.subnets if pod_subnets else [])],
+            {
+                "region": region,
+                "environment": env,
+                "scope": cfg["vpc:flow_logs_scope"],
+                "traffic_type": cfg["vpc:flow_logs_traffic_type"],
+                "aggregation_interval": cfg["vpc:flow_logs_aggregation_interval"],
+                "record_format": cfg["vpc:flow_logs_format"],
+                "eni_ids": list(cfg["vpc:flow_logs_eni_ids"]),
+                "retention_days": cfg["vpc:flow_logs_retention_days"]
+            }, opts=on_target())
+    
+    # 7. Optionally measure the same-AZ, cross-AZ, NAT and endpoint paths (PAID instances)
+    netbench = None
+    if cfg["vpc:enable_netbench"]:
+        netbench = NetBenchGroup(vpc_name,
+            vpc_base.vpc.id,
+            [s.id for s in public_subnets.subnets],
+            [s.id for s in private_subnets.subnets],
+            {
+                "region": region,
+                "environment": env,
+                "vpc_cidr": vpc_cidr,
+                "availability_zones": availability_zones,
+                "instance_type": cfg["vpc:netbench_instance_type"],
+                "seconds": cfg["vpc:netbench_seconds"],
+                "internet_url": cfg["vpc:netbench_internet_url"],
+                "nat_strategy": nat_strategy,
+                "nat_placement": nat_group.placement if nat_group and nat_active else {},
+                "gateway_endpoints": enable_vpc_endpoints,
+                "interface_services": interface_services if enable_vpc_endpoints else []
+            }, opts=on_target())
+    
+    # 8. Data-transfer estimate from the expected GB/month per subnet tier
+    pricing.register(*pricing.estimate_data_transfer(vpc_name, {
+            "internet": cfg["cost:internet_gb"],
+            "s3_dynamodb": cfg["cost:s3_dynamodb_gb"],
+            "aws_api": cfg["cost:aws_api_gb"],
+            "cross_az": cfg["cost:cross_az_gb"]
+        },
+        nat_group.placement if nat_group and nat_active else {},
+        nat_processing=nat_strategy != "instance",
+        gateway_endpoints=enable_vpc_endpoints,
+        interface_endpoints=enable_vpc_endpoints and bool(interface_services)))
+    
+    # Outputs of this target
+    outputs = {
+        "vpc_id": vpc_base.vpc.id,
+        "vpc_cidr": vpc_base.vpc.cidr_block,
+        "internet_gateway_id": vpc_base.igw.id,
+        "public_subnet_ids": [s.id for s in public_subnets.subnets],
+        "private_subnet_ids": [s.id for s in private_subnets.subnets],
+        "pod_subnet_ids": [s.id for s in pod_subnets.subnets] if pod_subnets else [],
+        "secondary_cidr_blocks": secondary_cidrs,
+    }
     
     if nat_group:
-        pulumi.export("nat_gateway_ids", nat_group.nat_gateway_ids)
-        pulumi.export("nat_gateway_monthly_cost_estimate", nat_group.estimated_monthly_cost)
+        outputs["nat_gateway_ids"] = nat_group.nat_gateway_ids
+        outputs["nat_gateway_monthly_cost_estimate"] = nat_group.estimated_monthly_cost
+        outputs["nat_placement"] = nat_group.placement
+        if nat_scheduled:
+            outputs["nat_active"] = nat_active
+            outputs["nat_schedule_targets"] = nat_group.schedule_targets
     else:
-        pulumi.export("nat_gateway_ids", [])
-        pulumi.export("nat_gateway_monthly_cost_estimate", 0)
+        outputs["nat_gateway_ids"] = []
+        outputs["nat_gateway_monthly_cost_estimate"] = 0
+        outputs["nat_placement"] = {}
+    outputs["availability_zones"] = availability_zones
     
-    # Export configuration info
-    pulumi.export("nat_strategy", nat_strategy)
-    pulumi.export("environment", env)
+    if endpoint_group:
+        outputs["gateway_endpoint_ids"] = [e.id for e in endpoint_group.gateway_endpoints]
+        outputs["interface_endpoint_ids"] = [e.id for e in endpoint_group.interface_endpoints]
+    
+    if flow_log_group:
+        outputs["flow_logs_bucket"] = flow_log_group.bucket.bucket
+        outputs["flow_logs_glue_table"] = pulumi.Output.concat(
+            flow_log_group.database.name, ".", flow_log_group.table.name)
+    
+    if netbench:
+        outputs["netbench_results"] = netbench.results_uri
+    
+    outputs["region"] = region
+    if target.account_id:
+        outputs["account_id"] = target.account_id
+    return outputs
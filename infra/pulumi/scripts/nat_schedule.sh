@@ -0,0 +1,73 @@
+#!/bin/bash
+# scripts/nat_schedule.sh
+# Stop or start the NAT of a scheduled <env>-vpc stack (vpc:nat_scheduled=true)
+# Only the NAT Gateways and their routes (or NAT instance ASGs) are updated;
+# EIPs stay allocated, so egress IPs are the same after every restore.
+
+set -euo pipefail
+
+if [ $# -lt 2 ]; then
+    echo "Usage: $0 <env> <stop|start|status>"
+    echo "Example: $0 staging stop   # Remove NAT Gateways + routes for the night"
+    echo "Example: $0 staging start  # Re-create them on the same EIPs"
+    exit 1
+fi
+
+ENV=$1
+ACTION=$2
+STACK_NAME="${ENV}-vpc"
+
+case "$ACTION" in
+    stop) ACTIVE=false ;;
+    start) ACTIVE=true ;;
+    status) ACTIVE="" ;;
+    *) echo "Error: unknown action '$ACTION' (expected stop, start or status)"; exit 1 ;;
+esac
+
+# Get script directory
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+PROJECT_ROOT="$SCRIPT_DIR/.."
+
+# Change to Pulumi project directory
+cd "$PROJECT_ROOT"
+
+pulumi stack select "$STACK_NAME"
+
+# URNs of the NAT resources, exported by stacks deployed in scheduled mode
+if ! TARGETS_JSON=$(pulumi stack output nat_schedule_targets --json 2>/dev/null) || [ "$TARGETS_JSON" == "null" ]; then
+    echo "Error: $STACK_NAME exports no nat_schedule_targets"
+    echo "Enable scheduled mode and deploy once:"
+    echo "  pulumi config set vpc:nat_scheduled true && ./scripts/run_stack.sh $ENV vpc"
+    exit 1
+fi
+
+if [ "$ACTION" == "status" ]; then
+    # Read the deployed state: targeted updates leave the nat_active output alone and CI jobs
+    # do not keep vpc:nat_active, so neither says whether the NAT is up. NAT Gateways exist only
+    # while active; NAT instance ASGs stay, scaled to zero when stopped.
+    echo "NAT active: $(pulumi stack export | python -c '
+import json, sys
+nat = [r for r in json.load(sys.stdin)["deployment"].get("resources") or []
+       if r["type"] in ("aws:ec2/natGateway:NatGateway", "aws:autoscaling/group:Group")]
+up = [r["type"] == "aws:ec2/natGateway:NatGateway" or r.get("outputs", {}).get("desiredCapacity", 0) > 0
+      for r in nat]
+print("true" if up and all(up) else "partial" if any(up) else "false")')"
+    echo "Schedule targets:"
+    echo "$TARGETS_JSON" | python -c 'import json, sys; print("\n".join("  " + u for u in json.load(sys.stdin)))'
+    exit 0
+fi
+
+TARGET_ARGS=()
+while read -r urn; do
+    TARGET_ARGS+=(--target "$urn")
+done < <(echo "$TARGETS_JSON" | python -c 'import json, sys; print("\n".join(json.load(sys.stdin)))')
+
+echo "========================================="
+echo "NAT $ACTION for stack: $STACK_NAME ($(( ${#TARGET_ARGS[@]} / 2 )) targeted resources)"
+echo "========================================="
+
+pulumi config set vpc:nat_active "$ACTIVE"
+pulumi up --yes --skip-preview "${TARGET_ARGS[@]}"
+
+echo ""
+echo "NAT for $STACK_NAME is now $([ "$ACTIVE" == "true" ] && echo "active" || echo "stopped (EIPs retained)")"
@@ -51,15 +51,24 @@ echo ""
 echo "Current configuration:"
 pulumi config
 
-# Cost warning for NAT Gateways
+# Cost warning for NAT (prices from config/prices.yaml via common/pricing.py)
 if [ "$COMPONENT" == "vpc" ]; then
-    NAT_STRATEGY=$(pulumi config get vpc:nat_strategy 2>/dev/null || echo "none")
+    NAT_STRATEGY=$(pulumi config get vpc:nat_strategy 2>/dev/null || python -m config.resolver "$ENV" vpc:nat_strategy)
     if [ "$NAT_STRATEGY" != "none" ]; then
+        PRICING_ARGS=(--env "$ENV" --strategy "$NAT_STRATEGY")
+        for option in "vpc:subnet_count --azs" "vpc:nat_count --nat-count" \
+                      "vpc:nat_instance_type --instance-type" "aws:region --region"; do
+            read -r key flag <<< "$option"
+            if value=$(pulumi config get "$key" 2>/dev/null); then
+                PRICING_ARGS+=("$flag" "$value")
+            fi
+        done
         echo ""
-        echo "⚠️  WARNING: NAT Gateway strategy is set to '$NAT_STRATEGY'"
+        echo "⚠️  WARNING: NAT strategy is set to '$NAT_STRATEGY'"
         echo "This will create billable AWS resources:"
-        echo "  - NAT Gateway: ~\$45/month per gateway"
-        echo "  - Elastic IP: ~\$3.65/month per IP"
+        python -m common.pricing nat "${PRICING_ARGS[@]}"
+        echo "The preview exports the full estimate (incl. data transfer) as 'cost_breakdown'"
+        echo "and fails if it exceeds cost:monthly_budget."
         echo ""
         if [ -z "$AUTO_APPROVE" ]; then
             read -p "Do you want to continue? (y/N) " -n 1 -r
@@ -72,10 +81,33 @@ if [ "$COMPONENT" == "vpc" ]; then
     fi
 fi
 
-# Run Pulumi update
+# Run Pulumi update, keeping its engine events for the deploy history
+EVENT_LOG=$(mktemp)
+OUTPUTS=$(mktemp)
+trap 'rm -f "$EVENT_LOG" "$OUTPUTS"' EXIT
+
 echo ""
 echo "Starting deployment..."
-pulumi up $AUTO_APPROVE
+UP_STATUS=0
+START=$SECONDS
+pulumi up $AUTO_APPROVE --event-log "$EVENT_LOG" || UP_STATUS=$?
+WALL_TIME=$((SECONDS - START))
+
+# Record timings, change counts and the cost estimate (report: python -m common.deploy_metrics report)
+STATUS=succeeded
+if [ "$UP_STATUS" -eq 0 ]; then
+    pulumi stack output --json > "$OUTPUTS" 2>/dev/null || true
+else
+    STATUS=failed  # outputs are still the previous deploy's; record no cost
+fi
+python -m common.deploy_metrics record --stack "$STACK_NAME" --event-log "$EVENT_LOG" \
+    --outputs "$OUTPUTS" --status "$STATUS" --wall-time "$WALL_TIME" \
+    || echo "Warning: deploy metrics were not recorded"
+
+if [ "$UP_STATUS" -ne 0 ]; then
+    echo "Deployment failed"
+    exit "$UP_STATUS"
+fi
 
 # Show outputs
 echo ""
@@ -0,0 +1,139 @@
+"""
+Shared fixtures: run stack programs offline against pulumi.runtime mocks.
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+import pulumi
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from common import invoke_cache, pricing, stack_refs  # noqa: E402
+from config import resolver  # noqa: E402
+from modules.oidc import thumbprint  # noqa: E402
+
+AZ_NAMES = ["us-east-1a", "us-east-1b", "us-east-1c", "us-east-1d"]
+
+
+class RecordingMocks(pulumi.runtime.Mocks):
+    """Mocks that echo inputs back as outputs and record every registration/invoke"""
+
+    def __init__(self, stack_outputs: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.resources: List[pulumi.runtime.MockResourceArgs] = []
+        self.calls: List[pulumi.runtime.MockCallArgs] = []
+        self.stack_outputs = stack_outputs or {}
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        self.resources.append(args)
+        outputs = dict(args.inputs)
+        if args.typ == "pulumi:pulumi:StackReference":
+            outputs["outputs"] = self.stack_outputs.get(args.inputs.get("name", args.name), {})
+        if args.typ == "aws:s3/bucketV2:BucketV2":
+            outputs.setdefault("bucket", f"{args.name}-mock")
+        if args.typ == "aws:ec2/instance:Instance":
+            outputs.setdefault("privateIp", f"10.0.0.{len(self.resources)}")
+        outputs.setdefault("arn", f"arn:aws:mock:::{args.name}")
+        return [f"{args.name}_id", outputs]
+
+    def call(self, args: pulumi.runtime.MockCallArgs):
+        self.calls.append(args)
+        if args.token == "aws:index/getAvailabilityZones:getAvailabilityZones":
+            return {"names": AZ_NAMES[:3], "zoneIds": ["use1-az1", "use1-az2", "use1-az4"], "id": "us-east-1"}
+        if args.token == "aws:ec2/getAmi:getAmi":
+            return {"id": "ami-0fcknat", "architecture": args.args["filters"][1]["values"][0]}
+        if args.token == "aws:index/getCallerIdentity:getCallerIdentity":
+            return {"accountId": "123456789012", "arn": "arn:aws:iam::123456789012:user/ci",
+                    "userId": "AIDAMOCK", "id": "123456789012"}
+        if args.token == "aws:iam/getPolicyDocument:getPolicyDocument":
+            return {"json": '{"Version": "2012-10-17", "Statement": []}', "id": "policy"}
+        return {}
+
+
+@dataclass
+class ProgramRun:
+    """Everything a mocked program run registered"""
+    mocks: RecordingMocks
+    exports: Dict[str, Any] = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    @property
+    def resources(self) -> List[pulumi.runtime.MockResourceArgs]:
+        return self.mocks.resources
+
+    def of_type(self, typ: str) -> List[pulumi.runtime.MockResourceArgs]:
+        return [r for r in self.resources if r.typ == typ]
+
+    def named(self, name: str) -> pulumi.runtime.MockResourceArgs:
+        return next(r for r in self.resources if r.name == name)
+
+    def calls_to(self, token: str) -> int:
+        return sum(1 for c in self.mocks.calls if c.token == token)
+
+
+def run_program(stack: str, config: Optional[Dict[str, str]] = None,
+                stack_outputs: Optional[Dict[str, Dict[str, Any]]] = None,
+                entrypoint: Optional[Callable[[], Any]] = None) -> ProgramRun:
+    """Run the program for `stack` (e.g. 'dev-vpc') through dispatch_stack with mocks.
+
+    `entrypoint` replaces dispatch_stack, to exercise components on their own.
+    """
+    from common.stack_utils import dispatch_stack
+
+    invoke_cache.clear()
+    resolver.clear()
+    pricing.clear()
+    stack_refs.clear()
+    thumbprint.clear()
+    mocks = RecordingMocks(stack_outputs)
+    pulumi.runtime.set_mocks(mocks, project="multi-env-infra", stack=stack, preview=False)
+    pulumi.runtime.get_root_resource()._transformations = None  # the root stack outlives runs; drop their tag policies
+    pulumi.runtime.set_all_config(config or {})
+    run = ProgramRun(mocks)
+    pending, exported = [], set()
+
+    def export(name, value):
+        if name in exported:  # pulumi keeps the last value without a word
+            raise ValueError(f"Output '{name}' exported twice")
+        exported.add(name)
+        pending.append(pulumi.Output.from_input(value).apply(
+            lambda v, name=name: run.exports.__setitem__(name, v)))
+
+    @pulumi.runtime.test
+    def program():
+        (entrypoint or dispatch_stack)()
+        return pulumi.Output.all(*pending)
+
+    with mock.patch("pulumi.export", export):
+        start = time.perf_counter()
+        program()
+        run.wall_time = time.perf_counter() - start
+    return run
+
+
+@pytest.fixture
+def run_stack():
+    return run_program
+
+
+@pytest.fixture(autouse=True)
+def policy_cache_dir(tmp_path, monkeypatch):
+    """Keep compiled IAM policies out of the project's .cache/ during tests"""
+    cache_dir = tmp_path / "policies"
+    monkeypatch.setenv("PULUMI_POLICY_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def oidc_cache_dir(tmp_path, monkeypatch):
+    """Keep cached OIDC certificate chains out of the project's .cache/ during tests"""
+    cache_dir = tmp_path / "oidc"
+    monkeypatch.setenv("PULUMI_OIDC_CACHE_DIR", str(cache_dir))
+    thumbprint.clear()
+    return cache_dir
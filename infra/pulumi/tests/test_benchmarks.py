@@ -0,0 +1,42 @@
+"""
+Program execution time and resource-registration budgets per stack.
+
+Registration counts are exact: a change that adds or drops resources has to
+update the table on purpose. Time budgets are generous ceilings for the mocked
+program (no network), meant to catch order-of-magnitude regressions such as
+repeated blocking invokes. Set BENCH_OUTPUT=<file> to append measurements as
+JSON lines for trend tracking in CI.
+"""
+
+import json
+import os
+import statistics
+
+import pytest
+
+ROUNDS = 5
+
+# stack -> (resource registrations, median wall-time budget in seconds)
+BUDGETS = {
+    "dev-vpc": (13, 1.0),
+    "staging-vpc": (34, 1.0),
+    "prod-vpc": (57, 1.0),
+    "dev-iam": (3, 1.0),
+}
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("stack", sorted(BUDGETS))
+def test_stack_budget(run_stack, stack):
+    expected_registrations, time_budget = BUDGETS[stack]
+    runs = [run_stack(stack) for _ in range(ROUNDS)]
+    median = statistics.median(run.wall_time for run in runs)
+    registrations = len(runs[-1].resources)
+
+    if os.environ.get("BENCH_OUTPUT"):
+        with open(os.environ["BENCH_OUTPUT"], "a") as f:
+            f.write(json.dumps({"stack": stack, "median_seconds": round(median, 4),
+                                "registrations": registrations}) + "\n")
+
+    assert registrations == expected_registrations
+    assert median < time_budget, f"{stack} took {median:.3f}s (budget {time_budget}s)"
@@ -0,0 +1,44 @@
+import pytest
+
+from modules.vpc.cidr_planner import TierSpec, cidrs_for_tier, find_overlaps, plan_subnets, plan_vpcs
+
+
+def test_pinned_tier_keeps_legacy_layout():
+    plans = plan_subnets("10.50.0.0/16", [TierSpec("public", 24), TierSpec("private", 24, 100)], 3)
+
+    assert cidrs_for_tier(plans, "public") == ["10.50.0.0/24", "10.50.1.0/24", "10.50.2.0/24"]
+    assert cidrs_for_tier(plans, "private") == ["10.50.100.0/24", "10.50.101.0/24", "10.50.102.0/24"]
+
+
+def test_variable_sizes_are_packed_without_overlap():
+    plans = plan_subnets("10.30.0.0/16", [TierSpec("public", 24), TierSpec("pods", 19)], 3)
+
+    assert cidrs_for_tier(plans, "pods") == ["10.30.0.0/19", "10.30.32.0/19", "10.30.64.0/19"]
+    assert cidrs_for_tier(plans, "public") == ["10.30.96.0/24", "10.30.97.0/24", "10.30.98.0/24"]
+    assert not find_overlaps({f"{p.tier}{p.az_index}": p.cidr for p in plans})
+
+
+def test_plan_that_does_not_fit_raises():
+    with pytest.raises(ValueError):
+        plan_subnets("10.0.0.0/20", [TierSpec("pods", 19)], 1)
+    with pytest.raises(ValueError):
+        plan_subnets("10.0.0.0/20", [TierSpec("private", 24, 100)], 1)
+
+
+def test_find_overlaps():
+    overlaps = find_overlaps({"a": "10.0.0.0/16", "b": "10.0.5.0/24", "c": "10.1.0.0/16"})
+
+    assert overlaps == [("a", "b")]
+
+
+def test_plan_vpcs_rejects_overlapping_vpcs():
+    tiers = [TierSpec("public", 24)]
+    with pytest.raises(ValueError):
+        plan_vpcs({"a": ("10.0.0.0/16", tiers, 2), "b": ("10.0.128.0/17", tiers, 2)})
+
+
+def test_plan_vpcs_at_scale():
+    tiers = [TierSpec("public", 24), TierSpec("private", 20), TierSpec("pods", 19)]
+    plans = plan_vpcs({f"vpc{i}": (f"10.{i}.0.0/16", tiers, 3) for i in range(200)})
+
+    assert sum(len(p) for p in plans.values()) == 1800
@@ -0,0 +1,78 @@
+import dataclasses
+
+import pytest
+
+from config.resolver import ConfigError, _flatten, load_config, resolve
+
+
+def test_layers_override_in_order():
+    cfg = resolve("dev", [
+        ("envs/_shared.yaml", {"vpc:cidr_block": "10.0.0.0/16", "aws:region": "us-west-2"}),
+        ("envs/dev.yaml", {"vpc:cidr_block": "10.1.0.0/16", "vpc:name": "from-yaml"}),
+        ("config/defaults.py", {"vpc:cidr_block": "10.10.0.0/16"}),
+        ("stack config", {"vpc:subnet_count": "3"}),
+    ])
+
+    assert cfg["vpc:cidr_block"] == "10.10.0.0/16"
+    assert cfg.source("vpc:cidr_block") == "config/defaults.py"
+    assert cfg["vpc:name"] == "from-yaml"
+    assert cfg["aws:region"] == "us-west-2"
+    assert cfg["vpc:subnet_count"] == 3
+    assert cfg.source("vpc:subnet_count") == "stack config"
+    assert cfg["vpc:nat_strategy"] == "none"
+    assert cfg.source("vpc:nat_strategy") == "schema"
+
+
+def test_values_are_typed():
+    cfg = resolve("dev", [("stack config", {
+        "vpc:enable_flow_logs": "TRUE",
+        "vpc:interface_endpoints": "ecr.api, sts",
+        "vpc:private_subnet_offset": "",
+    })])
+
+    assert cfg["vpc:enable_flow_logs"] is True
+    assert cfg["vpc:interface_endpoints"] == ("ecr.api", "sts")
+    assert cfg["vpc:private_subnet_offset"] is None
+
+
+def test_all_errors_reported_together():
+    with pytest.raises(ConfigError) as e:
+        resolve("dev", [("stack config", {
+            "vpc:subnet_count": "three",
+            "vpc:nat_strategy": "double",
+            "vpc:cidr_block": "10.0.0.1/16",
+            "vpc:subnet_cont": "2",
+        })])
+
+    message = str(e.value)
+    for key in ["vpc:subnet_count", "vpc:nat_strategy", "vpc:cidr_block", "vpc:subnet_cont: unknown key"]:
+        assert key in message
+
+
+def test_nested_and_flat_yaml_normalize_the_same():
+    nested = _flatten({"vpc": {"name": "dev-vpc", "subnet_count": 2}}, "envs/dev.yaml")
+    flat = _flatten({"vpc:name": "dev-vpc", "vpc:subnet_count": 2}, "envs/prod.yaml")
+
+    assert nested == flat == {"vpc:name": "dev-vpc", "vpc:subnet_count": 2}
+    with pytest.raises(ConfigError, match="no namespace"):
+        _flatten({"name": "dev-vpc"}, "envs/dev.yaml")
+
+
+def test_env_yaml_files_load_and_resolved_config_is_frozen():
+    load_config.cache_clear()
+    cfg = load_config("staging")
+
+    assert cfg["vpc:name"] == "staging-vpc"
+    assert cfg.source("vpc:name") == "envs/staging.yaml"
+    assert cfg["vpc:cidr_block"] == "10.20.0.0/16"
+    assert cfg.namespace("oidc")["cluster_name"] == "staging-eks-cluster"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cfg.env = "prod"
+    with pytest.raises(TypeError):
+        cfg.values["vpc:name"] = "other"
+    load_config.cache_clear()
+
+
+def test_invalid_stack_config_fails_the_program(run_stack):
+    with pytest.raises(Exception, match="vpc:subnet_count: expected an integer"):
+        run_stack("dev-vpc", config={"vpc:subnet_count": "three"})
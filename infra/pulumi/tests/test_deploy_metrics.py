@@ -0,0 +1,56 @@
+import json
+
+from common import deploy_metrics
+
+URN = "urn:pulumi:dev-vpc::multi-env-infra::{}::{}"
+NAT = URN.format("aws:ec2/natGateway:NatGateway", "dev-vpc-nat-1")
+EIP = URN.format("aws:ec2/eip:Eip", "dev-vpc-nat-eip-1")
+VPC = URN.format("aws:ec2/vpc:Vpc", "dev-vpc-vpc")
+
+
+def step(kind, urn, op, timestamp):
+    return {"timestamp": timestamp, kind: {"metadata": {"urn": urn, "type": urn.split("::")[2], "op": op}}}
+
+
+def event_log(path, nat_seconds, changes):
+    events = [
+        {"timestamp": 1000, "preludeEvent": {"config": {}}},
+        step("resourcePreEvent", VPC, "same", 1000), step("resOutputsEvent", VPC, "same", 1000),
+        step("resourcePreEvent", EIP, "create", 1001), step("resOutputsEvent", EIP, "create", 1002),
+        step("resourcePreEvent", NAT, "create", 1002), step("resOutputsEvent", NAT, "create", 1002 + nat_seconds),
+        {"timestamp": 1002 + nat_seconds, "summaryEvent": {"durationSeconds": nat_seconds + 3,
+                                                           "resourceChanges": changes}},
+    ]
+    path.write_text("\n".join(json.dumps(e) for e in events) + "\n{\"truncated")
+    return str(path)
+
+
+def cost(nat):
+    items = [{"component": "dev-vpc", "resource": "NAT Gateway", "monthly": nat},
+             {"component": "dev-vpc", "resource": "Elastic IP", "monthly": 3.65}]
+    return {"cost_breakdown": {"monthly_total": nat + 3.65, "items": items}}
+
+
+def test_steps_are_timed_and_same_steps_skipped(tmp_path):
+    events = deploy_metrics.read_event_log(event_log(tmp_path / "events.jsonl", 95, {"create": 2, "same": 1}))
+    metrics = deploy_metrics.metrics_from_events("dev-vpc", events, "succeeded", 101.0, cost(32.85))
+
+    assert [(s.urn, s.op, s.seconds) for s in metrics.steps] == [(EIP, "create", 1), (NAT, "create", 95)]
+    assert metrics.changes == {"create": 2, "same": 1}
+    assert (metrics.engine_seconds, metrics.started_at) == (98, "1970-01-01T00:16:40+00:00")
+
+
+def test_report_shows_trends_slowest_resources_and_cost_moves(tmp_path):
+    db = deploy_metrics.connect(str(tmp_path / "history.sqlite"))
+    for i, (nat_seconds, nat_cost) in enumerate([(60, 32.85), (90, 32.85), (120, 65.70)]):
+        events = deploy_metrics.read_event_log(event_log(tmp_path / f"{i}.jsonl", nat_seconds, {"create": 2}))
+        metrics = deploy_metrics.metrics_from_events("dev-vpc", events, "succeeded", nat_seconds + 5.0,
+                                                     cost(nat_cost), started_at=f"2026-10-0{i + 1}T12:00:00+00:00")
+        deploy_metrics.record(db, metrics)
+
+    report = deploy_metrics.format_report(db).splitlines()
+    assert report[0] == "dev-vpc: 3 deploys, wall time median 110s (previous 65s, +69%)"
+    assert "  cost: dev-vpc NAT Gateway $32.85 -> $65.70" in report
+    slowest = report.index("  slowest resources (mean over 3 deploys):")
+    assert "dev-vpc-nat-1 (aws:ec2/natGateway:NatGateway: create)" in report[slowest + 1]
+    assert report[slowest + 1].split()[0] == "90.0s"
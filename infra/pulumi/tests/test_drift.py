@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from common import drift
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+VPC = "urn:pulumi:dev-vpc::multi-env-infra::aws:ec2/vpc:Vpc::dev-vpc"
+SUBNET = "urn:pulumi:dev-vpc::multi-env-infra::aws:ec2/subnet:Subnet::dev-vpc-public-1"
+
+
+def resource(urn, outputs, custom=True, type_="aws:ec2/vpc:Vpc"):
+    return {"urn": urn, "type": type_, "id": urn.rsplit("::", 1)[-1], "custom": custom, "outputs": outputs}
+
+
+def deployment(vpc_tags=None, subnet_cidr="10.0.0.0/24"):
+    return {"resources": [
+        resource("urn:pulumi:dev-vpc::multi-env-infra::pulumi:pulumi:Stack::dev-vpc", {}, custom=False,
+                 type_="pulumi:pulumi:Stack"),
+        resource("urn:pulumi:dev-vpc::multi-env-infra::pulumi:providers:aws::default", {},
+                 type_="pulumi:providers:aws"),
+        resource(VPC, {"cidrBlock": "10.0.0.0/16", "tags": vpc_tags or {"Environment": "dev"}}),
+        resource(SUBNET, {"cidrBlock": subnet_cidr}, type_="aws:ec2/subnet:Subnet"),
+    ]}
+
+
+def refresh_event(urn, op, diffs=()):
+    metadata = SimpleNamespace(urn=urn, type="aws:ec2/vpc:Vpc", op=SimpleNamespace(value=op), diffs=list(diffs))
+    return SimpleNamespace(resource_pre_event=SimpleNamespace(metadata=metadata), res_outputs_event=None)
+
+
+class FakeStack:
+    def __init__(self, state, events=()):
+        self.state = state
+        self.events = events
+        self.targets = None
+
+    def export_stack(self):
+        return SimpleNamespace(deployment=self.state)
+
+    def preview_refresh(self, target, on_event, **kwargs):
+        self.targets = target
+        for event in self.events:
+            on_event(event)
+
+
+class DeniedStack(FakeStack):
+    def export_stack(self):
+        raise RuntimeError("AccessDenied")
+
+
+def test_snapshot_skips_components_and_providers():
+    snapshot = drift.compact_snapshot(deployment(), now=NOW)
+
+    assert set(snapshot["resources"]) == {VPC, SUBNET}
+    assert snapshot["resources"][VPC]["checked_at"] is None
+
+
+def test_only_changed_and_stale_resources_are_targeted():
+    previous = drift.compact_snapshot(deployment(), now=NOW)
+    for entry in previous["resources"].values():
+        entry["checked_at"] = NOW.isoformat()
+
+    # Nothing changed and everything was just checked
+    current = drift.compact_snapshot(deployment(), previous, NOW)
+    assert drift.select_targets(previous, current, timedelta(hours=24), NOW) == {}
+
+    current = drift.compact_snapshot(deployment(vpc_tags={"Environment": "staging"}), previous, NOW)
+    assert drift.select_targets(previous, current, timedelta(hours=24), NOW) == {
+        VPC: ["state changed", "tags changed"]}
+
+    later = NOW + timedelta(hours=25)
+    current = drift.compact_snapshot(deployment(), previous, later)
+    assert set(drift.select_targets(previous, current, timedelta(hours=24), later)) == {VPC, SUBNET}
+
+
+def test_drift_from_refresh_events():
+    events = [refresh_event(VPC, "update", ["tags"]), refresh_event(SUBNET, "same"),
+              SimpleNamespace(resource_pre_event=None, res_outputs_event=None)]
+
+    assert drift.drift_from_events(events) == [{"urn": VPC, "type": "aws:ec2/vpc:Vpc", "op": "update",
+                                                "diffs": ["tags"]}]
+
+
+def test_checker_refreshes_incrementally(tmp_path):
+    first = FakeStack(deployment(), [refresh_event(VPC, "update", ["tags"])])
+    checker = drift.DriftChecker(snapshot_dir=str(tmp_path), select=lambda name: first)
+
+    result = checker(("dev", "vpc"))
+    assert result.status == "succeeded"
+    assert sorted(first.targets) == [SUBNET, VPC]
+    assert [d["urn"] for d in result.drifted] == [VPC]
+
+    # Second run: the subnet is fresh, the drifted VPC is checked again
+    second = FakeStack(deployment())
+    checker = drift.DriftChecker(snapshot_dir=str(tmp_path), select=lambda name: second)
+    result = checker(("dev", "vpc"))
+    assert second.targets == [VPC]
+    assert result.reasons == {VPC: ["drifted"]}
+    assert result.drifted == []
+
+    snapshot = json.loads((tmp_path / "dev-vpc.json").read_text())
+    assert snapshot["resources"][VPC]["drifted"] is False
+
+
+def test_report_and_exit_code(tmp_path, monkeypatch):
+    stacks = {"dev-vpc": FakeStack(deployment(), [refresh_event(VPC, "delete")])}
+
+    def select(name):
+        if name not in stacks:
+            raise RuntimeError(f"no stack named '{name}' found")
+        return stacks[name]
+
+    monkeypatch.setattr(drift.DriftChecker, "select", lambda self, name: select(name))
+    report_path = tmp_path / "drift.json"
+
+    code = drift.main(["check", "--envs", "dev", "--components", "vpc", "--snapshot-dir", str(tmp_path),
+                       "--report", str(report_path)])
+    report = json.loads(report_path.read_text())
+    assert code == 2
+    assert report["drifted_stacks"] == ["dev-vpc"]
+
+    # A stack that was never deployed is skipped; any other error fails the check
+    code = drift.main(["check", "--envs", "dev", "staging", "--components", "vpc", "--snapshot-dir", str(tmp_path),
+                       "--report", str(report_path)])
+    report = json.loads(report_path.read_text())
+    assert code == 2
+    assert (report["skipped_stacks"], report["failed_stacks"]) == (["staging-vpc"], [])
+
+    stacks["prod-vpc"] = DeniedStack(deployment())
+    code = drift.main(["check", "--envs", "prod", "--components", "vpc", "--snapshot-dir", str(tmp_path),
+                       "--report", str(report_path)])
+    report = json.loads(report_path.read_text())
+    assert code == 1
+    assert report["failed_stacks"] == ["prod-vpc"]
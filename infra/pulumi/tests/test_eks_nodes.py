@@ -0,0 +1,113 @@
+import base64
+import json
+
+import pytest
+
+from common import pricing
+from config.resolver import load_config
+from modules.eks import KarpenterBootstrap, NodeGroupSet, VpcCniAddon, max_pods, require_egress
+
+SUBNETS = ["subnet-a", "subnet-b", "subnet-c"]
+
+
+def prod_pools():
+    cfg = load_config("prod")
+    return {
+        "on-demand": {"capacity_type": "ON_DEMAND", "instance_types": cfg["eks:on_demand_instance_types"],
+                      "scaling": cfg["eks:on_demand_scaling"]},
+        "spot": {"capacity_type": "SPOT", "instance_types": cfg["eks:spot_instance_types"],
+                 "scaling": cfg["eks:spot_scaling"]},
+    }
+
+
+def test_max_pods_with_prefix_delegation():
+    assert max_pods("m6i.large", prefix_delegation=False) == 29
+    assert max_pods("m6i.large") == 110
+    assert max_pods("t3.medium", prefix_delegation=False) == 17
+    assert max_pods("m6i.8xlarge") == 250
+    assert max_pods("t3.medium", prefix_delegation=False, custom_networking=True) == 12
+    with pytest.raises(ValueError, match="ENI_LIMITS"):
+        max_pods("x9.huge")
+
+
+def test_node_groups_per_pool_and_az(run_stack):
+    groups = {}
+
+    def program():
+        groups["set"] = NodeGroupSet("prod-eks-nodes", "prod-eks", SUBNETS,
+                                     {"environment": "prod", "pools": prod_pools()})
+
+    run = run_stack("prod-eks", entrypoint=program)
+
+    node_groups = run.of_type("aws:eks/nodeGroup:NodeGroup")
+    assert sorted(ng.name for ng in node_groups) == [f"prod-eks-nodes-{p}-{i}" for p in ("on-demand", "spot")
+                                                    for i in range(3)]
+    spot = run.named("prod-eks-nodes-spot-1")
+    assert spot.inputs["capacityType"] == "SPOT"
+    assert spot.inputs["subnetIds"] == ["subnet-b"]
+    assert spot.inputs["scalingConfig"] == {"minSize": 0, "desiredSize": 2, "maxSize": 10}
+    user_data = base64.b64decode(run.named("prod-eks-nodes-spot-lt").inputs["userData"]).decode()
+    assert "maxPods: 110" in user_data
+    assert [(i.resource, i.quantity) for i in groups["set"].cost_items] == [
+        ("on-demand nodes (m6i.xlarge)", 6 * pricing.hours_per_month())]
+
+
+def test_disabled_pool_and_max_pods_override(run_stack):
+    def program():
+        NodeGroupSet("dev-eks-nodes", "dev-eks", SUBNETS[:2], {
+            "max_pods": 58,
+            "pools": {"on-demand": {"instance_types": ["t3.large"], "scaling": {"max": 0}},
+                      "spot": {"capacity_type": "SPOT", "instance_types": ["t3.large"],
+                               "scaling": {"min": 0, "desired": 1, "max": 2}}},
+        })
+
+    run = run_stack("dev-eks", entrypoint=program)
+
+    assert [ng.name for ng in run.of_type("aws:eks/nodeGroup:NodeGroup")] == ["dev-eks-nodes-spot-0",
+                                                                             "dev-eks-nodes-spot-1"]
+    assert "maxPods: 58" in base64.b64decode(run.named("dev-eks-nodes-spot-lt").inputs["userData"]).decode()
+
+
+def test_nodes_need_nat():
+    dev = load_config("dev")
+    dev_pools = {"spot": {"scaling": dev["eks:spot_scaling"]}, "on-demand": {"scaling": dev["eks:on_demand_scaling"]}}
+
+    assert require_egress(dev_pools, dev["vpc:nat_strategy"]) == "none"  # dev defaults: control plane only
+    assert require_egress(prod_pools(), "multi-az") == "multi-az"
+    with pytest.raises(ValueError, match=r"\['on-demand', 'spot'\] need egress"):
+        require_egress(prod_pools(), "none")
+
+
+def test_karpenter_bootstrap(run_stack):
+    def program():
+        KarpenterBootstrap("prod-karpenter", "prod-eks-3f2a", ["sg-cluster"],
+                           {"environment": "prod", "discovery": "prod-eks"})
+
+    run = run_stack("prod-eks", entrypoint=program)
+
+    rules = run.of_type("aws:cloudwatch/eventRule:EventRule")
+    assert len(rules) == len(run.of_type("aws:cloudwatch/eventTarget:EventTarget")) == 4
+    assert json.loads(run.named("prod-karpenter-spot-interruption").inputs["eventPattern"])["detail-type"] == [
+        "EC2 Spot Instance Interruption Warning"]
+    association = run.named("prod-karpenter-controller")
+    assert (association.inputs["namespace"], association.inputs["serviceAccount"]) == ("kube-system", "karpenter")
+    # Subnets belong to the vpc stack, only the EKS-created security group is tagged here
+    [tag] = run.of_type("aws:ec2/tag:Tag")
+    assert (tag.inputs["resourceId"], tag.inputs["key"], tag.inputs["value"]) == (
+        "sg-cluster", "karpenter.sh/discovery", "prod-eks")
+
+
+def test_vpc_cni_addon_for_custom_networking(run_stack):
+    def program():
+        VpcCniAddon("prod-eks", "prod-eks", {"environment": "prod", "custom_networking": True})
+
+    run = run_stack("prod-eks", entrypoint=program)
+
+    addon = run.named("prod-eks-vpc-cni")
+    assert addon.inputs["addonName"] == "vpc-cni"
+    assert json.loads(addon.inputs["configurationValues"])["env"] == {
+        "ENABLE_PREFIX_DELEGATION": "true",
+        "WARM_PREFIX_TARGET": "1",
+        "AWS_VPC_K8S_CNI_CUSTOM_NETWORK_CFG": "true",
+        "ENI_CONFIG_LABEL_DEF": "topology.kubernetes.io/zone",
+    }
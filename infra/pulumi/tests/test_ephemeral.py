@@ -0,0 +1,116 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from common import ephemeral
+from common.ephemeral import choose_slot
+from config.defaults import environment_defaults, get_component_from_stack, get_environment_from_stack
+
+VPC = "aws:ec2/vpc:Vpc"
+SUBNET = "aws:ec2/subnet:Subnet"
+AZS = ["us-east-1a", "us-east-1b"]
+
+
+def shell(slot):
+    return {
+        "slot": slot,
+        "vpc_id": f"vpc-shell{slot}",
+        "vpc_cidr": f"10.128.{slot * 16}.0/20",
+        "internet_gateway_id": f"igw-shell{slot}",
+        "public_route_table_id": f"rtb-shell{slot}",
+        "public_subnet_ids": [f"subnet-pub{slot}{i}" for i in range(2)],
+        "private_subnet_ids": [f"subnet-priv{slot}{i}" for i in range(2)],
+        "availability_zones": AZS,
+    }
+
+
+@pytest.mark.parametrize("stack,env,component", [
+    ("dev-vpc", "dev", "vpc"),
+    ("pr-123-vpc", "pr-123", "vpc"),
+    ("pr-pool-vpc", "pr-pool", "vpc"),
+    ("pr-iam", "pr", "iam"),
+])
+def test_stack_name_parsing(stack, env, component):
+    assert get_environment_from_stack(stack) == env
+    assert get_component_from_stack(stack) == component
+
+
+def test_slot_claims():
+    claims = {"pr-12": 0, "pr-15": 3}
+
+    assert choose_slot("pr-15", claims, range(4)) == (3, True)  # re-running up keeps the claim
+    assert choose_slot("pr-20", claims, range(4)) == (1, True)  # lowest free shell
+    assert choose_slot("pr-20", {**claims, "pr-13": 1, "pr-14": 2}, range(4)) == (4, False)
+    assert environment_defaults("pr-7")["vpc:cidr_block"] == "10.192.112.0/20"  # unclaimed fallback
+
+
+class Backend:
+    """Stack tags as the Pulumi backend keeps them; config stays per checkout"""
+
+    def __init__(self):
+        self.tags = {}
+
+    def list_tags(self, stack_name):
+        return dict(self.tags.get(stack_name, {}))
+
+    def set_tag(self, stack_name, key, value):
+        self.tags.setdefault(stack_name, {})[key] = value
+
+    def remove_tag(self, stack_name, key):
+        del self.tags[stack_name][key]
+
+
+def test_claims_survive_a_fresh_checkout(monkeypatch):
+    from pulumi import automation as auto
+
+    backend = Backend()
+    outputs = {"shells": auto.OutputValue([shell(0), shell(1)], False)}
+    # Every Pool() is a new job on a fresh checkout: only the backend is shared
+    monkeypatch.setattr(auto, "select_stack", lambda stack_name, work_dir: SimpleNamespace(
+        workspace=backend, outputs=lambda: outputs))
+
+    assert ephemeral.Pool().claim("pr-12") == (0, True)
+    assert ephemeral.Pool().claim("pr-15") == (1, True)
+    assert ephemeral.Pool().claim("pr-12") == (0, True)
+    assert ephemeral.Pool().release("pr-12") == 0
+    assert ephemeral.Pool().claims() == {"pr-15": 1}
+    assert ephemeral.Pool().release("pr-12") is None
+
+
+def test_pool_stack_builds_shells(run_stack):
+    run = run_stack("pr-pool-vpc", config={"vpc:pool_size": "2"})
+
+    assert sorted(v.inputs["cidrBlock"] for v in run.of_type(VPC)) == ["10.128.0.0/20", "10.128.16.0/20"]
+    assert len(run.of_type(SUBNET)) == 8
+    assert not run.of_type("aws:ec2/natGateway:NatGateway")
+    assert [s["slot"] for s in run.exports["shells"]] == [0, 1]
+    assert run.exports["shells"][1]["availability_zones"] == AZS
+
+
+def test_pr_stack_claims_a_shell(run_stack):
+    run = run_stack("pr-7-vpc", config={"vpc:pool_slot": "1", "vpc:pool_stack": "pr-pool-vpc"},
+                    stack_outputs={"pr-pool-vpc": {"shells": [shell(0), shell(1)]}})
+
+    assert not run.of_type(VPC) + run.of_type(SUBNET) + run.of_type("aws:ec2/internetGateway:InternetGateway")
+    assert run.exports["vpc_id"] == "vpc-shell1"
+    assert run.exports["vpc_cidr"] == "10.128.16.0/20"
+    assert run.exports["private_subnet_ids"] == ["subnet-priv10", "subnet-priv11"]
+
+
+def test_pr_stack_without_shell_uses_its_slot(run_stack):
+    run = run_stack("pr-8-vpc", config={"vpc:pool_slot": "5"})
+
+    assert run.of_type(VPC)[0].inputs["cidrBlock"] == "10.128.80.0/20"
+    assert sorted(s.inputs["cidrBlock"] for s in run.of_type(SUBNET)) == \
+        ["10.128.80.0/24", "10.128.81.0/24", "10.128.88.0/24", "10.128.89.0/24"]
+
+
+def test_shared_pr_role_is_scoped_to_every_pr(run_stack):
+    run = run_stack("pr-iam")
+
+    document = json.loads(run.named("pr-deploy-policy-0").inputs["policy"])
+    statements = {s["Sid"]: s for s in document["Statement"]}
+    assert statements["CreateTagged"]["Condition"] == {"StringLike": {"aws:RequestTag/Environment": "pr-*"},
+                                                       "StringEquals": {"aws:RequestTag/ManagedBy": "Pulumi"}}
+    assert statements["ManageTagged"]["Condition"]["StringLike"] == {"aws:ResourceTag/Environment": "pr-*"}
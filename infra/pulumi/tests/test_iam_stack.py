@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+GET_POLICY_DOCUMENT = "aws:iam/getPolicyDocument:getPolicyDocument"
+
+
+@pytest.mark.parametrize("env", ["dev", "staging", "prod"])
+def test_deploy_role_replaces_access_keys(run_stack, env):
+    run = run_stack(f"{env}-iam")
+
+    role = run.named(f"{env}-deploy-role")
+    assert role.inputs["name"] == f"pulumi-{env}-deploy"
+    trust = json.loads(role.inputs["assumeRolePolicy"])["Statement"][0]
+    assert trust["Principal"]["Federated"] == \
+        "arn:aws:iam::123456789012:oidc-provider/token.actions.githubusercontent.com"
+    assert trust["Condition"]["StringEquals"]["token.actions.githubusercontent.com:sub"] == \
+        f"repo:alkon/dns-etl-repo:environment:{env}"
+    assert not run.of_type("aws:iam/user:User") + run.of_type("aws:iam/accessKey:AccessKey")
+    assert run.named(f"{env}-deploy-policy-0-attachment").inputs["policyArn"] == \
+        f"arn:aws:mock:::{env}-deploy-policy-0"
+    assert run.calls_to(GET_POLICY_DOCUMENT) == 0
+
+
+def test_policy_is_scoped_to_environment(run_stack):
+    run = run_stack("staging-iam")
+
+    document = json.loads(run.named("staging-deploy-policy-0").inputs["policy"])
+    statements = {s["Sid"]: s for s in document["Statement"]}
+    assert statements["CreateTagged"]["Condition"] == {"StringEquals": {
+        "aws:RequestTag/Environment": "staging", "aws:RequestTag/ManagedBy": "Pulumi"}}
+    assert "ec2:RunInstances" in statements["UnscopedCreate"]["Action"]
+    assert not any(a.startswith(("ec2:Run", "iam:Create")) for a in statements["Read"]["Action"])
+    assert "ec2:DeleteVpc" in statements["ManageTagged"]["Action"]
+    assert not any(a.startswith("eks:") for s in document["Statement"] for a in s["Action"])
+
+
+def test_eks_permissions_are_opt_in(run_stack):
+    run = run_stack("dev-iam", config={"iam:enable_eks_permissions": "true"})
+
+    actions = {a for p in run.of_type("aws:iam/policy:Policy")
+               for s in json.loads(p.inputs["policy"])["Statement"] for a in s["Action"]}
+    assert {"eks:CreateCluster", "iam:CreateOpenIDConnectProvider", "iam:PassRole"} <= actions
+    assert "eks.Cluster" in run.exports["deploy_policy_resource_types"]
+
+
+def test_github_provider_can_be_created(run_stack):
+    run = run_stack("dev-iam", config={"iam:create_github_oidc_provider": "true"})
+
+    provider = run.named("dev-github-oidc")
+    assert provider.inputs["url"] == "https://token.actions.githubusercontent.com"
+    trust = json.loads(run.named("dev-deploy-role").inputs["assumeRolePolicy"])
+    assert trust["Statement"][0]["Principal"]["Federated"] == "arn:aws:mock:::dev-github-oidc"
@@ -0,0 +1,38 @@
+import pytest
+
+from modules.vpc.nat_gateway import nat_instance_architecture, plan_nat_placement
+
+AZS = ["a", "b", "c", "d"]
+
+
+def test_single():
+    assert plan_nat_placement(AZS, "single") == {"a": "a", "b": "a", "c": "a", "d": "a"}
+
+
+def test_multi_az():
+    assert plan_nat_placement(AZS, "multi-az") == {az: az for az in AZS}
+
+
+def test_zonal_pairs_default_is_one_nat_per_two_azs():
+    assert plan_nat_placement(AZS, "zonal-pairs") == {"a": "a", "b": "a", "c": "c", "d": "c"}
+
+
+def test_zonal_pairs_with_explicit_count():
+    assert plan_nat_placement(AZS, "zonal-pairs", nat_count=3) == {"a": "a", "b": "a", "c": "c", "d": "d"}
+
+
+def test_none_and_unknown():
+    assert plan_nat_placement(AZS, "none") == {}
+    with pytest.raises(ValueError):
+        plan_nat_placement(AZS, "everywhere")
+
+
+def test_instance_strategy_is_per_az():
+    assert plan_nat_placement(AZS, "instance") == {az: az for az in AZS}
+
+
+@pytest.mark.parametrize("instance_type, architecture", [
+    ("t4g.nano", "arm64"), ("c7gn.medium", "arm64"), ("t3.micro", "x86_64"), ("c5n.large", "x86_64"),
+])
+def test_nat_instance_architecture(instance_type, architecture):
+    assert nat_instance_architecture(instance_type) == architecture
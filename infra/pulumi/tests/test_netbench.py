@@ -0,0 +1,80 @@
+import base64
+import gzip
+import http.server
+import json
+import threading
+
+import pytest
+
+from modules.vpc import netbench, netbench_harness as harness
+
+INSTANCE = "aws:ec2/instance:Instance"
+
+
+@pytest.fixture
+def agents():
+    """Four loopback stand-ins for the agents of a two-AZ VPC"""
+    servers = {f"{tier}-{az}": harness.Agent("127.0.0.1", 0).start()
+               for tier in ("public", "private") for az in ("a", "b")}
+    yield {name: {"az": name.split("-")[1], "tier": name.split("-")[0], "host": "127.0.0.1", "port": s.port}
+           for name, s in servers.items()}
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def internet(tmp_path):
+    """Local HTTP server standing in for the via-NAT download"""
+    (tmp_path / "blob").write_bytes(b"x" * 256 * 1024)
+    handler = lambda *a, **kw: http.server.SimpleHTTPRequestHandler(*a, directory=str(tmp_path), **kw)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/blob"
+    server.shutdown()
+
+
+def test_plan_runs_against_loopback_agents(agents, internet, tmp_path):
+    plan = harness.build_plan(agents, {"a": "a", "b": "a"}, {"seconds": 0.2, "count": 3, "internet_url": internet})
+    plan["agents"]["public-a"]["host"] = harness.SELF  # the controller's own agent
+
+    document = harness.run_plan(plan, timeout=5)
+
+    results = {r["name"]: r for r in document["results"]}
+    assert sorted(results) == ["cross-az a->b", "same-az a", "same-az b", "via-nat a", "via-nat b"]
+    assert all(r["error"] is None for r in results.values()), results
+    assert results["same-az a"]["throughput_mbps"] > 0 and results["same-az a"]["rtt_ms"]["samples"] == 3
+    assert results["via-nat b"]["cross_az"] and results["via-nat b"]["throughput_mbps"] > 0
+
+    written = harness.publish(document, str(tmp_path / "results"))
+    assert json.loads(open(written[1]).read())["run_id"] == document["run_id"]
+
+
+def test_failed_paths_are_results(agents):
+    result = harness.run_test({"name": "via-nat a", "path": "via-nat", "kind": "connect",
+                               "host": "127.0.0.1", "port": 9, "count": 1})
+    assert result["rtt_ms"] is None and result["error"].startswith("ConnectionRefusedError")
+
+    plan = harness.build_plan(agents, {}, {"gateway_endpoints": True, "bucket": "b", "region": "us-east-1",
+                                           "interface_services": ["sts"]})
+    paths = [t["path"] for t in plan["tests"]]
+    assert "via-nat" not in paths  # no NAT, nothing to measure
+    assert paths.count("via-endpoint") == 6  # s3 put/get and sts per private agent
+
+
+def test_netbench_agents_in_every_subnet(run_stack):
+    run = run_stack("staging-vpc", config={"vpc:enable_netbench": "true"})
+
+    user_data = {i.name: gzip.decompress(base64.b64decode(i.inputs["userDataBase64"])).decode()
+                 for i in run.of_type(INSTANCE)}
+    assert sorted(user_data) == [f"staging-vpc-netbench-{tier}-{i}" for tier in ("private", "public") for i in (1, 2)]
+    embedded = user_data["staging-vpc-netbench-private-1"].split("<<'HARNESS'\n")[1].split("\nHARNESS")[0]
+    assert embedded == open(netbench.HARNESS_FILE).read().rstrip("\n")
+
+    plan = json.loads(user_data["staging-vpc-netbench-public-1"].split("<<'PLAN'\n")[1].split("\nPLAN")[0])
+    assert plan["agents"]["public-us-east-1a"]["host"] == harness.SELF
+    assert plan["agents"]["private-us-east-1b"]["host"].startswith("10.0.0.")
+    assert plan["metadata"]["nat_strategy"] == "single"
+    assert {t["path"] for t in plan["tests"]} == {"same-az", "cross-az", "via-nat", "via-endpoint"}
+    assert not any("{bucket}" in arg for t in plan["tests"] for arg in t.get("command", []))
+    assert run.exports["netbench_results"].endswith("/results/latest.json")
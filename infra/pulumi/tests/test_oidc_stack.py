@@ -0,0 +1,100 @@
+import json
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from modules.oidc import thumbprint
+
+pytestmark = pytest.mark.skipif(not shutil.which("openssl"), reason="needs the openssl CLI")
+
+
+@pytest.fixture(scope="module")
+def issuer(tmp_path_factory):
+    """Local stand-in for an EKS OIDC issuer: a TLS listener with a self-signed certificate"""
+    directory = tmp_path_factory.mktemp("issuer")
+    cert, key = directory / "issuer.crt", directory / "issuer.key"
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "30",
+                    "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert)],
+                   check=True, capture_output=True)
+    fingerprint = subprocess.run(["openssl", "x509", "-in", str(cert), "-noout", "-fingerprint", "-sha1"],
+                                 check=True, capture_output=True, text=True).stdout
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(cert), str(key))
+    listener = socket.create_server(("127.0.0.1", 0))
+    handshakes = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            try:
+                with context.wrap_socket(conn, server_side=True) as tls:
+                    handshakes.append(tls.version())
+            except (ssl.SSLError, OSError):
+                pass
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield {
+        "url": f"https://127.0.0.1:{listener.getsockname()[1]}/id/LOCALTEST",
+        "thumbprint": fingerprint.split("=", 1)[1].strip().replace(":", "").lower(),
+        "der": ssl.PEM_cert_to_DER_cert(cert.read_text()),
+        "handshakes": handshakes,
+    }
+    listener.close()
+
+
+def test_issuer_comes_from_eks_stack(run_stack, issuer):
+    run = run_stack("dev-oidc", stack_outputs={"dev-eks": {"oidc_issuer_url": issuer["url"]}})
+
+    provider = run.named("dev-eks-oidc")
+    assert provider.inputs["url"] == issuer["url"]
+    assert provider.inputs["clientIdLists"] == ["sts.amazonaws.com"]
+    assert provider.inputs["thumbprintLists"] == [issuer["thumbprint"]]
+
+
+def test_chain_is_fetched_once_and_verified_from_disk(issuer, oidc_cache_dir):
+    first = thumbprint.resolve_thumbprints(issuer["url"])
+    handshakes = len(issuer["handshakes"])
+    thumbprint.clear()
+    second = thumbprint.resolve_thumbprints(issuer["url"], fetcher=lambda host, port: pytest.fail("refetched"))
+
+    assert (first.source, second.source) == ("fetched", "disk")
+    assert second.top == first.top == issuer["thumbprint"]
+    assert first.not_after - datetime.now(timezone.utc) < timedelta(days=31)
+    assert len(issuer["handshakes"]) == handshakes
+    assert thumbprint.resolve_thumbprints(issuer["url"]).source == "memory"
+
+
+def test_tampered_or_expired_cache_is_refetched(issuer, oidc_cache_dir):
+    chain = thumbprint.resolve_thumbprints(issuer["url"])
+    path = oidc_cache_dir / f"127.0.0.1_{chain.port}.json"
+    entry = json.loads(path.read_text())
+    path.write_text(json.dumps({**entry, "thumbprints": ["0" * 40]}))
+    thumbprint.clear()
+    fetches = []
+
+    def fetcher(host, port):
+        fetches.append(host)
+        return [issuer["der"]]
+
+    assert thumbprint.resolve_thumbprints(issuer["url"], fetcher=fetcher).source == "fetched"
+    thumbprint.clear()
+    with pytest.raises(thumbprint.ThumbprintError, match="expired"):
+        thumbprint.resolve_thumbprints(issuer["url"], fetcher=fetcher, now=chain.not_after + timedelta(days=1))
+    assert fetches == ["127.0.0.1", "127.0.0.1"]
+
+
+def test_pinned_thumbprints_skip_fetch(run_stack, monkeypatch):
+    monkeypatch.setattr(thumbprint, "fetch_chain", lambda host, port: pytest.fail("fetched"))
+    run = run_stack("prod-oidc", config={"oidc:issuer_url": "https://oidc.eks.us-east-1.amazonaws.com/id/PROD",
+                                         "oidc:thumbprints": "9e99a48a9960b14926bb7f3b02e22da0afd4e3e5"})
+
+    assert run.named("prod-eks-oidc").inputs["thumbprintLists"] == ["9e99a48a9960b14926bb7f3b02e22da0afd4e3e5"]
+    assert run.exports["oidc_provider_url"] == "https://oidc.eks.us-east-1.amazonaws.com/id/PROD"
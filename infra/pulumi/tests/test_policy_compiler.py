@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from modules.iam import policy_compiler
+
+
+def test_scan_finds_constructors_and_invokes():
+    found = policy_compiler.scan_source(
+        "import pulumi_aws as aws\n"
+        "from common.invoke_cache import cached_invoke\n"
+        "vpc = aws.ec2.Vpc('v', cidr_block='10.0.0.0/16')\n"
+        "args = aws.ec2.LaunchTemplateIamInstanceProfileArgs(name='p')\n"
+        "ami = cached_invoke(aws.ec2.get_ami, most_recent=True)\n"
+        "name = other.ec2.Vpc('x')\n")
+
+    assert found == {"aws.ec2.Vpc", "aws.ec2.get_ami"}
+
+
+@pytest.mark.parametrize("components", [["vpc"], ["vpc", "eks", "oidc"]])
+def test_every_declared_type_is_mapped(components):
+    types = policy_compiler.resource_types(policy_compiler.module_sources(components))
+
+    assert {"aws.ec2.Vpc", "aws.ec2.NatGateway", "aws.ec2.FlowLog", "aws.get_availability_zones"} <= set(types)
+    assert ("eks.Cluster" in types) == ("eks" in components)
+
+
+def test_unmapped_type_fails(tmp_path):
+    (tmp_path / "extra").mkdir()
+    (tmp_path / "extra" / "mod.py").write_text("import pulumi_aws as aws\naws.rds.Instance('db')\n")
+
+    with pytest.raises(policy_compiler.PolicyCompileError, match="aws.rds.Instance"):
+        policy_compiler.compile_policies("dev", ["extra"], {"Environment": "dev"}, modules_dir=str(tmp_path))
+
+
+def test_documents_fit_managed_policy_limit(monkeypatch):
+    monkeypatch.setattr(policy_compiler, "MAX_POLICY_SIZE", 2500)
+    compiled = policy_compiler.compile_policies("prod", ["vpc", "eks", "oidc"], {"Environment": "prod"})
+
+    assert len(compiled.documents) > 1
+    assert all(len(json.dumps(d, separators=(",", ":"))) <= 2500 for d in compiled.documents)
+    assert "arn:aws:s3:::prod-*" in {r for d in compiled.documents for s in d["Statement"] for r in s["Resource"]}
+
+
+def test_vpc_reads_and_bucket_emptying_are_granted():
+    compiled = policy_compiler.compile_policies("dev", ["vpc"], {"Environment": "dev"})
+    statements = [s for d in compiled.documents for s in d["Statement"]]
+
+    read = {a for s in statements if s["Sid"] == "Read" for a in s["Action"]}
+    assert {"ec2:DescribeNetworkAcls", "ec2:DescribeSecurityGroups", "ec2:DescribeRouteTables"} <= read
+    # force_destroy buckets are emptied before pulumi destroy deletes them
+    delete = next(s for s in statements if "s3:DeleteObjectVersion" in s["Action"])
+    assert {"s3:ListBucketVersions", "s3:DeleteObject"} <= set(delete["Action"])
+    assert set(delete["Resource"]) >= {"arn:aws:s3:::dev-*", "arn:aws:s3:::dev-*/*"}
+
+
+def test_compiled_documents_are_cached_by_content(policy_cache_dir, monkeypatch):
+    first = policy_compiler.compile_policies("dev", ["vpc"], {"Environment": "dev"})
+    other = policy_compiler.compile_policies("staging", ["vpc"], {"Environment": "staging"})
+    monkeypatch.setattr(policy_compiler, "resource_types", lambda sources: pytest.fail("cache miss"))
+    second = policy_compiler.compile_policies("dev", ["vpc"], {"Environment": "dev"})
+
+    assert not first.cached and second.cached
+    assert second.documents == first.documents
+    assert other.digest != first.digest
+    assert sorted(p.name for p in policy_cache_dir.iterdir()) == sorted(f"{c.digest}.json" for c in (first, other))
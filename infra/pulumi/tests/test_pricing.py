@@ -0,0 +1,85 @@
+import pytest
+
+from common import pricing
+
+
+def test_price_table_is_per_region():
+    assert pricing.prices("us-east-1")["nat_gateway_hour"] == 0.045
+    assert pricing.prices("eu-west-1")["ec2:t4g.nano"] == 0.0046
+    assert pricing.prices("ap-south-9") == {}  # valid region, not in the table: unpriced
+
+
+def test_unpriced_items_are_listed_not_silently_dropped():
+    items = [pricing.hourly("vpc", "NAT Gateway", "nat_gateway_hour"),
+             pricing.usage("vpc", "private internet egress", "internet_egress_gb", 100)]
+
+    report = pricing.breakdown("ap-south-9", items)
+    assert report["monthly_total"] == 0
+    assert report["unpriced"] == ["vpc NAT Gateway (nat_gateway_hour, ap-south-9)",
+                                  "vpc private internet egress (internet_egress_gb, ap-south-9)"]
+    assert pricing.breakdown("us-east-1", items)["unpriced"] == []
+
+
+def test_items_registered_in_region_use_its_prices():
+    pricing.clear()
+    pricing.register(pricing.hourly("vpc", "NAT Gateway", "nat_gateway_hour"))
+    with pricing.in_region("eu-west-1"):
+        pricing.register(pricing.hourly("vpc-eu-west-1", "NAT Gateway", "nat_gateway_hour"))
+
+    report = pricing.breakdown("us-east-1")
+    pricing.clear()
+    assert [row["region"] for row in report["items"]] == [None, "eu-west-1"]
+    assert report["by_component"] == {"vpc": round(730 * 0.045, 2), "vpc-eu-west-1": round(730 * 0.048, 2)}
+
+
+def test_data_transfer_through_single_nat():
+    placement = {"us-east-1a": "us-east-1a", "us-east-1b": "us-east-1a"}
+    items = pricing.estimate_data_transfer("vpc", {
+        "internet": {"private": 100, "public": 10},
+        "s3_dynamodb": {"private": 1000},
+        "aws_api": {"private": 20},
+    }, placement, gateway_endpoints=True)
+
+    by_resource = {item.resource: item for item in items}
+    assert by_resource["private NAT data processing"].quantity == 120  # S3 skips NAT via gateway endpoint
+    assert by_resource["private cross-AZ to NAT"].quantity == 60  # half the AZs use a remote NAT
+    assert by_resource["public internet egress"].quantity == 10
+    assert "public NAT data processing" not in by_resource
+    assert pricing.monthly_cost(items, "us-east-1") == pytest.approx(
+        110 * 0.09 + 120 * 0.045 + 60 * 0.02)
+
+
+def test_interface_endpoints_and_nat_instances_skip_processing_charges():
+    placement = {"a": "a", "b": "b"}
+    items = pricing.estimate_data_transfer("vpc", {"aws_api": {"private": 50}, "s3_dynamodb": {"private": 10}},
+                                           placement, nat_processing=False, interface_endpoints=True)
+
+    assert [(i.resource, i.price_key, i.quantity) for i in items] == [
+        ("private interface endpoint processing", "vpc_endpoint_interface_gb", 50)]
+
+
+def test_stack_exports_cost_breakdown(run_stack):
+    run = run_stack("staging-vpc")
+
+    report = run.exports["cost_breakdown"]
+    assert report["price_table"] == pricing.price_table_version()
+    assert report["region"] == "us-east-1"
+    resources = {(r["component"], r["resource"]): r["monthly"] for r in report["items"]}
+    assert resources[("staging-vpc", "NAT Gateway")] == 32.85
+    assert resources[("staging-vpc", "Elastic IP")] == 3.65
+    assert resources[("staging-vpc", "private NAT data processing")] == pytest.approx((50 + 20) * 0.045, abs=0.01)
+    assert run.exports["nat_gateway_monthly_cost_estimate"] == 36.5
+    assert report["monthly_total"] == pytest.approx(sum(resources.values()), abs=0.05)
+
+
+def test_run_over_budget_fails(run_stack):
+    with pytest.raises(Exception, match="exceeds the 'prod' budget of \\$100"):
+        run_stack("prod-vpc", config={"cost:monthly_budget": "100"})
+
+
+def test_stack_in_unpriced_region_previews(run_stack):
+    run = run_stack("staging-vpc", config={"aws:region": "ap-south-1"})
+
+    report = run.exports["cost_breakdown"]
+    assert report["monthly_total"] == 0
+    assert "staging-vpc NAT Gateway (nat_gateway_hour, ap-south-1)" in report["unpriced"]
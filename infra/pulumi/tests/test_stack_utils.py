@@ -0,0 +1,31 @@
+import sys
+
+import pytest
+
+from common import stack_utils
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("dev-vpc", ("dev", "vpc")),
+    ("prod-vpc-eu", ("prod", "vpc")),
+    ("pr-123-vpc", ("pr-123", "vpc")),
+    ("staging-eks", ("staging", "eks")),
+])
+def test_parse_stack_name(name, expected):
+    assert stack_utils.parse_stack_name(name) == expected
+
+
+def test_parse_stack_name_without_component():
+    with pytest.raises(ValueError):
+        stack_utils.parse_stack_name("dev-unknown")
+
+
+def test_only_dispatched_component_is_imported(run_stack):
+    before = set(sys.modules)  # pulumi_eks may be installed and imported by other tests
+    run_stack("dev-vpc")
+    loaded = {name.split(".")[0] for name in set(sys.modules) - before}
+
+    assert "modules.vpc.vpc_stack" in sys.modules
+    assert "pulumi_eks" not in loaded
+    assert "pulumi_eks" not in stack_utils.IMPORT_PROFILE["vpc"]["providers"]
+    assert stack_utils.IMPORT_PROFILE["vpc"]["module"] == "modules.vpc.vpc_stack"
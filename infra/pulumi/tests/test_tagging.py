@@ -0,0 +1,33 @@
+import pytest
+
+from common.tagging import stack_tags, tag_key
+
+OVERRIDES = {"tags:project": "dns-etl", "tags:cost-center": "engineering", "tags:owner": "platform-team"}
+
+
+def test_every_taggable_resource_gets_stack_tags(run_stack):
+    run = run_stack("dev-vpc")
+
+    assert run.named("dev-vpc-vpc").inputs["tags"] == {
+        "Name": "dev-vpc-vpc", "Environment": "dev", "Component": "vpc", "Project": "multi-env-infra",
+        "CostCenter": "networking", "ManagedBy": "Pulumi"}
+    subnet = run.named("dev-vpc-private-1").inputs["tags"]
+    assert subnet["Type"] == "private" and subnet["Environment"] == "dev"
+    assert "tags" not in run.of_type("aws:ec2/routeTableAssociation:RouteTableAssociation")[0].inputs
+
+
+def test_override_tags_reach_nat_instances(run_stack):
+    run = run_stack("staging-vpc", config={**OVERRIDES, "vpc:nat_strategy": "instance"})
+
+    eip = run.of_type("aws:ec2/eip:Eip")[0].inputs["tags"]
+    assert (eip["Project"], eip["CostCenter"], eip["Owner"]) == ("dns-etl", "engineering", "platform-team")
+    asg = {t["key"]: t for t in run.named("staging-vpc-nat-1-asg").inputs["tags"]}
+    assert asg["AvailabilityZone"]["value"] == "us-east-1a"
+    assert asg["CostCenter"] == {"key": "CostCenter", "value": "engineering", "propagateAtLaunch": True}
+
+
+def test_stack_tags_protect_stack_identity():
+    assert tag_key("cost-center") == "CostCenter" and tag_key("DataClass") == "DataClass"
+    assert stack_tags("prod", "iam", {}, project="p")["CostCenter"] == "platform"
+    with pytest.raises(ValueError, match="Environment"):
+        stack_tags("prod", "vpc", {"environment": "dev"}, project="p")
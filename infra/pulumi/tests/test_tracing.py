@@ -0,0 +1,51 @@
+import json
+
+from common import tracing
+
+
+def test_trace_records_parents_and_resolution(run_stack, tmp_path, monkeypatch):
+    trace_file = tmp_path / "trace.json"
+    monkeypatch.setenv("PULUMI_TRACE_FILE", str(trace_file))
+
+    run = run_stack("prod-vpc")
+    events = [e for e in json.loads(trace_file.read_text())["traceEvents"] if e["ph"] == "X"]
+    by_name = {e["name"]: e for e in events}
+
+    # One event per registered resource
+    assert len(events) == len(run.resources)
+    subnet = by_name["Subnet:prod-vpc-public-1"]
+    assert subnet["args"]["parent"] == "custom:vpc:SubnetGroup::prod-vpc-public"
+    assert "aws:ec2/vpc:Vpc::prod-vpc-vpc" in subnet["args"]["deps"]
+
+    # Components span everything registered beneath them, on their own track
+    group = by_name["SubnetGroup:prod-vpc-public"]
+    assert group["tid"] == subnet["tid"]
+    assert group["ts"] + group["dur"] >= subnet["ts"] + subnet["dur"]
+
+
+def test_folded_stacks_and_critical_path(run_stack, tmp_path, monkeypatch):
+    trace_file = tmp_path / "trace.folded"
+    monkeypatch.setenv("PULUMI_TRACE_FILE", str(trace_file))
+
+    run_stack("dev-vpc")
+    lines = trace_file.read_text().splitlines()
+
+    assert "stack;VpcBase:dev-vpc;Vpc:dev-vpc-vpc" in [line.rsplit(" ", 1)[0] for line in lines]
+    assert all(int(line.rsplit(" ", 1)[1]) >= 1 for line in lines)
+
+
+def test_critical_path_follows_latest_dependency():
+    entries = {
+        "t::vpc": tracing.TraceEntry("vpc", "t", None, True, 0.0, 1.0),
+        "t::igw": tracing.TraceEntry("igw", "t", None, True, 0.1, 1.5, deps=["t::vpc"]),
+        "t::subnet": tracing.TraceEntry("subnet", "t", None, True, 0.1, 2.0, deps=["t::vpc"]),
+        "t::route": tracing.TraceEntry("route", "t", None, True, 0.2, 3.0, deps=["t::igw", "t::subnet"]),
+    }
+
+    assert tracing.critical_path(entries) == ["t::vpc", "t::subnet", "t::route"]
+    assert tracing.summarize(entries)["critical_path_seconds"] == 3.0
+
+
+def test_tracing_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("PULUMI_TRACE_FILE", raising=False)
+    assert tracing.install() is None
@@ -0,0 +1,345 @@
+import json
+
+import pytest
+
+SUBNET = "aws:ec2/subnet:Subnet"
+NAT = "aws:ec2/natGateway:NatGateway"
+EIP = "aws:ec2/eip:Eip"
+ROUTE = "aws:ec2/route:Route"
+ROUTE_TABLE = "aws:ec2/routeTable:RouteTable"
+RTA = "aws:ec2/routeTableAssociation:RouteTableAssociation"
+
+
+@pytest.mark.parametrize("env, subnets, tiers, nats", [
+    ("dev", 2, 2, 0),
+    ("staging", 2, 2, 1),
+    ("prod", 3, 3, 3),  # public, private and pods
+])
+def test_resource_counts(run_stack, env, subnets, tiers, nats):
+    run = run_stack(f"{env}-vpc")
+
+    assert len(run.of_type("aws:ec2/vpc:Vpc")) == 1
+    assert len(run.of_type("aws:ec2/internetGateway:InternetGateway")) == 1
+    assert len(run.of_type(SUBNET)) == tiers * subnets
+    assert len(run.of_type(NAT)) == nats
+    assert len(run.of_type(EIP)) == nats
+
+
+@pytest.mark.parametrize("env, prefix", [("dev", "10.10"), ("staging", "10.20"), ("prod", "10.30")])
+def test_subnet_cidrs_inside_vpc(run_stack, env, prefix):
+    run = run_stack(f"{env}-vpc")
+
+    assert run.named(f"{env}-vpc-vpc").inputs["cidrBlock"] == f"{prefix}.0.0/16"
+    assert run.named(f"{env}-vpc-public-1").inputs["cidrBlock"] == f"{prefix}.0.0/24"
+    assert run.named(f"{env}-vpc-public-2").inputs["cidrBlock"] == f"{prefix}.1.0/24"
+    assert run.named(f"{env}-vpc-private-1").inputs["cidrBlock"] == f"{prefix}.100.0/24"
+    assert run.named(f"{env}-vpc-private-2").inputs["cidrBlock"] == f"{prefix}.101.0/24"
+
+
+def test_subnets_spread_across_azs(run_stack):
+    run = run_stack("prod-vpc")
+
+    azs = [run.named(f"prod-vpc-private-{i}").inputs["availabilityZone"] for i in (1, 2, 3)]
+    assert azs == ["us-east-1a", "us-east-1b", "us-east-1c"]
+
+
+def test_public_subnets_route_to_igw(run_stack):
+    run = run_stack("dev-vpc")
+
+    route = run.named("dev-vpc-public-route")
+    assert route.inputs["gatewayId"] == "dev-vpc-igw_id"
+    assert route.inputs["destinationCidrBlock"] == "0.0.0.0/0"
+    associations = [r for r in run.of_type(RTA) if "public" in r.name]
+    assert {a.inputs["routeTableId"] for a in associations} == {"dev-vpc-public-rt_id"}
+    assert {a.inputs["subnetId"] for a in associations} == {"dev-vpc-public-1_id", "dev-vpc-public-2_id"}
+
+
+def test_single_nat_shared_by_private_subnets(run_stack):
+    run = run_stack("staging-vpc")
+
+    routes = [r for r in run.of_type(ROUTE) if "private" in r.name]
+    assert len(routes) == 2
+    assert {r.inputs["natGatewayId"] for r in routes} == {"staging-vpc-nat-1_id"}
+    assert run.named("staging-vpc-nat-1").inputs["subnetId"] == "staging-vpc-public-1_id"
+
+
+def test_multi_az_private_routes_use_own_nat(run_stack):
+    run = run_stack("prod-vpc")
+
+    for i in (1, 2, 3):
+        route = run.named(f"prod-vpc-private-route-{i}")
+        assert route.inputs["routeTableId"] == f"prod-vpc-private-rt-{i}_id"
+        assert route.inputs["natGatewayId"] == f"prod-vpc-nat-{i}_id"
+        association = run.named(f"prod-vpc-private-rta-{i}")
+        assert association.inputs["subnetId"] == f"prod-vpc-private-{i}_id"
+        assert association.inputs["routeTableId"] == f"prod-vpc-private-rt-{i}_id"
+
+
+def test_dev_private_subnets_have_no_nat_routes(run_stack):
+    run = run_stack("dev-vpc")
+
+    assert not [r for r in run.of_type(ROUTE) if "private" in r.name]
+    assert run.exports["nat_gateway_ids"] == []
+
+
+def test_exports(run_stack):
+    run = run_stack("prod-vpc")
+
+    assert run.exports["vpc_id"] == "prod-vpc-vpc_id"
+    assert run.exports["public_subnet_ids"] == [f"prod-vpc-public-{i}_id" for i in (1, 2, 3)]
+    assert run.exports["private_subnet_ids"] == [f"prod-vpc-private-{i}_id" for i in (1, 2, 3)]
+    assert run.exports["nat_strategy"] == "multi-az"
+    assert run.exports["environment"] == "prod"
+
+
+def test_private_subnets_carry_karpenter_discovery_tag(run_stack):
+    prod, dev = run_stack("prod-vpc"), run_stack("dev-vpc")  # eks:enable_karpenter on in prod only
+
+    assert prod.exports["karpenter_discovery"] == "prod-eks"
+    tiers = {s.inputs["tags"]["Type"]: s.inputs["tags"].get("karpenter.sh/discovery") for s in prod.of_type(SUBNET)}
+    assert tiers == {"public": None, "private": "prod-eks", "pods": None}
+    assert not any("karpenter.sh/discovery" in s.inputs["tags"] for s in dev.of_type(SUBNET))
+    assert "karpenter_discovery" not in dev.exports
+
+
+def test_vpc_name_keeps_env_prefix(run_stack):
+    with pytest.raises(Exception, match="must start with 'dev-'"):
+        run_stack("dev-vpc", config={"vpc:name": "shared-vpc"})
+
+
+def test_availability_zones_looked_up_once(run_stack):
+    run = run_stack("prod-vpc")
+
+    assert run.calls_to("aws:index/getAvailabilityZones:getAvailabilityZones") == 1
+
+
+ENDPOINT = "aws:ec2/vpcEndpoint:VpcEndpoint"
+
+
+def test_gateway_endpoints_on_every_route_table(run_stack):
+    run = run_stack("prod-vpc")
+
+    gateways = [e for e in run.of_type(ENDPOINT) if e.inputs["vpcEndpointType"] == "Gateway"]
+    assert {e.inputs["serviceName"] for e in gateways} == {"com.amazonaws.us-east-1.s3",
+                                                           "com.amazonaws.us-east-1.dynamodb"}
+    for endpoint in gateways:
+        assert endpoint.inputs["routeTableIds"] == ["prod-vpc-public-rt_id"] + [
+            f"prod-vpc-private-rt-{i}_id" for i in (1, 2, 3)]
+
+
+def test_interface_endpoints_use_private_dns_in_private_subnets(run_stack):
+    run = run_stack("prod-vpc")
+
+    interfaces = [e for e in run.of_type(ENDPOINT) if e.inputs["vpcEndpointType"] == "Interface"]
+    assert sorted(e.inputs["serviceName"] for e in interfaces) == sorted(
+        f"com.amazonaws.us-east-1.{s}" for s in ("ecr.api", "ecr.dkr", "sts", "logs"))
+    for endpoint in interfaces:
+        assert endpoint.inputs["privateDnsEnabled"] is True
+        assert endpoint.inputs["subnetIds"] == [f"prod-vpc-private-{i}_id" for i in (1, 2, 3)]
+        assert endpoint.inputs["securityGroupIds"] == ["prod-vpc-endpoints-sg_id"]
+
+
+def test_endpoints_without_nat_get_private_route_table(run_stack):
+    run = run_stack("dev-vpc", config={"vpc:enable_vpc_endpoints": "true"})
+
+    assert run.named("dev-vpc-private-rta-1").inputs["routeTableId"] == "dev-vpc-private-rt_id"
+    s3 = run.named("dev-vpc-s3-gateway")
+    assert s3.inputs["routeTableIds"] == ["dev-vpc-public-rt_id", "dev-vpc-private-rt_id"]
+    assert not [e for e in run.of_type(ENDPOINT) if e.inputs["vpcEndpointType"] == "Interface"]
+
+
+def test_zonal_pairs_route_each_az_to_paired_nat(run_stack):
+    run = run_stack("prod-vpc", config={"vpc:nat_strategy": "zonal-pairs"})
+
+    assert len(run.of_type(NAT)) == 2
+    assert run.named("prod-vpc-nat-1").inputs["subnetId"] == "prod-vpc-public-1_id"
+    assert run.named("prod-vpc-nat-2").inputs["subnetId"] == "prod-vpc-public-3_id"
+    targets = [run.named(f"prod-vpc-private-route-{i}").inputs["natGatewayId"] for i in (1, 2, 3)]
+    assert targets == ["prod-vpc-nat-1_id", "prod-vpc-nat-1_id", "prod-vpc-nat-2_id"]
+    assert run.exports["nat_placement"] == {"us-east-1a": "us-east-1a", "us-east-1b": "us-east-1a",
+                                            "us-east-1c": "us-east-1c"}
+
+
+def test_nat_placement_is_exported_per_az(run_stack):
+    run = run_stack("prod-vpc")
+
+    assert run.exports["availability_zones"] == ["us-east-1a", "us-east-1b", "us-east-1c"]
+    assert run.exports["nat_placement"] == {az: az for az in run.exports["availability_zones"]}
+
+
+def test_subnet_count_is_clamped_to_available_azs(run_stack):
+    run = run_stack("prod-vpc", config={"vpc:subnet_count": "4"})
+
+    assert len(run.of_type(SUBNET)) == 9
+    assert len(run.of_type(RTA)) == 9
+
+
+def test_instance_strategy_routes_to_static_enis(run_stack):
+    run = run_stack("staging-vpc", config={"vpc:nat_strategy": "instance"})
+
+    assert not run.of_type(NAT)
+    assert len(run.of_type("aws:autoscaling/group:Group")) == 2
+    for i in (1, 2):
+        eni = run.named(f"staging-vpc-nat-eni-{i}")
+        assert eni.inputs["sourceDestCheck"] is False
+        assert eni.inputs["subnetId"] == f"staging-vpc-public-{i}_id"
+        assert run.named(f"staging-vpc-nat-eip-{i}").inputs["networkInterface"] == f"staging-vpc-nat-eni-{i}_id"
+        route = run.named(f"staging-vpc-private-route-{i}")
+        assert route.inputs["networkInterfaceId"] == f"staging-vpc-nat-eni-{i}_id"
+        assert "natGatewayId" not in route.inputs
+    template = run.named("staging-vpc-nat-1-lt")
+    assert template.inputs["imageId"] == "ami-0fcknat"
+    assert template.inputs["instanceType"] == "t4g.nano"
+
+
+def test_flow_logs_parquet_with_glue_table(run_stack):
+    run = run_stack("prod-vpc")
+
+    flow_log = run.named("prod-vpc-flow-log-vpc")
+    assert flow_log.inputs["vpcId"] == "prod-vpc-vpc_id"
+    assert flow_log.inputs["logDestinationType"] == "s3"
+    assert flow_log.inputs["maxAggregationInterval"] == 60
+    assert flow_log.inputs["destinationOptions"] == {
+        "fileFormat": "parquet", "hiveCompatiblePartitions": True, "perHourPartition": True}
+    assert flow_log.inputs["logFormat"].startswith("${version} ${account-id} ${interface-id}")
+
+    table = run.named("prod-vpc-flow-logs-table")
+    columns = {c["name"]: c["type"] for c in table.inputs["storageDescriptor"]["columns"]}
+    assert columns["account_id"] == "string"
+    assert columns["bytes"] == "bigint"
+    assert [k["name"] for k in table.inputs["partitionKeys"]] == ["year", "month", "day", "hour"]
+    assert "aws-account-id=123456789012/aws-service=vpcflowlogs/aws-region=us-east-1" in \
+        table.inputs["parameters"]["storage.location.template"]
+    assert run.exports["flow_logs_glue_table"] == "prod_vpc_flow_logs.vpc_flow_logs"
+
+    # Delivery must be allowed to write where the table reads
+    policy = json.loads(run.named("prod-vpc-flow-logs-policy").inputs["policy"])
+    write = next(s for s in policy["Statement"] if s["Sid"] == "AWSLogDeliveryWrite")
+    location = table.inputs["storageDescriptor"]["location"]
+    assert location.split("/", 3)[3].startswith(write["Resource"].split("/", 1)[1].rstrip("*"))
+
+
+def test_flow_logs_disabled_in_dev(run_stack):
+    run = run_stack("dev-vpc")
+
+    assert not run.of_type("aws:ec2/flowLog:FlowLog")
+    assert "flow_logs_bucket" not in run.exports
+
+
+def test_flow_logs_subnet_scope_and_custom_format(run_stack):
+    run = run_stack("dev-vpc", config={
+        "vpc:enable_flow_logs": "true",
+        "vpc:flow_logs_scope": "subnet",
+        "vpc:flow_logs_format": "srcaddr,dstaddr,dstport,bytes",
+    })
+
+    flow_logs = run.of_type("aws:ec2/flowLog:FlowLog")
+    assert sorted(f.inputs["subnetId"] for f in flow_logs) == sorted(
+        [f"dev-vpc-public-{i}_id" for i in (1, 2)] + [f"dev-vpc-private-{i}_id" for i in (1, 2)])
+    assert flow_logs[0].inputs["logFormat"] == "${srcaddr} ${dstaddr} ${dstport} ${bytes}"
+
+
+def test_flow_logs_eni_scope_requires_enis(run_stack):
+    with pytest.raises(Exception, match="requires vpc:flow_logs_eni_ids"):
+        run_stack("dev-vpc", config={
+            "vpc:enable_flow_logs": "true",
+            "vpc:flow_logs_scope": "eni",
+        })
+
+
+def test_scheduled_nat_stop_keeps_eips_and_targets(run_stack):
+    active = run_stack("staging-vpc")
+    stopped = run_stack("staging-vpc", config={"vpc:nat_active": "false"})
+
+    assert len(active.of_type(NAT)) == 1 and len(stopped.of_type(NAT)) == 0
+    assert len(stopped.of_type(EIP)) == len(active.of_type(EIP)) == 1
+    assert not [r for r in stopped.of_type(ROUTE) if r.name.startswith("staging-vpc-private-route")]
+    assert len(stopped.of_type(RTA)) == len(active.of_type(RTA))
+
+    targets = stopped.exports["nat_schedule_targets"]
+    assert targets == active.exports["nat_schedule_targets"]
+    assert [t.rsplit("::", 1)[1] for t in targets] == [
+        "staging-vpc-nat-1", "staging-vpc-private-route-1", "staging-vpc-private-route-2"]
+    assert stopped.exports["nat_active"] is False
+    assert {r["resource"] for r in stopped.exports["cost_breakdown"]["items"]} >= {"Elastic IP"}
+    assert "NAT Gateway" not in {r["resource"] for r in stopped.exports["cost_breakdown"]["items"]}
+
+
+def test_scheduled_nat_instances_scale_to_zero(run_stack):
+    run = run_stack("staging-vpc", config={"vpc:nat_strategy": "instance", "vpc:nat_active": "false"})
+
+    for asg in run.of_type("aws:autoscaling/group:Group"):
+        assert (asg.inputs["minSize"], asg.inputs["maxSize"], asg.inputs["desiredCapacity"]) == (0, 0, 0)
+    assert len(run.of_type(ROUTE)) == 1 + 2  # public route + ENI routes stay in place
+
+
+def test_nat_active_ignored_unless_scheduled(run_stack):
+    run = run_stack("prod-vpc", config={"vpc:nat_active": "false"})
+
+    assert len(run.of_type(NAT)) == 3
+    assert "nat_schedule_targets" not in run.exports
+
+
+def test_pod_subnets_in_secondary_cidr(run_stack):
+    run = run_stack("prod-vpc")
+
+    association = run.named("prod-vpc-cidr-1")
+    assert association.inputs["cidrBlock"] == "100.64.0.0/16"
+    pods = [run.named(f"prod-vpc-pods-{i}") for i in (1, 2, 3)]
+    assert [s.inputs["cidrBlock"] for s in pods] == ["100.64.0.0/18", "100.64.64.0/18", "100.64.128.0/18"]
+    assert [s.inputs["availabilityZone"] for s in pods] == ["us-east-1a", "us-east-1b", "us-east-1c"]
+    assert "kubernetes.io/role/internal-elb" not in pods[0].inputs["tags"]
+    assert run.named("prod-vpc-pods-rta-2").inputs["routeTableId"] == \
+        run.named("prod-vpc-private-rta-2").inputs["routeTableId"]
+    assert run.exports["pod_subnet_ids"] == ["prod-vpc-pods-1_id", "prod-vpc-pods-2_id", "prod-vpc-pods-3_id"]
+
+
+def test_secondary_cidr_must_not_overlap_primary(run_stack):
+    with pytest.raises(Exception, match="overlap"):
+        run_stack("dev-vpc", config={"vpc:secondary_cidr_blocks": "10.10.128.0/17"})
+
+
+MULTI_REGION = ('[{"region": "us-east-1"}, {"region": "us-west-2", "cidr_block": "10.50.0.0/16"},'
+                ' {"region": "eu-west-1", "account_id": "210987654321",'
+                ' "role_arn": "arn:aws:iam::210987654321:role/pulumi-dev-vpc"}]')
+
+
+def test_vpc_per_region_target(run_stack):
+    run = run_stack("dev-vpc", config={"vpc:targets": MULTI_REGION})
+
+    # The primary target keeps the default provider and its names; the others get explicit providers
+    providers = run.of_type("pulumi:providers:aws")
+    assert sorted(p.name for p in providers) == ["dev-aws-eu-west-1-210987654321", "dev-aws-us-west-2"]
+    eu = run.named("dev-aws-eu-west-1-210987654321").inputs
+    assert eu["region"] == "eu-west-1"
+    assert "210987654321" in eu["allowedAccountIds"]
+    assert run.named("dev-vpc-vpc").provider == ""
+
+    assert run.named("dev-vpc-vpc").inputs["cidrBlock"] == "10.10.0.0/16"
+    assert run.named("dev-vpc-us-west-2-vpc").inputs["cidrBlock"] == "10.50.0.0/16"
+    assert run.named("dev-vpc-eu-west-1-vpc").inputs["cidrBlock"] == "10.11.0.0/16"
+    assert "dev-aws-us-west-2" in run.named("dev-vpc-us-west-2-public-1").provider
+    assert "dev-aws-us-west-2" in run.named("dev-vpc-us-west-2-public-rta-1").provider
+
+    assert run.exports["vpc_id"] == "dev-vpc-vpc_id"
+    assert set(run.exports["regions"]) == {"us-east-1", "us-west-2", "eu-west-1/210987654321"}
+    assert run.exports["regions"]["us-west-2"]["vpc_id"] == "dev-vpc-us-west-2-vpc_id"
+    assert run.exports["regions"]["eu-west-1/210987654321"]["account_id"] == "210987654321"
+
+
+def test_multi_region_nat_schedule_targets(run_stack):
+    run = run_stack("staging-vpc", config={"vpc:targets": '["us-east-1", "us-west-2"]'})  # exported once
+
+    assert {t.rsplit("::", 1)[1] for t in run.exports["nat_schedule_targets"]} >= {
+        "staging-vpc-nat-1", "staging-vpc-us-west-2-nat-1"}
+
+
+def test_region_targets_skip_other_environments(run_stack):
+    # Extra regions get the next free blocks after dev's 10.10.0.0/16; prod's 10.30.0.0/16 is off limits
+    run = run_stack("dev-vpc", config={"vpc:targets": '["us-east-1", "us-west-2", "eu-west-1"]'})
+    assert run.named("dev-vpc-us-west-2-vpc").inputs["cidrBlock"] == "10.11.0.0/16"
+    assert run.named("dev-vpc-eu-west-1-vpc").inputs["cidrBlock"] == "10.12.0.0/16"
+
+    with pytest.raises(Exception, match="overlap"):
+        run_stack("dev-vpc", config={"vpc:targets": '[{"region": "us-east-1"},'
+                                                    ' {"region": "us-west-2", "cidr_block": "10.30.0.0/16"}]'})